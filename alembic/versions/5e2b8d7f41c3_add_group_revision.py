@@ -0,0 +1,29 @@
+"""add group revision
+
+Revision ID: 5e2b8d7f41c3
+Revises: c71d4f2a9e58
+Create Date: 2026-10-18 13:20:05.562114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2b8d7f41c3'
+down_revision: Union[str, None] = 'c71d4f2a9e58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A constant server default makes this a metadata-only change on Postgres 11+
+    op.add_column('groups', sa.Column('revision', sa.BigInteger(), server_default=sa.text('0'), nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('groups', 'revision')
@@ -0,0 +1,52 @@
+"""add group change log
+
+Revision ID: 9d4a7c2e6b15
+Revises: 5e2b8d7f41c3
+Create Date: 2026-10-18 14:05:41.287330
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4a7c2e6b15'
+down_revision: Union[str, None] = '5e2b8d7f41c3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'group_changes',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('group_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('rev', sa.BigInteger(), nullable=False),
+        sa.Column('entity_type', sa.String(), nullable=False),
+        sa.Column('entity_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_group_changes_group_id_rev', 'group_changes', ['group_id', 'rev'], unique=False)
+
+    # Existing rows become one new revision per group, so a full sync (since=0) returns them
+    op.execute("UPDATE groups SET revision = revision + 1")
+    op.execute("""
+        INSERT INTO group_changes (group_id, rev, entity_type, entity_id)
+        SELECT g.id, g.revision, 'group', g.id FROM groups g
+        UNION ALL
+        SELECT m.group_id, g.revision, 'member', m.id FROM group_members m JOIN groups g ON g.id = m.group_id
+        UNION ALL
+        SELECT e.group_id, g.revision, 'expense', e.id FROM expenses e JOIN groups g ON g.id = e.group_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_group_changes_group_id_rev', table_name='group_changes')
+    op.drop_table('group_changes')
@@ -0,0 +1,72 @@
+"""add balance ledger
+
+Revision ID: a3c9e61f0b27
+Revises: 01801dd927fc
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c9e61f0b27'
+down_revision: Union[str, None] = '01801dd927fc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'group_balances',
+        sa.Column('id', postgresql.UUID(as_uuid=True), server_default=sa.text('gen_random_uuid()'), nullable=False),
+        sa.Column('group_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('total_paid', sa.Float(), nullable=False),
+        sa.Column('total_owed', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('group_id', 'user_id', name='uq_group_balance_user'),
+    )
+    op.create_index(op.f('ix_group_balances_id'), 'group_balances', ['id'], unique=False)
+    op.create_table(
+        'group_totals',
+        sa.Column('group_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('member_count', sa.Integer(), nullable=False),
+        sa.Column('expense_count', sa.Integer(), nullable=False),
+        sa.Column('grand_total', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['group_id'], ['groups.id']),
+        sa.PrimaryKeyConstraint('group_id'),
+    )
+
+    # backfill the ledger from the existing shares, expenses and memberships
+    op.execute("""
+        INSERT INTO group_balances (group_id, user_id, total_paid, total_owed)
+        SELECT e.group_id, s.user_id, COALESCE(SUM(s.amount_paid), 0), COALESCE(SUM(s.amount_owed), 0)
+        FROM expense_shares s JOIN expenses e ON e.id = s.expense_id
+        GROUP BY e.group_id, s.user_id
+    """)
+    op.execute("""
+        INSERT INTO group_totals (group_id, member_count, expense_count, grand_total)
+        SELECT g.id,
+               (SELECT COUNT(*) FROM group_members m WHERE m.group_id = g.id),
+               (SELECT COUNT(*) FROM expenses e WHERE e.group_id = g.id),
+               (SELECT COALESCE(SUM(e.amount), 0) FROM expenses e WHERE e.group_id = g.id)
+        FROM groups g
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('group_totals')
+    op.drop_index(op.f('ix_group_balances_id'), table_name='group_balances')
+    op.drop_table('group_balances')
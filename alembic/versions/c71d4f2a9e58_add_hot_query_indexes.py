@@ -0,0 +1,42 @@
+"""add hot query indexes
+
+Revision ID: c71d4f2a9e58
+Revises: a3c9e61f0b27
+Create Date: 2026-10-18 11:02:47.118503
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c71d4f2a9e58'
+down_revision: Union[str, None] = 'a3c9e61f0b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (index name, table, columns). Lookups by group on group_members and by expense on
+# expense_shares are already served by the uq_group_user and uq_expense_user indexes,
+# and users.username by its unique index.
+INDEXES = [
+    ('ix_expenses_group_id_created_at_id', 'expenses', ['group_id', 'created_at', 'id']),
+    ('ix_group_members_user_id_group_id', 'group_members', ['user_id', 'group_id']),
+    ('ix_expense_shares_user_id_expense_id', 'expense_shares', ['user_id', 'expense_id']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -1,14 +1,63 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import os
+from time import perf_counter
+from typing import Optional
 
 class Settings(BaseSettings):
     # this will load environment variables from a .env file
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8')
     DATABASE_URL: str 
+    # optional read replica for the read-heavy GET endpoints, and how long a user's reads stay on
+    # the primary after they write so they always see their own changes
+    READ_DATABASE_URL: Optional[str] = None
+    READ_YOUR_WRITES_SECONDS: float = 5.0
 
     SECRET_KEY: str
 
+    # connection pool: a request that cannot get a connection within DB_POOL_TIMEOUT seconds gets a 503
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 0
+    DB_POOL_TIMEOUT: float = 5.0
+    DB_POOL_RECYCLE_SECONDS: int = 3600
+    DB_POOL_PRE_PING: bool = True
+    # prepared statements cached per connection by asyncpg, set to 0 behind pgbouncer in transaction mode
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # startup: "create_all" creates missing tables on boot, "verify" only checks that the database is at the
+    # Alembic head, for deploys that run the migrations themselves. Set DB_SCHEMA_REVISION to the expected
+    # revision to skip loading the Alembic scripts. DB_WARM_CONNECTIONS pool connections are opened and run
+    # the hot queries before the first request, filling the statement caches.
+    DB_STARTUP_MODE: str = "create_all"
+    DB_SCHEMA_REVISION: Optional[str] = None
+    DB_WARM_CONNECTIONS: int = 0
+
     PROJECT_NAME: str = "Roomate Expense Tracker"
     API_VERSION: str = "1.0.0"
 
-settings = Settings()
\ No newline at end of file
+    # cache of authenticated users used by get_current_user, set the TTL to 0 to disable it
+    USER_CACHE_TTL_SECONDS: float = 60.0
+    USER_CACHE_MAX_ENTRIES: int = 10000
+
+    # bcrypt runs on a bounded pool so it does not block the event loop, "thread" or "process"
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+
+    # number of rows written per COPY batch and transaction by the bulk expense import
+    IMPORT_CHUNK_SIZE: int = 2000
+
+    # server-sent events: events buffered per subscriber before it is dropped, and the keep-alive interval
+    EVENT_QUEUE_SIZE: int = 64
+    EVENT_HEARTBEAT_SECONDS: float = 15.0
+
+    # cache invalidation across workers: "memory" for a single process, "postgres" for LISTEN/NOTIFY
+    INVALIDATION_BACKEND: str = "memory"
+    INVALIDATION_CHANNEL: str = "cache_invalidation"
+    INVALIDATION_START_TIMEOUT_SECONDS: float = 10.0 # startup fails if LISTEN is not set up in time
+
+    # development aid flagging N+1 queries and routes over their @query_budget: "off", "log" or "raise"
+    QUERY_GUARD: str = "off"
+    QUERY_GUARD_REPEAT_LIMIT: int = 5
+
+_load_started = perf_counter()
+settings = Settings()
+SETTINGS_LOAD_SECONDS = perf_counter() - _load_started # reported as the settings phase of startup
\ No newline at end of file
@@ -1,17 +1,69 @@
-from app.db.models import Expense, GroupMember, ExpenseShares
-from app.schemas.expense import ExpenseCreate, ExpenseShare, ExpenseSharesCreate
+from app.db.models import Expense, GroupMember, ExpenseShares, GroupChange
+from app.schemas.expense import ExpenseCreate, ExpenseSharesCreate
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 from app.db.models import User
+from app.db.database import AsyncSessionLocal
 from uuid import UUID
-from sqlalchemy import select
+from sqlalchemy import select, insert
+from app.crud.ledger import apply_expense_to_ledger, apply_to_ledger
+from app.crud.revision import bump_group_revision, record_group_changes
+from app.utils.events import publish_on_commit
+from app.utils.query_guard import record_chunk
+from app.utils.split import Split, split_weights, allocate_splits_batch
+from app.utils.bulk_import import MAX_REPORTED_ERRORS, uuid7
+from app.schemas.expense import ExpenseImportRow, ExpenseImportError, ExpenseImportResult
+from app.config.settings import settings
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator, Optional, Union
+import csv
+import io
+import json
 
-async def create_expense_in_db(db: AsyncSession, expense: ExpenseCreate, current_user: User, group_id: UUID) -> Expense:
+def iter_share_values(splits: list[Split], amount: float, payer_id: UUID) -> Iterator[tuple[UUID, float, float, bool, Optional[float], Optional[float]]]:
     """
-    Create a new expense in the database.
+    Turn the output of the split engine into the shares to store for an expense.
+    The payer is credited with the full amount, and gets a share owing nothing when
+    they are not one of the participants.
+    :param splits: The share of each participant from the split engine.
+    :param amount: The total amount of the expense.
+    :param payer_id: The ID of the user who paid the expense.
+    :return: (user_id, amount_owed, amount_paid, settled, percent, shares) for each share.
+    """
+    payer_splits = False
+    for split in splits:
+        is_payer = split.user_id == payer_id
+        payer_splits = payer_splits or is_payer
+        yield split.user_id, split.amount_owed, amount if is_payer else 0, is_payer, split.percent, split.shares
+
+    if not payer_splits: # the payer is not splitting the expense but still paid for it
+        yield payer_id, 0, amount, True, None, None
+
+
+def build_expense_shares(splits: list[Split], amount: float, payer_id: UUID) -> dict[UUID, ExpenseSharesCreate]:
+    """
+    Build the shares to store for an expense, see iter_share_values.
+    :param splits: The share of each participant from the split engine.
+    :param amount: The total amount of the expense.
+    :param payer_id: The ID of the user who paid the expense.
+    :return: The share of each user, keyed by user id.
+    """
+    return {
+        user_id: ExpenseSharesCreate.model_construct( # the split engine already validated the amounts
+            amount_owed=owed, amount_paid=paid, settled=settled, percent=percent, shares=shares,
+        )
+        for user_id, owed, paid, settled, percent, shares in iter_share_values(splits, amount, payer_id)
+    }
+
+async def create_expense_in_db(db: AsyncSession, expense: ExpenseCreate, current_user: User, group_id: UUID, shares: dict[UUID, ExpenseSharesCreate]) -> Expense:
+    """
+    Create a new expense and all of its shares in the request's transaction.
+    The caller commits; the expense events are published once it does.
     :param db: The database session to use for the operation.
     :param expense: The ExpenseCreate schema containing expense details.
     :param current_user: The current authenticated user.
+    :param group_id: The ID of the group the expense belongs to.
+    :param shares: The share of each participant, keyed by user id.
     :return: The created Expense object.
     """
     try:
@@ -30,49 +82,272 @@ async def create_expense_in_db(db: AsyncSession, expense: ExpenseCreate, current
                 detail='User is not a member of this group'
             )
 
-        new_expense = Expense(
-            group_id=group_id,
-            user_id=current_user.id,
-            group_member_id=group_member,
-            name=expense.name,
-            amount=expense.amount,
-            expense_type=expense.expense_type,
-            split_method = expense.split_method,
-            settled=expense.settled,
+        new_expense = await db.scalar( # insert the expense and get the server generated columns back
+            insert(Expense).values(
+                group_id=group_id,
+                user_id=current_user.id,
+                group_member_id=group_member,
+                name=expense.name,
+                amount=expense.amount,
+                expense_type=expense.expense_type,
+                split_method = expense.split_method,
+                settled=expense.settled,
+            ).returning(Expense)
         )
 
-        db.add(new_expense)
-        await db.commit()
-        await db.refresh(new_expense)
+        await create_expense_shares_in_db(db, shares, new_expense.id)
+        await apply_expense_to_ledger(db, group_id, new_expense.amount, shares) # keep the balance ledger in step
+        revision = await record_group_changes(db, group_id, [("expense", new_expense.id)]) # invalidate cached copies and log the change for delta sync
+
+        publish_on_commit(db, group_id, "expense_created", {
+            "group_id": group_id,
+            "revision": revision,
+            "expense_id": new_expense.id,
+            "name": new_expense.name,
+            "amount": new_expense.amount,
+            "paid_by": new_expense.user_id,
+            "created_at": new_expense.created_at,
+        })
+        publish_on_commit(db, group_id, "balance_changed", {"group_id": group_id, "revision": revision, "user_ids": list(shares)})
 
         return new_expense
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def create_expense_share_in_db(db: AsyncSession, expense_share: ExpenseSharesCreate, user_id: UUID, expense_id: UUID) -> ExpenseShare:
+async def create_expense_shares_in_db(db: AsyncSession, shares: dict[UUID, ExpenseSharesCreate], expense_id: UUID) -> list[ExpenseShares]:
+    """
+    Insert the shares of an expense with one multi-row INSERT ... RETURNING.
+    The caller is responsible for committing the transaction.
+    :param db: The database session to use for the operation.
+    :param shares: The share of each participant, keyed by user id.
+    :param expense_id: The ID of the expense the shares belong to.
+    :return: The created ExpenseShares objects.
+    """
+    if not shares:
+        return []
+
+    result = await db.scalars(
+        insert(ExpenseShares).returning(ExpenseShares),
+        [
+            {
+                "expense_id": expense_id,
+                "user_id": user_id,
+                "amount_owed": share.amount_owed,
+                "amount_paid": share.amount_paid,
+                "settled": share.settled,
+                "percent": share.percent,
+                "shares": share.shares,
+            }
+            for user_id, share in shares.items()
+        ],
+    )
+    return result.all()
+
+
+EXPENSE_COPY_COLUMNS = ["id", "group_id", "user_id", "group_member_id", "name", "amount", "expense_type", "split_method", "settled", "created_at", "updated_at"]
+SHARE_COPY_COLUMNS = ["id", "expense_id", "user_id", "amount_owed", "amount_paid", "settled", "percent", "shares", "created_at", "updated_at"]
+CHANGE_COPY_COLUMNS = ["group_id", "rev", "entity_type", "entity_id"]
+
+
+async def import_expenses_in_db(db: AsyncSession, group_id: UUID, rows: AsyncIterator[tuple[int, Union[ExpenseImportRow, str]]], current_user: User) -> ExpenseImportResult:
     """
-    Create a new expense share in the database.
+    Import a stream of expenses into a group.
+    Rows are checked against the group's members and split rules as they arrive and written
+    in chunks of IMPORT_CHUNK_SIZE with COPY, each chunk in its own transaction, so memory
+    stays bounded no matter how long the upload is. Invalid rows are skipped and reported.
+    If the upload cannot be read further once a chunk has been committed, the result reports
+    the committed rows and the reason instead of failing the request.
     :param db: The database session to use for the operation.
-    :param expense_share: The ExpenseSharesCreate schema containing expense share details.
-    :param user_id: The user id of the user who created the expense share.
-    :return: The created ExpenseShares object.
+    :param group_id: The ID of the group to import into.
+    :param rows: (row number, validated row or error message) pairs, see parse_import_rows.
+    :param current_user: The current authenticated user, the default payer.
+    :return: The number of imported and failed rows and the first errors.
+    :raises ValueError: If the upload cannot be read before any chunk is committed.
     """
+    result = await db.execute(
+        select(GroupMember.user_id, GroupMember.id).where(GroupMember.group_id == group_id)
+    )
+    members = dict(result.all()) # user id -> group member id
+
+    if current_user.id not in members:
+        raise HTTPException(status_code=404, detail='User is not a member of this group')
+
+    imported = 0
+    failed = 0
+    errors = []
+    chunk = []
+
+    def reject(row_number: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(ExpenseImportError(row=row_number, error=message))
+
     try:
-        new_expense_share = ExpenseShares(
-            expense_id=expense_id,
-            user_id=user_id,
-            amount_owed=expense_share.amount_owed,
-            amount_paid=expense_share.amount_paid,
-            settled=expense_share.settled,
-        )
+        async for row_number, row in rows:
+            if isinstance(row, str):
+                reject(row_number, row)
+                continue
 
-        db.add(new_expense_share)
-        await db.commit()
-        await db.refresh(new_expense_share)
+            payer_id = row.paid_by or current_user.id
+            outsiders = [user_id for user_id in [payer_id, *row.participants] if user_id not in members]
+            if outsiders:
+                reject(row_number, f"Not a member of this group: {', '.join(str(user_id) for user_id in outsiders)}.")
+                continue
+            if len(set(row.participants)) != len(row.participants):
+                reject(row_number, "Duplicate participants.")
+                continue
+            try:
+                weights = split_weights(row.amount, len(row.participants), row.split_method, row.splits)
+            except ValueError as e:
+                reject(row_number, str(e))
+                continue
 
-        return new_expense_share
+            chunk.append((row, payer_id, weights))
+            if len(chunk) >= settings.IMPORT_CHUNK_SIZE:
+                imported += await copy_expense_chunk(db, group_id, chunk, members)
+                await db.commit() # unlike other writes, an import commits per chunk to keep its transactions bounded
+                chunk = []
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        if chunk:
+            imported += await copy_expense_chunk(db, group_id, chunk, members)
+            await db.commit()
+    except ValueError as e:
+        if not imported: # nothing is written yet, fail the whole upload
+            raise
+        await db.rollback() # drop the chunk in progress, the committed chunks stay
+        return ExpenseImportResult(imported=imported, failed=failed, errors=errors, error=str(e))
+
+    return ExpenseImportResult(imported=imported, failed=failed, errors=errors)
+
+
+async def copy_expense_chunk(db: AsyncSession, group_id: UUID, chunk: list[tuple[ExpenseImportRow, UUID, list[float]]], members: dict[UUID, UUID]) -> int:
+    """
+    Write a chunk of validated expenses and their shares with COPY and update the ledger. The caller commits.
+    :param db: The database session to use for the operation.
+    :param group_id: The ID of the group the expenses belong to.
+    :param chunk: The validated rows, their payers and their split weights.
+    :param members: Group member id of every member of the group, keyed by user id.
+    :return: The number of expenses written.
+    """
+    record_chunk()
+    splits = allocate_splits_batch([
+        (row.amount, row.participants, row.split_method, row.splits, weights) for row, _, weights in chunk
+    ])
+
+    now = datetime.now(timezone.utc)
+    expense_records = []
+    share_records = []
+    balance_deltas = {}
+    grand_total = 0
+
+    for (row, payer_id, _), row_splits in zip(chunk, splits):
+        expense_id = uuid7()
+        created_at = row.created_at or now
+        expense_records.append((
+            expense_id, group_id, payer_id, members[payer_id], row.name, row.amount,
+            row.expense_type, row.split_method, row.settled, created_at, now,
+        ))
+        grand_total += row.amount
+
+        for user_id, owed, paid, settled, percent, shares in iter_share_values(row_splits, row.amount, payer_id):
+            share_records.append((uuid7(), expense_id, user_id, owed, paid, settled, percent, shares, created_at, now))
+            total_paid, total_owed = balance_deltas.get(user_id, (0, 0))
+            balance_deltas[user_id] = (total_paid + paid, total_owed + owed)
+
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    driver_connection = raw_connection.driver_connection # the asyncpg connection, inside the session's transaction
+
+    await driver_connection.copy_records_to_table(Expense.__tablename__, records=expense_records, columns=EXPENSE_COPY_COLUMNS)
+    await driver_connection.copy_records_to_table(ExpenseShares.__tablename__, records=share_records, columns=SHARE_COPY_COLUMNS)
+    await apply_to_ledger(db, group_id, balance_deltas, expense_count=len(expense_records), grand_total=grand_total)
+    revision = await bump_group_revision(db, group_id)
+    await driver_connection.copy_records_to_table( # the change log, as record_group_changes would write it
+        GroupChange.__tablename__,
+        records=[(group_id, revision, "expense", record[0]) for record in expense_records],
+        columns=CHANGE_COPY_COLUMNS,
+    )
+
+    # one event per chunk rather than per expense, so an import cannot overflow the subscriber queues
+    publish_on_commit(db, group_id, "balance_changed", {
+        "group_id": group_id,
+        "revision": revision,
+        "user_ids": list(balance_deltas),
+        "expense_count": len(expense_records),
+    })
+
+    return len(expense_records)
+
+
+EXPORT_COLUMNS = [
+    "expense_id", "expense_name", "expense_type", "split_method", "expense_amount", "paid_by_id", "paid_by",
+    "expense_created_at", "user_id", "amount_owed", "amount_paid", "settled", "percent", "shares",
+]
+EXPORT_BATCH_SIZE = 2000  # Rows fetched per round trip from the server-side cursor
+
+
+def export_value(value):
+    """Render datetimes as ISO 8601 and everything else (UUIDs) as text, for CSV and JSON alike."""
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+async def stream_group_export(group_id: UUID, format: str) -> AsyncIterator[bytes]:
+    """
+    Stream every expense of a group joined with its shares, one row per share, as CSV or NDJSON.
+    Rows are read through a server-side cursor in batches of EXPORT_BATCH_SIZE and encoded
+    batch by batch, so memory stays flat no matter how large the group is. The stream opens
+    its own session because it outlives the request's dependencies.
+    :param group_id: The ID of the group to export.
+    :param format: "csv" or "ndjson".
+    :return: An async iterator of encoded chunks.
+    """
+    stmt = (
+        select(
+            Expense.id,
+            Expense.name,
+            Expense.expense_type,
+            Expense.split_method,
+            Expense.amount,
+            Expense.user_id,
+            (User.first_name + " " + User.last_name),
+            Expense.created_at,
+            ExpenseShares.user_id,
+            ExpenseShares.amount_owed,
+            ExpenseShares.amount_paid,
+            ExpenseShares.settled,
+            ExpenseShares.percent,
+            ExpenseShares.shares,
+        )
+        .join(ExpenseShares, ExpenseShares.expense_id == Expense.id)
+        .join(User, User.id == Expense.user_id)
+        .where(Expense.group_id == group_id)
+        .order_by(Expense.created_at, Expense.id)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue().encode()
 
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(
+                    [export_value(value) if isinstance(value, datetime) else value for value in row]
+                    for row in rows
+                )
+                yield buffer.getvalue().encode()
+            else:
+                yield "".join(
+                    json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=export_value) + "\n"
+                    for row in rows
+                ).encode()
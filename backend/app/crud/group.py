@@ -8,13 +8,32 @@ from fastapi import HTTPException
 from app.utils.dependencies import get_current_user
 from app.db.models import User, GroupMember
 import secrets
-from sqlalchemy import select, func
+import uuid
+from sqlalchemy import select, func, insert, update, literal, true, false
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 import string
 from uuid import UUID
 from app.db.models import Expense
 from app.schemas.expense import Expense as ExpenseSchema
 from sqlalchemy.orm import selectinload
-from app.routers.expense import calculate_user_balance
+from app.routers.expense import calculate_user_balances
+from app.crud.ledger import apply_member_to_ledger, get_group_totals
+from app.crud.revision import record_group_changes
+from app.utils.integrity import integrity_error_to_http
+from app.utils.sparse_fields import pick_fields
+
+INVITE_CODE_ATTEMPTS = 5
+
+# the fields of ExpenseSchema, read as Core rows by the group read paths instead of ORM entities
+EXPENSE_COLUMNS = (
+    Expense.id, Expense.group_id, Expense.user_id, Expense.group_member_id, Expense.name, Expense.amount,
+    Expense.expense_type, Expense.split_method, Expense.settled, Expense.created_at, Expense.updated_at,
+)
+EXPENSE_FIELDS = tuple(column.key for column in EXPENSE_COLUMNS)
+
+# the GroupOut fields fields=summary stands for: everything but the embedded expenses
+GROUP_SUMMARY_FIELDS = ("id", "name", "description", "member_count", "grand_total", "balance")
 
 def generate_invite_code():
     """Generate a unique 8-character invite code"""
@@ -23,48 +42,50 @@ def generate_invite_code():
 async def create_group_in_db(db: AsyncSession, group: GroupCreate, current_user: User) -> Group:
     """
     Create a new group in the database.
+    The group and its admin membership are inserted by one statement, a data-modifying CTE.
+    A colliding invite code makes the group insert do nothing, and the statement is retried
+    with a new code up to INVITE_CODE_ATTEMPTS times.
     :param db: The database session to use for the operation.
     :param group: The GroupCreate schema containing group details.
     :param current_user: The current authenticated user.
     :return: The created Group object.
     """
     try:
-        invite_code = generate_invite_code() # Generate a unique invite code
-
-        existing_group_check = await db.execute( # Check if the invite code already exists
-            select(Group).filter(Group.invite_code == invite_code)
-        )
-
-        if existing_group_check.scalar_one_or_none(): # If the invite code already exists, raise an error
-            raise ValueError(f"Invite code '{invite_code}' already exists. Please choose another one.")
-        
-        db_group = Group(  # create the group
-            name=group.name,
-            description=group.description,
-            invite_code=invite_code,
-            created_by=current_user.id,
-        )
-
-        db.add(db_group)
-        await db.commit()
-        await db.refresh(db_group)
-
-        group_member = GroupMember(  # create the group member as the admin
-            group_id=db_group.id,
-            user_id=current_user.id,
-            is_admin=True,
-        )
-
-        db.add(group_member)
-        await db.commit()
-        await db.refresh(group_member)
-
+        member_id = uuid.uuid4()
+        for _ in range(INVITE_CODE_ATTEMPTS):
+            new_group = (
+                pg_insert(Group)
+                .values(
+                    id=uuid.uuid4(),
+                    name=group.name,
+                    description=group.description,
+                    invite_code=generate_invite_code(),
+                    created_by=current_user.id,
+                )
+                .on_conflict_do_nothing(index_elements=[Group.invite_code])
+                .returning(*Group.__table__.c)
+                .cte("new_group")
+            )
+            admin_member = (
+                insert(GroupMember)
+                .from_select(
+                    ["id", "group_id", "user_id", "is_admin"],
+                    select(literal(member_id), new_group.c.id, literal(current_user.id), true()),
+                )
+                .cte("admin_member")
+            )
+            db_group = await db.scalar(select(Group).from_statement(select(new_group).add_cte(admin_member)))
+            if db_group is not None:
+                break
+        else:
+            raise RuntimeError("Could not generate an unused invite code.")
+
+        await apply_member_to_ledger(db, db_group.id) # count the creator in the group totals
+        await record_group_changes(db, db_group.id, [("group", db_group.id), ("member", member_id)])
         return db_group
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
     
 async def get_group_by_id(db: AsyncSession, group_id: UUID) -> Optional[Group]:
     """
@@ -82,87 +103,71 @@ async def get_group_by_id(db: AsyncSession, group_id: UUID) -> Optional[Group]:
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
 
 async def update_group_in_db(db: AsyncSession, group_id: UUID, group: GroupUpdate) -> Optional[Group]:
     """
     Update a group in the database.
+    The group is updated and read back with one UPDATE ... RETURNING.
     :param db: The database session to use for the operation.
     :param group_id: The ID of the group to update.
     :param group: The GroupUpdate schema containing group details.
-    :return: The updated Group object if found, otherwise None.
+    :return: The updated Group object.
     """
     try:
-        # Get the group by ID
-        result = await db.execute(
-            select(Group).filter(Group.id == group_id)
+        db_group = await db.scalar(
+            update(Group)
+            .where(Group.id == group_id)
+            .values(name=group.name, description=group.description)
+            .returning(Group)
         )
 
-        db_group = result.scalar_one_or_none()
-
         if db_group is None:
-            raise ValueError(f"Group '{group_id}' not found.")
-
-        db_group.name = group.name
-        db_group.description = group.description
+            raise HTTPException(status_code=404, detail=f"Group '{group_id}' not found.")
 
-        await db.commit()
-        await db.refresh(db_group)
+        await record_group_changes(db, group_id, [("group", group_id)])
         return db_group
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
 async def add_member_to_group_in_db(db: AsyncSession, invite_code: InviteCode, user: User) -> Optional[GroupMember]:
     """
     Add a member to a group in the database.
+    The membership is inserted straight from the group matching the invite code with one
+    INSERT ... SELECT ... RETURNING: no row means the code is unknown, and uq_group_user
+    rejects a user who is already a member, even between concurrent joins.
     :param db: The database session to use for the operation.
-    :param group_id: The ID of the group to add the member to.
+    :param invite_code: The invite code of the group to join.
     :param user: The User object to add to the group.
     :return: The GroupMember object if added successfully, otherwise None.
     """
     try:
-        # Get the group by ID
-        result = await db.execute(
-            select(Group).filter(Group.invite_code == invite_code.invite_code)
-        )
-
-        db_group = result.scalar_one_or_none()
-
-        if db_group is None:
-            raise ValueError(f"Group '{invite_code.invite_code}' not found.")
-
-        if db_group.invite_code != invite_code.invite_code:
-            raise ValueError(f"Invalid invite code '{invite_code.invite_code}'.")
-        
-        db_group_member = await db.execute( # check if the user is already in the group
-            select(GroupMember).filter(GroupMember.group_id == db_group.id, GroupMember.user_id == user.id)
+        db_group_member = await db.scalar(
+            insert(GroupMember)
+            .from_select(
+                ["id", "group_id", "user_id", "is_admin"],
+                select(func.gen_random_uuid(), Group.id, literal(user.id), false())
+                .where(Group.invite_code == invite_code.invite_code),
+            )
+            .returning(GroupMember)
         )
 
-        db_group_member = db_group_member.scalar_one_or_none() # get the group member
-
-        if db_group_member is not None: # if the user is already in the group
-            raise ValueError(f"User '{user.id}' is already a member of group '{db_group.id}'.") # raise an error
+        if db_group_member is None:
+            raise HTTPException(status_code=404, detail=f"Group with invite code '{invite_code.invite_code}' not found.")
 
-        db_group_member = GroupMember( # create new group member
-            group_id=db_group.id,
-            user_id=user.id,
-            is_admin=False,
-        )
-
-        db.add(db_group_member)
-        await db.commit()
-        await db.refresh(db_group_member)
+        await apply_member_to_ledger(db, db_group_member.group_id) # count the new member in the group totals
+        await record_group_changes(db, db_group_member.group_id, [("member", db_group_member.id)])
         return db_group_member
 
+    except IntegrityError as e:
+        raise integrity_error_to_http(e)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
 
 async def get_group_members_in_db(db: AsyncSession, group_id: UUID, current_user: User) -> list[GroupMember]:
     """
@@ -192,54 +197,95 @@ async def get_group_members_in_db(db: AsyncSession, group_id: UUID, current_user
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        db.close()
     
 
-async def get_all_groups_in_db(db: AsyncSession, current_user: User) -> list[GroupOut]:
+async def get_group_expense_rows(db: AsyncSession, group_ids: list[UUID], limit: Optional[int] = None) -> dict[UUID, list[dict]]:
     """
-    Retrieve all groups.
-    This endpoint allows the authenticated user to retrieve all groups.
+    Read the expenses of several groups as plain dicts with the fields of ExpenseSchema.
+    Only those columns are selected and the rows are not turned into ORM entities, which
+    is what makes listing groups with thousands of expenses cheap.
+    :param db: The database session to use for the operation.
+    :param group_ids: The IDs of the groups.
+    :param limit: Only read the newest `limit` expenses of each group, newest first. Reads all of them when None.
+    :return: A dict mapping each group ID to the expenses of the group.
     """
-    try:
-        result = await db.execute(  
-            select(Group).join(GroupMember).where(GroupMember.user_id == current_user.id)
+    expenses_by_group = {group_id: [] for group_id in group_ids}
+    if not group_ids:
+        return expenses_by_group
+
+    stmt = select(*EXPENSE_COLUMNS).where(Expense.group_id.in_(group_ids))
+    if limit is not None:
+        # a LATERAL subquery per group walks ix_expenses_group_id_created_at_id and stops after `limit` rows
+        groups = select(Group.id).where(Group.id.in_(group_ids)).subquery("bounded_groups")
+        recent = (
+            select(*EXPENSE_COLUMNS)
+            .where(Expense.group_id == groups.c.id)
+            .order_by(Expense.created_at.desc(), Expense.id.desc())
+            .limit(limit)
+            .lateral("recent_expenses")
         )
-        groupList = result.scalars().all() # get all groups the user is a member of
-
-        group_outputs = [] # list to store group outputs
-        for group in groupList:
-            member_count_result = await db.execute( # get the number of members in the group
-                select(func.count(GroupMember.user_id)).where(GroupMember.group_id == group.id)
-            )
-            member_count = member_count_result.scalar() # get the number of members in the group
+        stmt = select(recent).select_from(groups.join(recent, true()))
 
-            expenses = await db.execute(
-                select(Expense).filter(Expense.group_id == group.id)
-            )
-            expenses = expenses.scalars().all()
-            grand_total = 0
+    connection = await db.connection() # a Core execution, so the rows skip the ORM loading layer too
+    result = await connection.execute(stmt)
+    for row in result:
+        expense = dict(zip(EXPENSE_FIELDS, row))
+        expenses_by_group[expense["group_id"]].append(expense)
+    return expenses_by_group
 
-            for expense in expenses:
-                grand_total += expense.amount
 
-            balance = await calculate_user_balance(db, group.id, current_user.id)
-            
-            group_outputs.append(GroupOut( # append the group to the list
-                id=group.id,
-                name=group.name,
-                description=group.description,
-                member_count=member_count,
-                expenses=expenses,
-                grand_total=grand_total,
-                balance=balance
-            ))
+async def build_group_outputs(db: AsyncSession, groups: list, user_id: UUID, fields: frozenset[str], expenses_limit: Optional[int] = None) -> list[dict]:
+    """
+    Build the GroupOut dicts of some groups, running only the queries the requested fields need:
+    the ledger totals for member_count and grand_total, the expenses, and the user's balances.
+    :param db: The database session to use for the operation.
+    :param groups: Rows with the id, name and description of the groups.
+    :param user_id: The user whose balance is reported.
+    :param fields: The GroupOut fields to return, see parse_fields.
+    :param expenses_limit: Only embed the newest `expenses_limit` expenses of each group.
+    :return: Dicts with the requested fields of GroupOut, ready to serialize.
+    """
+    group_ids = [group.id for group in groups]
+
+    totals = await get_group_totals(db, group_ids) if fields & {"member_count", "grand_total"} else {} # member counts and grand totals from the ledger
+    expenses_by_group = await get_group_expense_rows(db, group_ids, expenses_limit) if "expenses" in fields else {} # get the expenses of every group at once
+    balances = await calculate_user_balances(db, group_ids, user_id) if "balance" in fields else {}
+
+    group_outputs = [] # list to store group outputs
+    for group in groups:
+        group_totals = totals.get(group.id)
+        group_outputs.append(pick_fields({ # append the group to the list
+            "id": group.id,
+            "name": group.name,
+            "description": group.description,
+            "member_count": group_totals.member_count if group_totals else 0,
+            "expenses": expenses_by_group.get(group.id, []),
+            "grand_total": float(group_totals.grand_total) if group_totals else 0.0, # GroupOut renders these as floats
+            "balance": float(balances.get(group.id, 0)),
+        }, fields))
+    return group_outputs
+
+
+async def get_all_groups_in_db(db: AsyncSession, current_user: User, fields: Optional[frozenset[str]] = None, expenses_limit: Optional[int] = None) -> list[dict]:
+    """
+    Retrieve all groups.
+    This endpoint allows the authenticated user to retrieve all groups.
+    The member counts, grand totals and balances for every group are read from the balance
+    ledger with one query each, so the number of queries does not grow with the number of groups.
+    :param fields: The GroupOut fields to return, every field when None. Queries for the others are skipped.
+    :param expenses_limit: Only embed the newest `expenses_limit` expenses of each group.
+    :return: Dicts with the fields of GroupOut, built from Core rows and ready to serialize.
+    """
+    try:
+        result = await db.execute(
+            select(Group.id, Group.name, Group.description).join(GroupMember).where(GroupMember.user_id == current_user.id)
+        )
+        groupList = result.all() # get all groups the user is a member of
 
-        return group_outputs
+        if not groupList:
+            return []
 
+        return await build_group_outputs(db, groupList, current_user.id, fields or frozenset(GroupOut.model_fields), expenses_limit)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        await db.close()
-    
\ No newline at end of file
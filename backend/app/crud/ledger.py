@@ -0,0 +1,275 @@
+from app.db.models import Expense, ExpenseShares, Group, GroupChange, GroupMember, GroupBalance, GroupTotals
+from app.schemas.expense import ExpenseSharesCreate
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import select, func, delete, update
+from typing import Optional
+from uuid import UUID
+
+LEDGER_TOLERANCE = 0.005  # Differences below half a cent are float noise, not drift
+
+
+async def apply_expense_to_ledger(db: AsyncSession, group_id: UUID, amount: float, shares: dict[UUID, ExpenseSharesCreate]) -> None:
+    """
+    Add a new expense and its shares to the balance ledger.
+    Must be called in the same transaction as the expense write; the caller commits.
+    :param db: The database session to use for the operation.
+    :param group_id: The ID of the group the expense belongs to.
+    :param amount: The total amount of the expense.
+    :param shares: The share of each participant, keyed by user id.
+    """
+    balance_deltas = {user_id: (share.amount_paid, share.amount_owed) for user_id, share in shares.items()}
+    await apply_to_ledger(db, group_id, balance_deltas, expense_count=1, grand_total=amount)
+
+
+async def apply_to_ledger(db: AsyncSession, group_id: UUID, balance_deltas: dict[UUID, tuple[float, float]], expense_count: int, grand_total: float) -> None:
+    """
+    Add any number of expenses of one group to the balance ledger with one upsert per table.
+    Must be called in the same transaction as the expense writes; the caller commits.
+    :param db: The database session to use for the operation.
+    :param group_id: The ID of the group the expenses belong to.
+    :param balance_deltas: The (paid, owed) amounts to add for each user.
+    :param expense_count: The number of expenses being added.
+    :param grand_total: The sum of the amounts of the expenses being added.
+    """
+    if balance_deltas:
+        # rows are upserted in user id order so concurrent writers lock them in the same order
+        stmt = insert(GroupBalance).values([
+            {
+                "group_id": group_id,
+                "user_id": user_id,
+                "total_paid": balance_deltas[user_id][0],
+                "total_owed": balance_deltas[user_id][1],
+            }
+            for user_id in sorted(balance_deltas)
+        ])
+        await db.execute(stmt.on_conflict_do_update(
+            constraint='uq_group_balance_user',
+            set_={
+                "total_paid": GroupBalance.total_paid + stmt.excluded.total_paid,
+                "total_owed": GroupBalance.total_owed + stmt.excluded.total_owed,
+                "updated_at": func.now(),
+            },
+        ))
+
+    stmt = insert(GroupTotals).values(group_id=group_id, member_count=0, expense_count=expense_count, grand_total=grand_total)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[GroupTotals.group_id],
+        set_={
+            "expense_count": GroupTotals.expense_count + stmt.excluded.expense_count,
+            "grand_total": GroupTotals.grand_total + stmt.excluded.grand_total,
+            "updated_at": func.now(),
+        },
+    ))
+
+
+async def apply_member_to_ledger(db: AsyncSession, group_id: UUID, delta: int = 1) -> None:
+    """
+    Adjust the member count of a group in the ledger.
+    Must be called in the same transaction as the membership write; the caller commits.
+    :param db: The database session to use for the operation.
+    :param group_id: The ID of the group.
+    :param delta: The change in the number of members.
+    """
+    stmt = insert(GroupTotals).values(group_id=group_id, member_count=delta, expense_count=0, grand_total=0)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[GroupTotals.group_id],
+        set_={
+            "member_count": GroupTotals.member_count + stmt.excluded.member_count,
+            "updated_at": func.now(),
+        },
+    ))
+
+
+async def get_user_balances(db: AsyncSession, group_ids: list[UUID], user_id: UUID) -> dict[UUID, float]:
+    """
+    Read the balance of a user in several groups from the ledger.
+    :param db: The database session to use for the operation.
+    :param group_ids: The IDs of the groups.
+    :param user_id: The ID of the user.
+    :return: A dict mapping each group ID to the user's balance. Groups without a ledger row are omitted.
+    """
+    if not group_ids:
+        return {}
+
+    result = await db.execute(
+        select(GroupBalance.group_id, GroupBalance.total_paid, GroupBalance.total_owed)
+        .where(GroupBalance.user_id == user_id, GroupBalance.group_id.in_(group_ids))
+    )
+    return {
+        group_id: round(total_paid - total_owed, 2)
+        for group_id, total_paid, total_owed in result.all()
+    }
+
+
+async def get_group_balances(db: AsyncSession, group_id: UUID) -> dict[UUID, float]:
+    """
+    Read the balance of every user in a group from the ledger.
+    :param db: The database session to use for the operation.
+    :param group_id: The ID of the group.
+    :return: A dict mapping each user ID to their balance.
+    """
+    result = await db.execute(
+        select(GroupBalance.user_id, GroupBalance.total_paid, GroupBalance.total_owed)
+        .where(GroupBalance.group_id == group_id)
+    )
+    return {
+        user_id: total_paid - total_owed
+        for user_id, total_paid, total_owed in result.all()
+    }
+
+
+async def get_group_totals(db: AsyncSession, group_ids: list[UUID]) -> dict[UUID, GroupTotals]:
+    """
+    Read the running totals of several groups from the ledger.
+    :param db: The database session to use for the operation.
+    :param group_ids: The IDs of the groups.
+    :return: A dict mapping each group ID to its GroupTotals row.
+    """
+    if not group_ids:
+        return {}
+
+    result = await db.execute(select(GroupTotals).where(GroupTotals.group_id.in_(group_ids)))
+    return {totals.group_id: totals for totals in result.scalars().all()}
+
+
+async def compute_ledger_from_shares(db: AsyncSession, group_id: Optional[UUID] = None) -> tuple[dict, dict]:
+    """
+    Recompute the ledger from the raw expenses, shares and memberships.
+    :param db: The database session to use for the operation.
+    :param group_id: Only recompute this group. Recomputes every group when None.
+    :return: A (balances, totals) pair. balances maps (group_id, user_id) to (total_paid, total_owed),
+             totals maps group_id to (member_count, expense_count, grand_total).
+    """
+    balance_stmt = (
+        select(
+            Expense.group_id,
+            ExpenseShares.user_id,
+            func.coalesce(func.sum(ExpenseShares.amount_paid), 0),
+            func.coalesce(func.sum(ExpenseShares.amount_owed), 0),
+        )
+        .join(ExpenseShares.expense)
+        .group_by(Expense.group_id, ExpenseShares.user_id)
+    )
+    expense_stmt = (
+        select(Expense.group_id, func.count(Expense.id), func.coalesce(func.sum(Expense.amount), 0))
+        .group_by(Expense.group_id)
+    )
+    member_stmt = (
+        select(GroupMember.group_id, func.count(GroupMember.id))
+        .group_by(GroupMember.group_id)
+    )
+    if group_id is not None:
+        balance_stmt = balance_stmt.where(Expense.group_id == group_id)
+        expense_stmt = expense_stmt.where(Expense.group_id == group_id)
+        member_stmt = member_stmt.where(GroupMember.group_id == group_id)
+
+    balances = {
+        (row_group_id, user_id): (total_paid, total_owed)
+        for row_group_id, user_id, total_paid, total_owed in (await db.execute(balance_stmt)).all()
+    }
+
+    totals = {}
+    for row_group_id, member_count in (await db.execute(member_stmt)).all():
+        totals[row_group_id] = (member_count, 0, 0)
+    for row_group_id, expense_count, grand_total in (await db.execute(expense_stmt)).all():
+        member_count = totals.get(row_group_id, (0, 0, 0))[0]
+        totals[row_group_id] = (member_count, expense_count, grand_total)
+
+    return balances, totals
+
+
+async def check_ledger_consistency(db: AsyncSession, group_id: Optional[UUID] = None) -> list[dict]:
+    """
+    Compare the ledger against a full recomputation from the raw shares and report any drift.
+    :param db: The database session to use for the operation.
+    :param group_id: Only check this group. Checks every group when None.
+    :return: A list of drift reports, empty when the ledger is consistent.
+    """
+    expected_balances, expected_totals = await compute_ledger_from_shares(db, group_id)
+
+    balance_stmt = select(GroupBalance)
+    totals_stmt = select(GroupTotals)
+    if group_id is not None:
+        balance_stmt = balance_stmt.where(GroupBalance.group_id == group_id)
+        totals_stmt = totals_stmt.where(GroupTotals.group_id == group_id)
+
+    actual_balances = {
+        (row.group_id, row.user_id): (row.total_paid, row.total_owed)
+        for row in (await db.execute(balance_stmt)).scalars().all()
+    }
+    actual_totals = {
+        row.group_id: (row.member_count, row.expense_count, row.grand_total)
+        for row in (await db.execute(totals_stmt)).scalars().all()
+    }
+
+    drift = []
+
+    for key in expected_balances.keys() | actual_balances.keys():
+        expected = expected_balances.get(key, (0, 0))
+        actual = actual_balances.get(key, (0, 0))
+        if any(abs(e - a) > LEDGER_TOLERANCE for e, a in zip(expected, actual)):
+            drift.append({
+                "kind": "balance",
+                "group_id": key[0],
+                "user_id": key[1],
+                "expected": {"total_paid": expected[0], "total_owed": expected[1]},
+                "actual": {"total_paid": actual[0], "total_owed": actual[1]},
+            })
+
+    for key in expected_totals.keys() | actual_totals.keys():
+        expected = expected_totals.get(key, (0, 0, 0))
+        actual = actual_totals.get(key, (0, 0, 0))
+        if expected[0] != actual[0] or expected[1] != actual[1] or abs(expected[2] - actual[2]) > LEDGER_TOLERANCE:
+            drift.append({
+                "kind": "totals",
+                "group_id": key,
+                "expected": {"member_count": expected[0], "expense_count": expected[1], "grand_total": expected[2]},
+                "actual": {"member_count": actual[0], "expense_count": actual[1], "grand_total": actual[2]},
+            })
+
+    return drift
+
+
+async def rebuild_ledger(db: AsyncSession, group_id: Optional[UUID] = None) -> None:
+    """
+    Replace the ledger with a full recomputation from the raw shares.
+    Use this to repair drift reported by check_ledger_consistency. Every rebuilt group gets a new
+    revision with a "group" change, so syncing clients refetch its balances. The caller commits.
+    :param db: The database session to use for the operation.
+    :param group_id: Only rebuild this group. Rebuilds every group when None.
+    """
+    balances, totals = await compute_ledger_from_shares(db, group_id)
+
+    delete_balances = delete(GroupBalance)
+    delete_totals = delete(GroupTotals)
+    if group_id is not None:
+        delete_balances = delete_balances.where(GroupBalance.group_id == group_id)
+        delete_totals = delete_totals.where(GroupTotals.group_id == group_id)
+    await db.execute(delete_balances)
+    await db.execute(delete_totals)
+
+    if balances:
+        await db.execute(insert(GroupBalance), [
+            {"group_id": key[0], "user_id": key[1], "total_paid": paid, "total_owed": owed}
+            for key, (paid, owed) in balances.items()
+        ])
+    if totals:
+        await db.execute(insert(GroupTotals), [
+            {"group_id": key, "member_count": members, "expense_count": count, "grand_total": total}
+            for key, (members, count, total) in totals.items()
+        ])
+
+    bump_revisions = (
+        update(Group)
+        .values(revision=Group.revision + 1) # repaired balances are a new version of the group
+        .returning(Group.id, Group.revision)
+    )
+    if group_id is not None:
+        bump_revisions = bump_revisions.where(Group.id == group_id)
+    bumped = (await db.execute(bump_revisions.execution_options(synchronize_session=False))).all()
+    if bumped:
+        await db.execute(insert(GroupChange), [
+            {"group_id": bumped_id, "rev": revision, "entity_type": "group", "entity_id": bumped_id}
+            for bumped_id, revision in bumped
+        ])
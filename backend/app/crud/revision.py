@@ -0,0 +1,140 @@
+from app.db.models import Group, GroupMember, GroupChange, Expense, ExpenseShares
+from app.schemas.group import GroupChanges, Group as GroupSchema, GroupMember as GroupMemberSchema
+from app.schemas.expense import Expense as ExpenseSchema, ExpenseShare
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, insert
+from typing import Optional
+from uuid import UUID
+
+CHANGE_ENTITY_TYPES = ("group", "member", "expense") # shares are logged through their expense
+
+
+async def bump_group_revision(db: AsyncSession, group_id: UUID) -> int:
+    """
+    Increment the revision of a group.
+    Must be called in the same transaction as the write it versions, after the ledger
+    updates so every writer locks rows in the same order; the caller commits.
+    :param db: The database session to use for the operation.
+    :param group_id: The ID of the group that changed.
+    :return: The new revision.
+    """
+    result = await db.execute(
+        update(Group)
+        .where(Group.id == group_id)
+        .values(revision=Group.revision + 1)
+        .returning(Group.revision)
+        .execution_options(synchronize_session=False)
+    )
+    return result.scalar_one()
+
+
+async def record_group_changes(db: AsyncSession, group_id: UUID, changes: list[tuple[str, UUID]]) -> int:
+    """
+    Bump the revision of a group and append the changed entities to its change log.
+    Same transaction rules as bump_group_revision; the caller commits.
+    :param db: The database session to use for the operation.
+    :param group_id: The ID of the group that changed.
+    :param changes: (entity type, entity ID) pairs, the type being one of CHANGE_ENTITY_TYPES.
+    :return: The new revision.
+    """
+    revision = await bump_group_revision(db, group_id)
+
+    if changes:
+        await db.execute(insert(GroupChange), [
+            {"group_id": group_id, "rev": revision, "entity_type": entity_type, "entity_id": entity_id}
+            for entity_type, entity_id in changes
+        ])
+
+    return revision
+
+
+async def get_group_revisions(db: AsyncSession, group_ids: list[UUID]) -> dict[UUID, int]:
+    """
+    Read the current revision of several groups.
+    :param db: The database session to use for the operation.
+    :param group_ids: The IDs of the groups.
+    :return: A dict mapping each existing group ID to its revision.
+    """
+    if not group_ids:
+        return {}
+
+    result = await db.execute(select(Group.id, Group.revision).where(Group.id.in_(group_ids)))
+    return dict(result.all())
+
+
+async def get_user_group_revisions(db: AsyncSession, user_id: UUID) -> list[tuple[UUID, int]]:
+    """
+    Read the revision of every group a user belongs to.
+    :param db: The database session to use for the operation.
+    :param user_id: The ID of the user.
+    :return: (group ID, revision) pairs ordered by group ID.
+    """
+    result = await db.execute(
+        select(Group.id, Group.revision)
+        .join(GroupMember, GroupMember.group_id == Group.id)
+        .where(GroupMember.user_id == user_id)
+        .order_by(Group.id)
+    )
+    return [(group_id, revision) for group_id, revision in result.all()]
+
+
+async def get_group_changes(db: AsyncSession, group_id: UUID, since: int) -> Optional[GroupChanges]:
+    """
+    Collect everything that changed in a group after a revision.
+    The high-water mark is read first and the log is bounded by it, so a write committed
+    while the changes are being read is picked up by the next sync instead of being lost.
+    :param db: The database session to use for the operation.
+    :param group_id: The ID of the group.
+    :param since: The revision the client already has, 0 for a full sync.
+    :return: The changed entities and the new high-water mark, or None if the group does not exist.
+    """
+    revisions = await get_group_revisions(db, [group_id])
+    if group_id not in revisions:
+        return None
+    revision = revisions[group_id]
+
+    if since >= revision:
+        return GroupChanges(revision=revision, group=None, members=[], expenses=[], shares=[])
+
+    def changed_entities(entity_type: str):
+        return select(GroupChange.entity_id).where(
+            GroupChange.group_id == group_id,
+            GroupChange.rev > since,
+            GroupChange.rev <= revision,
+            GroupChange.entity_type == entity_type,
+        )
+
+    result = await db.execute(
+        select(GroupChange.entity_type)
+        .where(
+            GroupChange.group_id == group_id,
+            GroupChange.rev > since,
+            GroupChange.rev <= revision,
+        )
+        .distinct()
+    )
+    changed_types = set(result.scalars())
+
+    group = None
+    if "group" in changed_types:
+        group = GroupSchema.model_validate(await db.get(Group, group_id), from_attributes=True)
+
+    members = []
+    if "member" in changed_types:
+        result = await db.execute(select(GroupMember).where(GroupMember.id.in_(changed_entities("member"))))
+        members = [GroupMemberSchema.model_validate(member, from_attributes=True) for member in result.scalars()]
+
+    expenses = []
+    shares = []
+    if "expense" in changed_types:
+        result = await db.execute(
+            select(Expense)
+            .where(Expense.id.in_(changed_entities("expense")))
+            .order_by(Expense.created_at, Expense.id)
+        )
+        expenses = [ExpenseSchema.model_validate(expense) for expense in result.scalars()]
+
+        result = await db.execute(select(ExpenseShares).where(ExpenseShares.expense_id.in_(changed_entities("expense"))))
+        shares = [ExpenseShare.model_validate(share, from_attributes=True) for share in result.scalars()]
+
+    return GroupChanges(revision=revision, group=group, members=members, expenses=expenses, shares=shares)
@@ -4,46 +4,39 @@ from app.db.models import User, Group, GroupMember
 from app.schemas.user import UserCreate, UserPasswordChange
 import uuid
 from typing import Optional
-from sqlalchemy import update
+from sqlalchemy import update, insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
-from app.utils.auth import hash_password, verify_password
+from app.utils.auth import hash_password_async, verify_password_async
+from app.utils.invalidation import invalidate_on_commit, user_key
+from app.utils.read_routing import set_session_user
+from app.utils.integrity import integrity_error_to_http
 
 
 async def create_user_in_db(db: AsyncSession, user: UserCreate) -> User:
     """
     Create a new user in the database.
+    The user is inserted with a single INSERT ... RETURNING; the unique indexes on username
+    and email reject a duplicate, which is answered with 409, even between concurrent signups.
     :param db: The database session to use for the operation.
     :param user: The UserCreate schema containing user details.
     :return: The created User object.
     """
-
-    # Check if the username or email already exists
-    existing_user = await db.execute(
-        select(User).where(
-            (User.email == user.email)
+    user_id = uuid.uuid4()
+    try:
+        new_user = await db.scalar(
+            insert(User).values(
+                id=user_id,
+                first_name=user.first_name,
+                last_name=user.last_name,
+                username=user.email,
+                email=user.email,
+                password=await hash_password_async(user.password),
+            ).returning(User)
         )
-    )
-
-    existing_user = existing_user.scalars().first() # Get the first matching user, if any
-
-    if existing_user:
-        raise ValueError("Username or email already exists.") # If the user already exists, raise an error
-    
-    
-    # Create a new User instance with hashed password
-    new_user = User(
-        id=str(uuid.uuid4()),
-        first_name=user.first_name,
-        last_name=user.last_name,
-        username=user.email,
-        email=user.email,
-        password=hash_password(user.password), 
-    )
-
-    # Add the new user to the session and commit
-    db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
+        set_session_user(db, user_id) # the replica may not have the user yet when they log in
+    except IntegrityError as e:
+        raise integrity_error_to_http(e)
     return new_user
 
 
@@ -89,15 +82,15 @@ async def update_password(db: AsyncSession, user: User, new_password_data: UserP
     :param new_password: The new password to set for the user.
     :return: The updated User object.
     """
-    if not verify_password(new_password_data.current_password, user.password):
+    if not await verify_password_async(new_password_data.current_password, user.password):
         raise ValueError("Current password is incorrect.")
     
-    new_hashed_password = hash_password(new_password_data.new_password)
+    new_hashed_password = await hash_password_async(new_password_data.new_password)
 
-    stmt = update(User).where(User.id == user.id).values(password=new_hashed_password)
+    stmt = update(User).where(User.id == user.id).values(password=new_hashed_password).returning(User)
 
-    await db.execute(stmt)
-    await db.commit()
-    await db.refresh(user)
-    
-    return user
\ No newline at end of file
+    result = await db.execute(stmt)
+    updated_user = result.scalar_one()
+    invalidate_on_commit(db, user_key(user.id)) # every worker's cached copy still holds the old password
+
+    return updated_user
\ No newline at end of file
@@ -1,17 +1,50 @@
+from fastapi import HTTPException, status
+from sqlalchemy import exc
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.future import select
 from sqlalchemy.schema import CreateTable
 from app.config.settings import settings
 from app.db.models import Base
 from typing import AsyncGenerator
+from contextlib import asynccontextmanager
+from app.utils.metrics import InstrumentedQueuePool, instrument_engine
+from app.utils.integrity import integrity_error_to_http
+
+def create_engine(url: str, name: str, **kwargs):
+    """
+    Create an engine with the pool settings and instrumentation shared by the primary and the replica.
+    :param url: The database URL.
+    :param name: The pool label reported in /metrics.
+    :param kwargs: Extra create_async_engine arguments.
+    :return: The AsyncEngine.
+    """
+    engine = create_async_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT, # How long a checkout waits before giving up
+        pool_pre_ping=settings.DB_POOL_PRE_PING,  # Validates connections before use
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,  # Recycle connections every hour by default
+        poolclass=InstrumentedQueuePool, # Times how long checkouts wait for a connection
+        connect_args={
+            "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE, # asyncpg's own cache
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE, # SQLAlchemy's asyncpg adapter cache
+        },
+        pool_logging_name=name,
+        **kwargs,
+    )
+    instrument_engine(engine) # statement counts and latency for /metrics
+    return engine
 
 # Create an asynchronous SQLAlchemy engine
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    pool_size=20,
-    max_overflow=0,
-    pool_pre_ping=True,  # Validates connections before use
-    pool_recycle=3600   # Recycle connections every hour
+engine = create_engine(settings.DATABASE_URL, "primary")
+
+# Reads that may lag behind writes go to the replica when READ_DATABASE_URL is set, in read-only transactions
+read_engine = (
+    create_engine(settings.READ_DATABASE_URL, "replica", execution_options={"postgresql_readonly": True})
+    if settings.READ_DATABASE_URL
+    else engine
 )
 
 # Create an asynchronous session factory
@@ -23,6 +56,14 @@ AsyncSessionLocal = async_sessionmaker(
     class_=AsyncSession # Use AsyncSession
 )
 
+ReadSessionLocal = async_sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine,
+    expire_on_commit=False,
+    class_=AsyncSession
+) if read_engine is not engine else AsyncSessionLocal
+
 async def init_db():
     """
     Initialize the database by creating all tables defined in the models.
@@ -33,13 +74,24 @@ async def init_db():
         await conn.run_sync(Base.metadata.create_all)
         print("Database tables initialized.")
 
-async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+@asynccontextmanager
+async def open_session(session_factory: async_sessionmaker) -> AsyncGenerator[AsyncSession, None]:
     """
-    Get a new database session.
-    This function should be used in dependency injection to provide a session
-    to route handlers.
+    Open a session for a request, rolled back if the request fails and always closed.
+    :param session_factory: AsyncSessionLocal, or ReadSessionLocal for the replica.
+    :return: The session, with its connection already checked out.
     """
-    async with AsyncSessionLocal() as session:
+    async with session_factory() as session:
+        try:
+            # check out the connection up front, so a saturated pool fails fast with a 503
+            # instead of surfacing as a 500 from whichever query happens to run first
+            await session.connection()
+        except exc.TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="The database is busy, please retry.",
+                headers={"Retry-After": "1"},
+            )
         try:
             yield session
         except Exception as e:
@@ -47,5 +99,16 @@ async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
             raise e
         finally:
             await session.close()
-# This function can be used in FastAPI route handlers to get a database session
-# and ensure it is properly closed after use.
+
+async def get_db_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Get the request's unit of work: one session and one transaction per request.
+    CRUD functions only flush; the transaction is committed once after the route returns,
+    before the response is sent, and rolled back instead if the route raises.
+    """
+    async with open_session(AsyncSessionLocal) as session:
+        yield session
+        try:
+            await session.commit()
+        except IntegrityError as e: # a write the route did not flush itself broke a constraint
+            raise integrity_error_to_http(e)
@@ -1,11 +1,11 @@
-from sqlalchemy import Column, String, ForeignKey, DateTime, Boolean, Float
+from sqlalchemy import Column, String, ForeignKey, DateTime, Boolean, Float, Integer, BigInteger
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy import text
 import string
 import secrets
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, Index
 
 
 Base = declarative_base() # Base class for SQLAlchemy models
@@ -38,6 +38,7 @@ class Group(Base):
     created_by = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())  # <-- add server_default
+    revision = Column(BigInteger, nullable=False, default=0, server_default=text("0"))  # bumped by every write to the group, see crud/revision.py
 
     members = relationship('GroupMember', back_populates='group')
     creator = relationship('User', back_populates='created_groups')
@@ -52,7 +53,10 @@ class Group(Base):
 # Model for the group membership table
 class GroupMember(Base):
     __tablename__ = 'group_members'
-    __table_args__ = (UniqueConstraint('group_id', 'user_id', name='uq_group_user'),)
+    __table_args__ = (
+        UniqueConstraint('group_id', 'user_id', name='uq_group_user'), # also serves lookups by group
+        Index('ix_group_members_user_id_group_id', 'user_id', 'group_id'), # groups of a user
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=text("gen_random_uuid()"), index=True)
     group_id = Column(UUID(as_uuid=True), ForeignKey('groups.id'), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
@@ -66,6 +70,9 @@ class GroupMember(Base):
 
 class Expense(Base):
     __tablename__ = 'expenses'
+    __table_args__ = (
+        Index('ix_expenses_group_id_created_at_id', 'group_id', 'created_at', 'id'), # expenses of a group, in listing order
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=text("gen_random_uuid()"), index=True)
     group_id = Column(UUID(as_uuid=True), ForeignKey('groups.id'), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
@@ -85,7 +92,10 @@ class Expense(Base):
 
 class ExpenseShares(Base):
     __tablename__ = 'expense_shares'
-    __table_args__ = (UniqueConstraint('expense_id', 'user_id', name='uq_expense_user'),)
+    __table_args__ = (
+        UniqueConstraint('expense_id', 'user_id', name='uq_expense_user'), # also serves lookups by expense
+        Index('ix_expense_shares_user_id_expense_id', 'user_id', 'expense_id'), # shares of a user
+    )
     id = Column(UUID(as_uuid=True), primary_key=True, default=text("gen_random_uuid()"), index=True)
     expense_id = Column(UUID(as_uuid=True), ForeignKey('expenses.id'), nullable=False)
     user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
@@ -98,4 +108,39 @@ class ExpenseShares(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())  # <-- add server_default
 
     expense = relationship('Expense', back_populates='shares')
-    user = relationship('User', back_populates='expense_shares')
\ No newline at end of file
+    user = relationship('User', back_populates='expense_shares')
+
+# Running balance of a user in a group, maintained in the same transaction as expense share writes
+class GroupBalance(Base):
+    __tablename__ = 'group_balances'
+    __table_args__ = (UniqueConstraint('group_id', 'user_id', name='uq_group_balance_user'),)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=text("gen_random_uuid()"), index=True)
+    group_id = Column(UUID(as_uuid=True), ForeignKey('groups.id'), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    total_paid = Column(Float, nullable=False, default=0)
+    total_owed = Column(Float, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Running totals of a group, maintained in the same transaction as expense and membership writes
+class GroupTotals(Base):
+    __tablename__ = 'group_totals'
+    group_id = Column(UUID(as_uuid=True), ForeignKey('groups.id'), primary_key=True)
+    member_count = Column(Integer, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+    grand_total = Column(Float, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Append-only log of what changed in a group at each revision, read by delta sync
+class GroupChange(Base):
+    __tablename__ = 'group_changes'
+    __table_args__ = (
+        Index('ix_group_changes_group_id_rev', 'group_id', 'rev'), # changes of a group since a revision
+    )
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    group_id = Column(UUID(as_uuid=True), ForeignKey('groups.id'), nullable=False)
+    rev = Column(BigInteger, nullable=False) # the group revision the change was committed at
+    entity_type = Column(String, nullable=False) # 'group', 'member' or 'expense' (shares travel with their expense)
+    entity_id = Column(UUID(as_uuid=True), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,95 @@
+import asyncio
+import uuid
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.config.settings import settings
+from app.crud.group import get_group_expense_rows
+from app.crud.ledger import get_group_totals, get_user_balances, get_group_balances
+from app.crud.revision import get_group_revisions, get_user_group_revisions
+from app.crud.user import get_user_by_id, get_user_by_username
+
+ALEMBIC_DIR = Path(__file__).resolve().parents[3] / "alembic" # the migration scripts next to backend/
+
+
+def expected_schema_revisions() -> set[str]:
+    """
+    :return: DB_SCHEMA_REVISION if it is set, otherwise the heads of the Alembic migration scripts.
+    """
+    if settings.DB_SCHEMA_REVISION:
+        return {settings.DB_SCHEMA_REVISION}
+
+    from alembic.script import ScriptDirectory # only needed when the revision is not pinned in the settings
+    return set(ScriptDirectory(str(ALEMBIC_DIR)).get_heads())
+
+
+async def verify_schema_revision(engine: AsyncEngine) -> str:
+    """
+    Check that the database has been migrated to the expected Alembic revision, without touching the schema.
+    :param engine: The engine of the primary database.
+    :return: The revision the database is at.
+    :raises RuntimeError: If the database is not at the expected revision or was never stamped by Alembic.
+    """
+    expected = expected_schema_revisions()
+    async with engine.connect() as conn:
+        try:
+            current = set((await conn.execute(text("SELECT version_num FROM alembic_version"))).scalars())
+        except DBAPIError: # no alembic_version table, the database was never migrated
+            current = set()
+
+    if current != expected:
+        raise RuntimeError(
+            f"The database is at revision {', '.join(sorted(current)) or 'none'}, expected {', '.join(sorted(expected))}. "
+            "Run `alembic upgrade head` before starting the application."
+        )
+    return ", ".join(sorted(current))
+
+
+async def run_hot_reads(db: AsyncSession) -> None:
+    """
+    Run the reads most requests start with, for IDs that do not exist.
+    This compiles the statements into SQLAlchemy's cache and prepares them on the session's connection.
+    :param db: A session bound to the connection to warm.
+    """
+    missing = uuid.uuid4()
+    await get_user_by_id(db, missing)
+    await get_user_by_username(db, "")
+    await get_group_revisions(db, [missing])
+    await get_user_group_revisions(db, missing)
+    await get_group_totals(db, [missing])
+    await get_user_balances(db, [missing], missing)
+    await get_group_balances(db, missing)
+    await get_group_expense_rows(db, [missing])
+
+
+async def warm_connections(engine: AsyncEngine, count: int) -> int:
+    """
+    Open pool connections ahead of the first requests and run the hot reads on each of them.
+    All connections are checked out at the same time, so each one is a distinct new connection.
+    :param engine: The engine whose pool to fill.
+    :param count: How many connections to open, capped at the pool size.
+    :return: The number of connections opened.
+    """
+    count = min(count, engine.pool.size())
+    if count <= 0:
+        return 0
+
+    async def warm(conn):
+        async with AsyncSession(bind=conn) as db:
+            await run_hot_reads(db)
+
+    connections = [engine.connect() for _ in range(count)]
+    started = await asyncio.gather(*(conn.start() for conn in connections), return_exceptions=True)
+    opened = [conn for conn, result in zip(connections, started) if not isinstance(result, BaseException)]
+    try:
+        for result in started:
+            if isinstance(result, BaseException):
+                raise result
+        await asyncio.gather(*(warm(conn) for conn in opened))
+    finally:
+        for conn in opened:
+            await conn.close() # back to the pool, which keeps up to its size open
+    return count
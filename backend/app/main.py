@@ -1,13 +1,26 @@
+from time import perf_counter
+IMPORTS_STARTED = perf_counter() # startup timing starts before the imports below
+
 from fastapi import FastAPI, Depends, HTTPException, status
 from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.config.settings import settings
-from app.db.database import get_db_session, init_db
+from app.config.settings import settings, SETTINGS_LOAD_SECONDS
+from app.db.database import engine, read_engine, get_db_session, init_db
+from app.utils.auth import shutdown_password_executor
+from app.utils.invalidation import invalidation_bus
 from app.db.models import User, Group, GroupMember
-from app.routers import user, group, expense
+from app.routers import user, group, expense, events
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
+from app.utils.metrics import MetricsMiddleware, registry, CONTENT_TYPE
+from app.utils.query_guard import QueryGuardMiddleware, install_query_guard
+from app.db.startup import verify_schema_revision, warm_connections
+from app.utils.startup import startup_timer
+
+startup_timer.record("imports", perf_counter() - IMPORTS_STARTED - SETTINGS_LOAD_SECONDS)
+startup_timer.record("settings", SETTINGS_LOAD_SECONDS)
 
 origins = [
     "http://localhost:3000",  # Your React app
@@ -20,10 +33,26 @@ async def lifespan(app: FastAPI):
     Application lifespan event handler to initialize the database at startup.
     This function is called when the application starts and ensures that the
     database is initialized before handling any requests.
+    With DB_STARTUP_MODE=verify the schema is only checked against the Alembic head,
+    and DB_WARM_CONNECTIONS connections are opened and warmed before the first request.
     """
-    print("Application startup: Initializing database...")
-    await init_db() # Call your synchronous init_db() function
-    print("Application startup: Database initialized.")
+    with startup_timer.phase("db"):
+        if settings.DB_STARTUP_MODE == "verify":
+            revision = await verify_schema_revision(engine) # fails the startup if migrations are missing
+            print(f"Application startup: Database is at revision {revision}.")
+        elif settings.DB_STARTUP_MODE == "create_all":
+            print("Application startup: Initializing database...")
+            await init_db() # Call your synchronous init_db() function
+            print("Application startup: Database initialized.")
+        else:
+            raise ValueError(f"Unknown DB_STARTUP_MODE '{settings.DB_STARTUP_MODE}', expected 'create_all' or 'verify'.")
+        await invalidation_bus.start() # receive cache invalidations from the other workers
+
+    with startup_timer.phase("warm-up"):
+        warmed = await warm_connections(engine, settings.DB_WARM_CONNECTIONS)
+        if read_engine is not engine:
+            warmed += await warm_connections(read_engine, settings.DB_WARM_CONNECTIONS)
+    print(f"Application startup: Ready with {warmed} warm connections, {startup_timer.summary()}")
 
     # You could potentially load AI models here and store them on app.state
     # For example:
@@ -38,6 +67,8 @@ async def lifespan(app: FastAPI):
     # If you had global resources (like a shared AI model instance)
     # that needed explicit closing or releasing, you'd do it here.
     # For database connections managed by `get_db`, explicit closing isn't usually needed here.
+    await invalidation_bus.stop()
+    shutdown_password_executor()
     print("Application shutdown: Resources cleaned.")
 
 app = FastAPI(
@@ -47,19 +78,37 @@ app = FastAPI(
     lifespan=lifespan,  # Register the lifespan event handler
 )
 
+app.add_middleware(MetricsMiddleware) # added first so it is the innermost middleware and sees the matched route
+
+if settings.QUERY_GUARD != "off":
+    install_query_guard(engine)
+    if read_engine is not engine:
+        install_query_guard(read_engine)
+    app.add_middleware(QueryGuardMiddleware, repeat_limit=settings.QUERY_GUARD_REPEAT_LIMIT, raise_errors=settings.QUERY_GUARD == "raise")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],  # Lets the frontend read the pagination cursor and ETag
 )
 
 # Include routers for user and group management
 app.include_router(user.router, prefix="/api/v1", tags=["users"])
 app.include_router(group.router, prefix="/api/v1", tags=["groups"])
 app.include_router(expense.router, prefix="/api/v1", tags=["expenses"])
+app.include_router(events.router, prefix="/api/v1", tags=["events"])
 
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the FastAPI application!"}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """
+    Expose request, SQL and pool metrics in the Prometheus text format.
+    Async so rendering runs on the event loop, which is also the only writer of the metrics.
+    """
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from typing import AsyncIterator
+from app.db.database import get_db_session
+from app.db.models import User, GroupMember
+from app.utils.dependencies import get_current_user_for_stream
+from app.utils.events import event_broker, Subscription
+from app.config.settings import settings
+
+router = APIRouter()
+
+HEARTBEAT = b": keep-alive\n\n" # an SSE comment, ignored by EventSource but keeps proxies from closing the connection
+
+
+async def stream_events(subscription: Subscription) -> AsyncIterator[bytes]:
+    """
+    Send the events of a subscription until the client disconnects or is dropped for being too slow.
+    :param subscription: The subscription to drain.
+    :return: An async iterator of encoded events.
+    """
+    try:
+        yield b"retry: 5000\n\n" # reconnect delay for EventSource, in milliseconds
+        while not subscription.finished:
+            event = await subscription.next_event(settings.EVENT_HEARTBEAT_SECONDS)
+            yield HEARTBEAT if event is None else event
+    finally:
+        event_broker.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def get_events(db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user_for_stream)):
+    """
+    Stream expense_created and balance_changed events for the groups the user belongs to.
+    This endpoint is a server-sent event stream. Groups joined after connecting are picked up on reconnect,
+    and a client that falls too far behind receives a resync event and should catch up with
+    /groups/{group_id}/changes before reconnecting.
+    """
+    result = await db.execute(
+        select(GroupMember.group_id).where(GroupMember.user_id == current_user.id)
+    )
+    group_ids = result.scalars().all()
+    await db.close() # the stream is long lived, do not hold a pooled connection for it
+
+    subscription = event_broker.subscribe(group_ids)
+    return StreamingResponse(
+        stream_events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,24 +1,34 @@
 from fastapi import APIRouter
-from app.schemas.expense import ExpenseCreate, ExpenseUpdate, ExpenseResponse, ExpenseShare, Expense as ExpenseSchema
-from app.utils.dependencies import get_current_user
-from app.db.models import User, Expense, Group
-from fastapi import HTTPException, Depends, Path, status
+from app.schemas.expense import ExpenseCreate, ExpenseUpdate, ExpenseResponse, ExpenseShare, Expense as ExpenseSchema, ExpenseImportResult
+from app.utils.dependencies import get_current_user, get_read_db_session, get_current_user_for_read
+from app.utils.query_guard import query_budget
+from app.db.models import User, Expense, GroupMember
+from fastapi import HTTPException, Depends, Path, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db_session
 from uuid import UUID
-from app.crud.expense import create_expense_in_db, create_expense_share_in_db
-from app.schemas.expense import ExpenseSharesCreate
-from app.db.models import ExpenseShares
+from app.crud.expense import create_expense_in_db, build_expense_shares, import_expenses_in_db, stream_group_export
+from fastapi.responses import StreamingResponse
+from app.crud.ledger import get_user_balances
 from app.utils.dependencies import get_current_user
 from app.db.models import User
-from sqlalchemy import select, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, func, tuple_
+from app.utils.split import compute_split
+from app.utils.bulk_import import parse_import_rows
+from app.utils.pagination import encode_cursor, decode_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.etag import conditional_response
+from app.crud.revision import get_group_revisions
+from app.utils.sparse_fields import parse_fields
+from app.utils.responses import ORJSONResponse, fast_json_response
+from typing import Optional
+from datetime import datetime
 
 
 
 router = APIRouter()
 
 @router.post("/expenses/create/{group_id}", response_model=ExpenseResponse, status_code=status.HTTP_201_CREATED)
+@query_budget(8)
 async def create_expense(expense: ExpenseCreate, group_id: UUID, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     """
     Create a new expense.
@@ -26,53 +36,22 @@ async def create_expense(expense: ExpenseCreate, group_id: UUID, db: AsyncSessio
     """
     try:
         participants = expense.participants
-        splits = expense.splits
 
         if not participants: # ensures there are participants
             raise HTTPException(status_code=400, detail="No participants provided.")
 
-        new_expense = await create_expense_in_db(db, expense, current_user, group_id) # Call the create_expense_in_db function from crud.py
-        
-        shares_to_create = [] # the number of share that swill be ceated
-
-
-        if expense.split_method == "equal":
-            amount_per_person = round(new_expense.amount / len(participants), 2)
-            for user_id in participants:
-                # if the current user id is equal to the user_id
-                if user_id == current_user.id:
-                    share = await create_expense_share_in_db(db, ExpenseSharesCreate(amount_owed=amount_per_person, amount_paid=new_expense.amount, settled=True), user_id, new_expense.id)
-                else:
-                    share = await create_expense_share_in_db(db, ExpenseSharesCreate(amount_owed=amount_per_person, amount_paid=0, settled=False), user_id, new_expense.id)
-                shares_to_create.append(share)
-
-        elif expense.split_method == "percent":
-            if not splits or len(splits) != len(participants):
-                raise HTTPException(status_code=400, detail="Invalid percent splits.")
-
-            for user_id, percent in zip(participants, splits):
-                amount_owed = round(new_expense.amount * percent / 100, 2)
-                share = await create_expense_share_in_db(db, ExpenseSharesCreate(amount_owed=amount_owed, amount_paid=0, settled=False), user_id, new_expense.id)
-                shares_to_create.append(share)
-
-        elif expense.split_method == "custom":
-            if not splits or len(splits) != len(participants):
-                raise HTTPException(status_code=400, detail="Invalid custom shares.")
+        # split the amount in whole cents, raises ValueError for invalid splits
+        splits = compute_split(expense.amount, participants, expense.split_method, expense.splits)
+        amount_per_person = round(expense.amount / len(participants), 2)
 
-            for user_id, amount_owed in zip(participants, splits):
-                share = await create_expense_share_in_db(db, ExpenseSharesCreate(amount_owed=amount_owed, amount_paid=0, settled=False), user_id, new_expense.id)
-                shares_to_create.append(share)
+        shares_to_create = build_expense_shares(splits, expense.amount, current_user.id) # the shares that will be created, keyed by user
 
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported split method.")
-
-        paid_by = await db.execute(select(User).where(User.id == new_expense.user_id))
-        paid_by = paid_by.scalar_one_or_none()
+        new_expense = await create_expense_in_db(db, expense, current_user, group_id, shares_to_create) # writes the expense and its shares in one transaction
 
         return ExpenseResponse(
             id=new_expense.id,
             name=new_expense.name,
-            paid_by=paid_by.first_name + " " + paid_by.last_name,
+            paid_by=current_user.first_name + " " + current_user.last_name,
             split_count=len(participants),
             date=new_expense.created_at,
             amount=new_expense.amount,
@@ -88,7 +67,66 @@ async def create_expense(expense: ExpenseCreate, group_id: UUID, db: AsyncSessio
         )
 
 
+@router.post("/expenses/import/{group_id}", response_model=ExpenseImportResult, status_code=status.HTTP_200_OK)
+@query_budget(2, per_chunk=3) # the ledger and revision updates of each chunk, its COPY goes through the driver
+async def import_expenses(
+    group_id: UUID,
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Bulk import expenses into a group from a CSV or NDJSON upload.
+    The request body is streamed and validated row by row. CSV uploads need a header with
+    name, amount, expense_type, split_method and participants columns, and optionally splits,
+    settled, paid_by and created_at; participants and splits are separated by semicolons.
+    Invalid rows, including lines that are not valid UTF-8, are skipped and reported with
+    their row number. An upload that cannot be read further after a chunk was committed
+    returns the imported count and the reason in `error` rather than a 400.
+    """
+    try:
+        rows = parse_import_rows(request.stream(), format)
+        return await import_expenses_in_db(db, group_id, rows, current_user)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+@router.get("/expenses/export/{group_id}", status_code=status.HTTP_200_OK)
+@query_budget(3)
+async def export_expenses(
+    group_id: UUID,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_db_session),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Export the full expense and share history of a group as CSV or NDJSON.
+    The export is streamed with one row per expense share, so it works for groups of any size.
+    """
+    is_member_check = await db.execute(
+        select(GroupMember.id).where(
+            GroupMember.group_id == group_id,
+            GroupMember.user_id == current_user.id
+        )
+    )
+    if is_member_check.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="User is not a member of this group")
+
+    return StreamingResponse(
+        stream_group_export(group_id, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="expenses-{group_id}.{format}"'},
+    )
+
+
 @router.get("/get/expense/{expense_id}", response_model=ExpenseSchema, status_code=status.HTTP_200_OK)
+@query_budget(2)
 async def get_expense(expense_id: UUID, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     """
     Retrieve a specific expense by its ID.
@@ -104,50 +142,120 @@ async def get_expense(expense_id: UUID, db: AsyncSession = Depends(get_db_sessio
             detail=str(e)
         )
 
-@router.get("/get/expense/all/{group_id}", response_model=list[ExpenseResponse], status_code=status.HTTP_200_OK)
-async def get_all_expenses(group_id: UUID, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+@router.get("/get/expense/all/{group_id}", response_model=list[ExpenseResponse], response_class=ORJSONResponse, status_code=status.HTTP_200_OK)
+@query_budget(4)
+async def get_all_expenses(
+    group_id: UUID,
+    request: Request,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    expense_type: Optional[str] = Query(None),
+    paid_by: Optional[UUID] = Query(None),
+    fields: Optional[str] = Query(None, description="Comma-separated ExpenseResponse fields to return"),
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: User = Depends(get_current_user_for_read)
+):
     """
-    Retrieve all expenses for a specific group.
-    This endpoint allows the authenticated user to retrieve all expenses for a specific group.
+    Retrieve a page of expenses for a specific group, newest first.
+    This endpoint allows the authenticated user to retrieve the expenses for a specific group.
+    Pages are keyset paginated on (created_at, id): when more expenses are available the
+    cursor for the next page is returned in the X-Next-Cursor header.
+    The page is tagged with an ETag derived from the group revision; a matching
+    If-None-Match is answered with 304 before any expense is read.
+    With `fields`, the payer join and the member count are skipped unless a requested field needs them.
     """
     try:
-        # get the group
-        group_stmt = select(Group).options(selectinload(Group.members)).where(Group.id == group_id)
-        group_result = await db.execute(group_stmt)
-        group = group_result.scalar_one_or_none()
+        selected_fields = parse_fields(fields, ExpenseResponse)
+        needs_split_count = bool(selected_fields & {"split_count", "amount_per_person"})
 
-        if not group:
+        revisions = await get_group_revisions(db, [group_id])
+        if group_id not in revisions: # the group does not exist
             return []
 
-        split_count = len(group.members) if group.members else 1 # if the group has no members, the split count is 1
+        not_modified = conditional_response(request, response, "expenses", group_id, revisions[group_id])
+        if not_modified is not None:
+            return not_modified
+
+        split_count = None
+        if needs_split_count:
+            # the split count is the number of members in the group
+            member_count_result = await db.execute(
+                select(func.count(GroupMember.id)).where(GroupMember.group_id == group_id)
+            )
+            member_count = member_count_result.scalar()
+
+            if not member_count: # the group does not exist
+                return []
+
+            split_count = member_count
+
+        # get a page of expenses for the group, with the name of the user who paid if it was asked for
+        expense_stmt = (
+            select(
+                Expense.id,
+                Expense.name,
+                Expense.amount,
+                Expense.expense_type,
+                Expense.split_method,
+                Expense.created_at,
+            )
+            .where(Expense.group_id == group_id)
+        )
+        if "paid_by" in selected_fields:
+            expense_stmt = expense_stmt.add_columns(User.first_name, User.last_name).join(User, User.id == Expense.user_id)
+
+        if start_date is not None:
+            expense_stmt = expense_stmt.where(Expense.created_at >= start_date)
+        if end_date is not None:
+            expense_stmt = expense_stmt.where(Expense.created_at < end_date)
+        if expense_type is not None:
+            expense_stmt = expense_stmt.where(Expense.expense_type == expense_type)
+        if paid_by is not None:
+            expense_stmt = expense_stmt.where(Expense.user_id == paid_by)
+        if cursor is not None:
+            cursor_created_at, cursor_id = decode_cursor(cursor)
+            expense_stmt = expense_stmt.where(
+                tuple_(Expense.created_at, Expense.id) < tuple_(cursor_created_at, cursor_id)
+            )
 
-        # get all expenses for the group
-        expense_stmt = select(Expense).where(Expense.group_id == group_id)
+        expense_stmt = (
+            expense_stmt
+            .order_by(Expense.created_at.desc(), Expense.id.desc())
+            .limit(limit + 1) # fetch one extra row to know if there is a next page
+        )
         expense_result = await db.execute(expense_stmt)
-        expenses = expense_result.scalars().all()
+        rows = expense_result.all()
+
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = encode_cursor(rows[-1].created_at, rows[-1].id)
 
         response_data = []
 
-        for expense in expenses:
-            amount_per_person = expense.amount / split_count # calculate the amount per person
-
-            # get the user who paid the expense
-            paid_by = await db.execute(select(User).where(User.id == expense.user_id))
-            paid_by = paid_by.scalar_one_or_none()
-            
-            response_data.append(ExpenseResponse( # append the expense to the response data
-                id=expense.id,
-                name=expense.name,
-                paid_by=paid_by.first_name + " " + paid_by.last_name,
-                split_count=split_count,
-                date=expense.created_at,
-                amount=expense.amount,
-                expense_type=expense.expense_type,
-                split_method=expense.split_method,
-                amount_per_person=amount_per_person
-            ))
-        
-        return response_data
+        for row in rows:
+            expense = {"id": row.id} # append the requested fields of the expense to the response data
+            if "name" in selected_fields:
+                expense["name"] = row.name
+            if "paid_by" in selected_fields:
+                expense["paid_by"] = row.first_name + " " + row.last_name
+            if "split_count" in selected_fields:
+                expense["split_count"] = split_count
+            if "date" in selected_fields:
+                expense["date"] = row.created_at
+            if "amount" in selected_fields:
+                expense["amount"] = row.amount
+            if "expense_type" in selected_fields:
+                expense["expense_type"] = row.expense_type
+            if "split_method" in selected_fields:
+                expense["split_method"] = row.split_method
+            if "amount_per_person" in selected_fields:
+                expense["amount_per_person"] = row.amount / split_count # calculate the amount per person
+            response_data.append(expense)
+
+        return fast_json_response(response_data, response) # rows from the database, no need to validate them again
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -155,17 +263,23 @@ async def get_all_expenses(group_id: UUID, db: AsyncSession = Depends(get_db_ses
         )
 
 async def calculate_user_balance(db: AsyncSession, group_id: UUID, user_id: UUID) -> float:
-    stmt = (
-        select(
-            func.coalesce(func.sum(ExpenseShares.amount_paid), 0),
-            func.coalesce(func.sum(ExpenseShares.amount_owed), 0),
-        )
-        .join(ExpenseShares.expense)
-        .where(ExpenseShares.user_id == user_id)
-        .where(Expense.group_id == group_id)
-    )
-    result = await db.execute(stmt)
-    total_paid, total_owed = result.one()
+    """
+    Look up the balance of a user in a group in the balance ledger.
+    :param db: The database session to use for the operation.
+    :param group_id: The ID of the group.
+    :param user_id: The ID of the user.
+    :return: The amount the user paid minus the amount the user owes.
+    """
+    balances = await get_user_balances(db, [group_id], user_id)
+    return balances.get(group_id, 0)
+
 
-    balance = round(total_paid - total_owed, 2)
-    return balance
\ No newline at end of file
+async def calculate_user_balances(db: AsyncSession, group_ids: list[UUID], user_id: UUID) -> dict[UUID, float]:
+    """
+    Look up the balance of a user in several groups in the balance ledger with a single query.
+    :param db: The database session to use for the operation.
+    :param group_ids: The IDs of the groups to calculate the balance for.
+    :param user_id: The ID of the user.
+    :return: A dict mapping each group ID to the user's balance. Groups without shares are omitted.
+    """
+    return await get_user_balances(db, group_ids, user_id)
@@ -1,24 +1,34 @@
 from fastapi import APIRouter
 from app.crud.group import create_group_in_db, get_group_by_id, update_group_in_db, get_group_members_in_db
 from app.schemas.group import GroupCreate, GroupUpdate, Group, InviteCode, GroupOut
-from app.schemas.expense import Expense as ExpenseSchema
-from app.utils.dependencies import get_current_user
+from app.utils.dependencies import get_current_user, get_read_db_session, get_current_user_for_read
+from app.utils.query_guard import query_budget
 from app.db.models import User
-from fastapi import HTTPException, Depends, Path, status
+from fastapi import HTTPException, Depends, Path, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db_session
 from uuid import UUID
-from app.crud.group import add_member_to_group_in_db, get_all_groups_in_db
+from app.crud.group import add_member_to_group_in_db, get_all_groups_in_db, build_group_outputs, GROUP_SUMMARY_FIELDS
 from app.schemas.group import GroupMember
-from app.db.models import Expense, GroupMember as GroupMemberModel, Group as GroupModel
-from sqlalchemy import select, func
+from app.db.models import GroupMember as GroupMemberModel, Group as GroupModel
+from sqlalchemy import select
 from sqlalchemy.orm import selectinload
-from app.routers.expense import calculate_user_balance
+from app.crud.ledger import get_group_balances
+from app.schemas.group import SettleUpTransfer
+from app.utils.settle_up import settle_up
+from app.utils.etag import conditional_response
+from app.crud.revision import get_user_group_revisions, get_group_changes
+from app.schemas.group import GroupChanges
+from app.utils.responses import ORJSONResponse, fast_json_response
+from app.utils.sparse_fields import parse_fields
+from app.utils.pagination import MAX_PAGE_SIZE
+from typing import Optional
 
 router = APIRouter()
 
 
 @router.post("/groups/create", response_model=Group, status_code=status.HTTP_201_CREATED)
+@query_budget(6)
 async def create_group(group: GroupCreate, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     """
     Create a new group.
@@ -35,6 +45,7 @@ async def create_group(group: GroupCreate, db: AsyncSession = Depends(get_db_ses
         )
 
 @router.put("/groups/update/{group_id}", response_model=Group)
+@query_budget(4)
 async def update_group(group_id: UUID, group: GroupUpdate, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     """
     Update a group.
@@ -50,38 +61,41 @@ async def update_group(group_id: UUID, group: GroupUpdate, db: AsyncSession = De
         )
 
 
-@router.get("/groups/single/{group_id}", response_model=GroupOut)
-async def get_group(group_id: UUID, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+@router.get("/groups/single/{group_id}", response_model=GroupOut, response_class=ORJSONResponse)
+@query_budget(5)
+async def get_group(
+    group_id: UUID,
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated GroupOut fields to return, or `summary` for all but the expenses"),
+    expenses_limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Only embed the newest expenses"),
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: User = Depends(get_current_user_for_read)
+):
     """
     Retrieve a group by its ID.
     This endpoint allows the authenticated user to retrieve a group by its ID.
+    Answers 304 when If-None-Match carries the ETag of the current group revision.
+    The expenses are read as Core rows and written straight to JSON, without ORM entities
+    or a second validation against GroupOut. Fields left out with `fields` are not queried.
     """
     try:
-        group = await db.get(GroupModel, group_id)
-    
-        result = await db.execute(
-            select(Expense).where(Expense.group_id == group.id)
-        )
-        expenses = result.scalars().all()
+        selected_fields = parse_fields(fields, GroupOut, GROUP_SUMMARY_FIELDS)
 
-        member_count_result = await db.execute(
-            select(func.count(GroupMemberModel.user_id)).where(GroupMemberModel.group_id == group.id)
+        result = await db.execute(
+            select(GroupModel.id, GroupModel.name, GroupModel.description, GroupModel.revision)
+            .where(GroupModel.id == group_id)
         )
-        member_count = member_count_result.scalar()
-
-        grand_total = sum(exp.amount for exp in expenses)
+        group = result.one_or_none()
+        if group is None:
+            raise HTTPException(status_code=404, detail=f"Group '{group_id}' not found.")
 
-        balance = await calculate_user_balance(db, group_id, current_user.id)
+        not_modified = conditional_response(request, response, "group", group.id, group.revision, current_user.id)
+        if not_modified is not None:
+            return not_modified
 
-        return GroupOut(
-            id=group.id,
-            name=group.name,
-            description=group.description,
-            member_count=member_count,
-            expenses=[ExpenseSchema.model_validate(exp) for exp in expenses],
-            grand_total=grand_total,
-            balance=balance
-        )
+        group_outputs = await build_group_outputs(db, [group], current_user.id, selected_fields, expenses_limit)
+        return fast_json_response(group_outputs[0], response)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -89,6 +103,7 @@ async def get_group(group_id: UUID, db: AsyncSession = Depends(get_db_session),
         )
 
 @router.post("/groups/join", response_model=GroupMember)
+@query_budget(5)
 async def add_member_to_group(invite_code: InviteCode, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     """
     Add a member to a group.
@@ -105,7 +120,8 @@ async def add_member_to_group(invite_code: InviteCode, db: AsyncSession = Depend
 
 # get all member from a group
 @router.get("/groups/get-members/{group_id}", response_model=list[GroupMember])
-async def get_group_members(group_id: UUID, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+@query_budget(3)
+async def get_group_members(group_id: UUID, db: AsyncSession = Depends(get_read_db_session), current_user: User = Depends(get_current_user_for_read)):
     """
     Retrieve all members of a group.
     This endpoint allows the authenticated user to retrieve all members of a group.
@@ -119,17 +135,87 @@ async def get_group_members(group_id: UUID, db: AsyncSession = Depends(get_db_se
             detail=str(e)
         )
 
-@router.get("/groups/all", response_model=list[GroupOut])
-async def get_all_groups(db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+@router.get("/groups/all", response_model=list[GroupOut], response_class=ORJSONResponse)
+@query_budget(6)
+async def get_all_groups(
+    request: Request,
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated GroupOut fields to return, or `summary` for all but the expenses"),
+    expenses_limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Only embed the newest expenses of each group"),
+    db: AsyncSession = Depends(get_read_db_session),
+    current_user: User = Depends(get_current_user_for_read)
+):
     """
     Retrieve all groups.
     This endpoint allows the authenticated user to retrieve all groups.
+    Answers 304 when If-None-Match carries the ETag of the current revisions of the user's groups.
+    A dashboard can ask for fields=summary to get the counts, totals and balances without any expense.
+    """
+    try:
+        selected_fields = parse_fields(fields, GroupOut, GROUP_SUMMARY_FIELDS)
+
+        revisions = await get_user_group_revisions(db, current_user.id)
+        not_modified = conditional_response(request, response, "groups", current_user.id, revisions)
+        if not_modified is not None:
+            return not_modified
+
+        groups = await get_all_groups_in_db(db, current_user, selected_fields, expenses_limit) # Call the get_all_groups_in_db function from crud.py
+        return fast_json_response(groups, response) # already shaped like GroupOut, skip validating it again
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@router.get("/groups/{group_id}/settle-up", response_model=list[SettleUpTransfer])
+@query_budget(3)
+async def get_settle_up(group_id: UUID, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+    """
+    Compute who should pay whom to settle a group.
+    This endpoint turns the net balances of the group members into a minimal set of transfers.
     """
     try:
-        groups = await get_all_groups_in_db(db, current_user) # Call the get_all_groups_in_db function from crud.py
-        return groups
+        is_member_check = await db.execute(
+            select(GroupMemberModel.id).where(
+                GroupMemberModel.group_id == group_id,
+                GroupMemberModel.user_id == current_user.id
+            )
+        )
+        if is_member_check.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="User is not a member of this group")
+
+        balances = await get_group_balances(db, group_id) # net balance of every member from the ledger
+        return settle_up(balances)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
-        )
\ No newline at end of file
+        )
+
+@router.get("/groups/{group_id}/changes", response_model=GroupChanges)
+@query_budget(8)
+async def get_changes(group_id: UUID, since: int = Query(0, ge=0), db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+    """
+    Retrieve what changed in a group after a revision.
+    This endpoint returns the expenses, shares and memberships created or modified after `since`,
+    plus the revision to pass as `since` on the next sync. Use since=0 for a full sync.
+    """
+    try:
+        is_member_check = await db.execute(
+            select(GroupMemberModel.id).where(
+                GroupMemberModel.group_id == group_id,
+                GroupMemberModel.user_id == current_user.id
+            )
+        )
+        if is_member_check.scalar_one_or_none() is None:
+            raise HTTPException(status_code=404, detail="User is not a member of this group")
+
+        changes = await get_group_changes(db, group_id, since)
+        if changes is None:
+            raise HTTPException(status_code=404, detail="Group not found")
+        return changes
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
@@ -6,14 +6,16 @@ from app.db.models import User
 from app.schemas.user import UserCreate, UserUpdate, User, UserPasswordChange
 from app.crud.user import create_user_in_db as create_user, get_user_by_username, update_password, get_user_by_id
 from fastapi.security import OAuth2PasswordRequestForm
-from app.utils.auth import create_access_token, verify_password
-from app.utils.dependencies import get_current_user
+from app.utils.auth import create_access_token, verify_password_async
+from app.utils.dependencies import get_current_user, get_read_db_session, get_current_user_for_read
+from app.utils.query_guard import query_budget
 from uuid import UUID
 
 
 router = APIRouter()
 
 @router.post("/register", response_model=User, status_code=status.HTTP_201_CREATED)
+@query_budget(2)
 async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db_session)):
     """
     Create a new user in the system.
@@ -41,6 +43,7 @@ async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db_sess
     
 
 @router.post("/login")
+@query_budget(2)
 async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db_session)):
     """
     Authenticate a user and return an access token.
@@ -48,8 +51,9 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Async
     and returns a JWT access token if the credentials are valid.
     """
     user = await get_user_by_username(db, form_data.username) # Retrieve user by id
+    await db.close() # return the connection to the pool while bcrypt runs
 
-    if not user or not verify_password(form_data.password, user.password): # Verify the user's password
+    if not user or not await verify_password_async(form_data.password, user.password): # Verify the user's password
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
@@ -61,6 +65,7 @@ async def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Async
 
 
 @router.get("/me", response_model=User)
+@query_budget(2)
 async def get_current_user(db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     """
     Retrieve the current authenticated user.
@@ -69,7 +74,8 @@ async def get_current_user(db: AsyncSession = Depends(get_db_session), current_u
     return current_user
 
 @router.get("/users/single/{user_id}", response_model=User)
-async def get_user(user_id: UUID, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
+@query_budget(2)
+async def get_user(user_id: UUID, db: AsyncSession = Depends(get_read_db_session), current_user: User = Depends(get_current_user_for_read)):
     """
     Retrieve a user by their ID.
     This endpoint allows the authenticated user to retrieve a user by their ID.
@@ -85,6 +91,7 @@ async def get_user(user_id: UUID, db: AsyncSession = Depends(get_db_session), cu
 
 
 @router.post("/change-password", response_model=User, status_code=status.HTTP_200_OK)
+@query_budget(2)
 async def change_password(password_data: UserPasswordChange, db: AsyncSession = Depends(get_db_session), current_user: User = Depends(get_current_user)):
     """
     Change the password for the current user.
@@ -13,6 +13,20 @@ class ExpenseCreate(BaseModel):
     participants: list[UUID] = Field(...)
     splits: Optional[list[float]] = Field(None)
 
+class ExpenseImportRow(ExpenseCreate):
+    paid_by: Optional[UUID] = Field(None) # defaults to the user running the import
+    created_at: Optional[datetime] = Field(None) # defaults to the time of the import
+
+class ExpenseImportError(BaseModel):
+    row: int = Field(...) # 1-based data row, the CSV header is not counted
+    error: str = Field(...)
+
+class ExpenseImportResult(BaseModel):
+    imported: int = Field(...)
+    failed: int = Field(...)
+    errors: list[ExpenseImportError] = Field(...) # the first MAX_REPORTED_ERRORS errors
+    error: Optional[str] = Field(None) # why the upload stopped early, only the chunks committed before it are imported
+
 class ExpenseUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=3, max_length=50)
     amount: Optional[float] = Field(None, gt=0)
@@ -41,8 +55,8 @@ class ExpenseShare(BaseModel):
     id: UUID = Field(default_factory=uuid4)
     expense_id: UUID = Field(...)
     user_id: UUID = Field(...)
-    amount_owed: float = Field(..., gt=0)
-    amount_paid: float = Field(..., gt=0)
+    amount_owed: float = Field(..., ge=0) # 0 for a payer outside the split
+    amount_paid: float = Field(..., ge=0) # 0 for everyone but the payer
     settled: bool = Field(default=False)
     percent: Optional[float] = Field(None)
     shares: Optional[float] = Field(None)
@@ -66,7 +80,7 @@ class ExpenseResponse(BaseModel):
 
 
 class ExpenseSharesCreate(BaseModel):
-    amount_owed: float = Field(..., gt=0)
+    amount_owed: float = Field(..., ge=0)
     amount_paid: float = Field(..., ge=0)
     settled: bool = Field(default=False)
     percent: Optional[float] = Field(None)
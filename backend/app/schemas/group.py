@@ -2,7 +2,7 @@ from pydantic import BaseModel, Field, ConfigDict
 from uuid import UUID, uuid4
 from datetime import datetime, timezone
 from typing import Optional
-from app.schemas.expense import Expense
+from app.schemas.expense import Expense, ExpenseShare
 # --- Group ---
 
 class GroupBase(BaseModel):
@@ -79,4 +79,22 @@ class GroupMemberInvite(BaseModel):
     user_id: UUID = Field(...)
 
 class InviteCode(BaseModel):
-    invite_code: str = Field(...)
\ No newline at end of file
+    invite_code: str = Field(...)
+
+# --- Settle up ---
+
+class SettleUpTransfer(BaseModel):
+    payer_id: UUID = Field(...) # User who should send money
+    payee_id: UUID = Field(...) # User who should receive money
+    amount: float = Field(..., gt=0)
+
+    model_config = ConfigDict(from_attributes=True)
+
+# --- Delta sync ---
+
+class GroupChanges(BaseModel):
+    revision: int = Field(...) # High-water mark to pass as `since` on the next sync
+    group: Optional[Group] = Field(None) # Set when the group itself changed
+    members: list[GroupMember] = Field(...)
+    expenses: list[Expense] = Field(...)
+    shares: list[ExpenseShare] = Field(...) # Shares of the changed expenses
@@ -1,6 +1,10 @@
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import Optional
+import asyncio
+import time
 from app.config.settings import settings
 
 
@@ -19,6 +23,102 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordPoolStats:
+    """Counters for the password hashing pool, queue and run times are in seconds."""
+
+    def __init__(self):
+        self.submitted = 0
+        self.completed = 0
+        self.in_flight = 0
+        self.queue_time_total = 0.0
+        self.queue_time_max = 0.0
+        self.run_time_total = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "in_flight": self.in_flight,
+            "queue_time_total": self.queue_time_total,
+            "queue_time_max": self.queue_time_max,
+            "queue_time_avg": self.queue_time_total / self.completed if self.completed else 0.0,
+            "run_time_total": self.run_time_total,
+        }
+
+
+password_pool_stats = PasswordPoolStats()
+_password_executor: Optional[Executor] = None
+_password_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def get_password_executor() -> Executor:
+    """
+    Return the pool bcrypt runs on, creating it on first use.
+    bcrypt releases the GIL, so a thread pool is enough unless PASSWORD_HASH_EXECUTOR is "process".
+    """
+    global _password_executor
+    if _password_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _password_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+    return _password_executor
+
+
+def shutdown_password_executor() -> None:
+    """Stop the password hashing pool. Called on application shutdown."""
+    global _password_executor
+    if _password_executor is not None:
+        _password_executor.shutdown(wait=False, cancel_futures=True)
+        _password_executor = None
+
+
+async def run_in_password_pool(func, *args):
+    """
+    Run a bcrypt call on the password pool without blocking the event loop.
+    At most PASSWORD_HASH_WORKERS calls run at once; the rest wait here, and the wait is
+    recorded as queue time in password_pool_stats.
+    """
+    global _password_semaphore
+    if _password_semaphore is None:
+        _password_semaphore = asyncio.Semaphore(settings.PASSWORD_HASH_WORKERS)
+
+    password_pool_stats.submitted += 1
+    queued_at = time.perf_counter()
+    async with _password_semaphore:
+        started_at = time.perf_counter()
+        queue_time = started_at - queued_at
+        password_pool_stats.queue_time_total += queue_time
+        password_pool_stats.queue_time_max = max(password_pool_stats.queue_time_max, queue_time)
+        password_pool_stats.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_password_executor(), func, *args)
+        finally:
+            password_pool_stats.in_flight -= 1
+            password_pool_stats.completed += 1
+            password_pool_stats.run_time_total += time.perf_counter() - started_at
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Hash a password using bcrypt on the password pool.
+    :param password: The plaintext password to hash.
+    :return: The hashed password.
+    """
+    return await run_in_password_pool(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Verify a password against its bcrypt hash on the password pool.
+    :param plain_password: The plaintext password to check.
+    :param hashed_password: The stored hash.
+    :return: True if the password matches.
+    """
+    return await run_in_password_pool(verify_password, plain_password, hashed_password)
+
+
 SECRET_KEY = settings.SECRET_KEY  # Replace with your actual secret key
 ALGORITHM = "HS256"  # Algorithm used for JWT encoding
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # Token expiration time in minutes
@@ -0,0 +1,161 @@
+import csv
+import json
+import os
+import time
+from typing import AsyncIterator, Optional, Union
+from uuid import UUID
+
+from pydantic import ValidationError
+
+from app.schemas.expense import ExpenseImportRow
+
+IMPORT_FORMATS = ("csv", "ndjson")
+REQUIRED_CSV_COLUMNS = {"name", "amount", "expense_type", "split_method", "participants"}
+LIST_SEPARATOR = ";"  # Separates the participants and splits inside a CSV cell
+MAX_REPORTED_ERRORS = 1000  # Row errors beyond this are counted but not returned
+UTF8_BOM = b"\xef\xbb\xbf"
+
+_UUID7_VERSION = 0x7 << 76
+_UUID7_VARIANT = 0x2 << 62
+_UUID7_RANDOM_MASK = ~((0xF << 76) | (0x3 << 62)) & ((1 << 80) - 1)
+
+
+def uuid7() -> UUID:
+    """
+    A time-ordered UUID (version 7): a millisecond timestamp followed by random bits.
+    Rows written in bulk get increasing keys, so their primary key and foreign key indexes
+    grow at the right edge instead of touching a random page for every row.
+    """
+    random_bits = int.from_bytes(os.urandom(10), "big") & _UUID7_RANDOM_MASK
+    value = (time.time_ns() // 1_000_000) << 80 | _UUID7_VERSION | _UUID7_VARIANT | random_bits
+    return UUID(int=value)
+
+
+def decode_lines(data: bytes) -> list[Optional[str]]:
+    """Decode complete lines, with None in place of a line that is not valid UTF-8."""
+    try:
+        return data.decode("utf-8").split("\n")
+    except UnicodeDecodeError:
+        lines = []
+        for line in data.split(b"\n"):
+            try:
+                lines.append(line.decode("utf-8"))
+            except UnicodeDecodeError:
+                lines.append(None)
+        return lines
+
+
+async def iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[Optional[str]]:
+    """
+    Split a byte stream into lines without holding more than one chunk in memory.
+    A line that is not valid UTF-8 is yielded as None, so it can be rejected on its own
+    instead of failing the rest of the upload.
+    :param stream: The raw request body.
+    :return: An async iterator over the decoded lines.
+    """
+    buffer = b""
+    first = True
+    async for chunk in stream:
+        buffer += chunk
+        head, newline, buffer = buffer.rpartition(b"\n")
+        if not newline:
+            continue
+        if first:
+            head = head.removeprefix(UTF8_BOM)
+            first = False
+        for line in decode_lines(head):
+            yield line if line is None else line.rstrip("\r")
+
+    if first:
+        buffer = buffer.removeprefix(UTF8_BOM)
+    if buffer:
+        line = decode_lines(buffer)[0]
+        yield line if line is None else line.rstrip("\r")
+
+
+def validate_row(record: dict) -> Union[ExpenseImportRow, str]:
+    """Validate one decoded record against ExpenseImportRow, returning an error message on failure."""
+    try:
+        return ExpenseImportRow.model_validate(record)
+    except ValidationError as e:
+        return "; ".join(
+            f"{'.'.join(str(part) for part in error['loc']) or 'row'}: {error['msg']}"
+            for error in e.errors()
+        )
+
+
+def csv_record(header: list[str], values: list[str]) -> dict:
+    """Map a CSV row onto the fields of ExpenseImportRow, splitting the list cells."""
+    record = {key: value.strip() for key, value in zip(header, values) if value.strip() != ""}
+    for key in ("participants", "splits"):
+        if key in record:
+            record[key] = [item.strip() for item in record[key].split(LIST_SEPARATOR) if item.strip()]
+    return record
+
+
+async def iter_csv_rows(lines: AsyncIterator[Optional[str]]) -> AsyncIterator[tuple[int, Union[ExpenseImportRow, str]]]:
+    """
+    Parse and validate CSV rows one at a time. The first line must be a header.
+    Quoted fields may not contain line breaks.
+    :raises ValueError: If the header is not valid UTF-8 or is missing required columns.
+    """
+    header = None
+    row_number = 0
+    async for line in lines:
+        if line is None:
+            if header is None:
+                raise ValueError("The CSV header is not valid UTF-8.")
+            row_number += 1
+            yield row_number, "Not valid UTF-8."
+            continue
+        if not line.strip():
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [column.strip() for column in values]
+            missing = REQUIRED_CSV_COLUMNS - set(header)
+            if missing:
+                raise ValueError(f"Missing CSV columns: {', '.join(sorted(missing))}.")
+            continue
+
+        row_number += 1
+        if len(values) != len(header):
+            yield row_number, f"Expected {len(header)} columns, got {len(values)}."
+            continue
+        yield row_number, validate_row(csv_record(header, values))
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[Optional[str]]) -> AsyncIterator[tuple[int, Union[ExpenseImportRow, str]]]:
+    """Parse and validate newline delimited JSON rows one at a time."""
+    row_number = 0
+    async for line in lines:
+        if line is None:
+            row_number += 1
+            yield row_number, "Not valid UTF-8."
+            continue
+        if not line.strip():
+            continue
+
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row_number, f"Invalid JSON: {e.msg}."
+            continue
+        if not isinstance(record, dict):
+            yield row_number, "Expected a JSON object."
+            continue
+        yield row_number, validate_row(record)
+
+
+def parse_import_rows(stream: AsyncIterator[bytes], format: str) -> AsyncIterator[tuple[int, Union[ExpenseImportRow, str]]]:
+    """
+    Incrementally parse an uploaded CSV or NDJSON body into validated rows.
+    :param stream: The raw request body.
+    :param format: One of IMPORT_FORMATS.
+    :return: An async iterator of (row number, validated row or error message).
+    """
+    if format == "ndjson":
+        return iter_ndjson_rows(iter_lines(stream))
+    return iter_csv_rows(iter_lines(stream))
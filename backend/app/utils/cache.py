@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+from app.config.settings import settings
+
+
+class TTLCache:
+    """
+    Bounded in-process cache with a per-entry time to live.
+    Entries are evicted least recently used first once max_entries is reached.
+    Not thread safe: it is meant to be used from a single event loop.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the cached value for a key, or None if it is missing or expired.
+        :param key: The cache key.
+        :return: The cached value or None.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key) # mark as most recently used
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, evicting the least recently used entry if the cache is full.
+        :param key: The cache key.
+        :param value: The value to cache.
+        """
+        if self.max_entries <= 0 or self.ttl <= 0: # caching is disabled
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        """
+        Drop a key from the cache. Call this after the underlying record changes.
+        :param key: The cache key.
+        """
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry from the cache."""
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """Return the size and hit/miss counters of the cache."""
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Authenticated users keyed by the token's `sub` claim (the user id as a string)
+user_cache = TTLCache(ttl=settings.USER_CACHE_TTL_SECONDS, max_entries=settings.USER_CACHE_MAX_ENTRIES)
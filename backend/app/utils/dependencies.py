@@ -1,15 +1,20 @@
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Query
+from typing import Optional
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from app.utils.auth import decode_access_token
 from app.crud.user import get_user_by_id
-from app.db.database import get_db_session
+from app.db.database import get_db_session, open_session, AsyncSessionLocal, ReadSessionLocal
+from app.utils.cache import user_cache
+from app.utils.read_routing import read_pins, set_session_user
 
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
+optional_oauth2_bearer = OAuth2PasswordBearer(tokenUrl="/api/v1/login", auto_error=False)
 
 async def get_current_user(token: str = Depends(oauth2_bearer), db = Depends(get_db_session)):
     """
     Retrieve the current user based on the provided JWT token.
+    Users are served from user_cache when possible, so most requests skip the database lookup.
     :param token: The JWT token provided by the user.
     :param db: The database session to use for the operation.
     :return: The User object if the token is valid, otherwise raises an HTTPException.
@@ -24,10 +29,61 @@ async def get_current_user(token: str = Depends(oauth2_bearer), db = Depends(get
     user_id = payload.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token payload")
+    set_session_user(db, user_id) # a commit on this session pins the user's reads to the primary
     
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+
     user = await get_user_by_id(db, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
+
+    db.expunge(user) # detach the user so a rollback of this session cannot expire the cached copy
+    user_cache.set(user_id, user)
     return user
 
+
+async def get_current_user_for_stream(token: Optional[str] = Depends(optional_oauth2_bearer), access_token: Optional[str] = Query(None), db = Depends(get_db_session)):
+    """
+    Retrieve the current user for an event stream.
+    The browser EventSource API cannot send an Authorization header, so the token may also
+    be passed as the access_token query parameter.
+    :param token: The JWT token from the Authorization header, if any.
+    :param access_token: The JWT token from the query string, if any.
+    :param db: The database session to use for the operation.
+    :return: The User object if the token is valid, otherwise raises an HTTPException.
+    """
+    token = token or access_token
+    if not token:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_user(token, db)
+
+
+async def get_read_db_session(token: str = Depends(oauth2_bearer)):
+    """
+    Get a database session for a read-only endpoint.
+    Sessions come from the read replica when READ_DATABASE_URL is set, except for users who
+    wrote within READ_YOUR_WRITES_SECONDS: they read from the primary so they see their own changes.
+    :param token: The JWT token provided by the user.
+    """
+    payload = decode_access_token(token)
+    user_id = payload.get("sub") if payload else None
+    session_factory = AsyncSessionLocal if user_id is None or read_pins.is_pinned(user_id) else ReadSessionLocal
+    async with open_session(session_factory) as session:
+        yield session
+
+
+async def get_current_user_for_read(token: str = Depends(oauth2_bearer), db = Depends(get_read_db_session)):
+    """
+    Retrieve the current user for a read-only endpoint, looking them up on the read session
+    so the request does not also hold a connection to the primary.
+    :param token: The JWT token provided by the user.
+    :param db: The read database session.
+    :return: The User object if the token is valid, otherwise raises an HTTPException.
+    """
+    return await get_current_user(token, db)
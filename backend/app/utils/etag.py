@@ -0,0 +1,47 @@
+import hashlib
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong ETag from the values a representation depends on.
+    :param parts: Revisions, IDs and query parameters that identify the representation.
+    :return: A quoted opaque ETag.
+    """
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag, using the weak comparison RFC 9110 requires for it.
+    :param if_none_match: The raw If-None-Match header, if any.
+    :param etag: The current ETag of the representation.
+    :return: True if the client's copy is current.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def conditional_response(request: Request, response: Response, *parts) -> Optional[Response]:
+    """
+    Tag a response with an ETag and answer conditional GETs.
+    :param request: The incoming request, for its If-None-Match header and query string.
+    :param response: The response the endpoint will return, which gets the ETag header.
+    :param parts: The values the representation depends on, e.g. group revisions and the user ID.
+    :return: A 304 response if the client's copy is current, otherwise None.
+    """
+    etag = make_etag(*parts, request.url.query)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
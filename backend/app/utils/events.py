@@ -0,0 +1,175 @@
+import asyncio
+import json
+from collections import defaultdict
+from typing import Iterable, Optional
+from uuid import UUID
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config.settings import settings
+
+PENDING_EVENTS = "pending_events" # Session.info entry holding the events to publish on commit
+RESYNC_EVENT = b"event: resync\ndata: {}\n\n" # tells a dropped client to catch up with /groups/{group_id}/changes and reconnect
+
+
+def encode_event(event_type: str, data: dict) -> bytes:
+    """
+    Encode an event in the text/event-stream format.
+    :param event_type: The SSE event name, e.g. "expense_created".
+    :param data: The JSON payload of the event.
+    :return: The encoded event.
+    """
+    payload = json.dumps(data, default=str, separators=(",", ":"))
+    return f"event: {event_type}\ndata: {payload}\n\n".encode()
+
+
+class Subscription:
+    """
+    The queue of encoded events waiting to be sent to one client.
+    Once the queue is full the subscriber is dropped: its backlog is replaced by a single
+    resync event and it stops receiving events, so a slow client can never hold up publishers
+    or grow without bound.
+    """
+
+    def __init__(self, group_ids: Iterable[UUID], max_queued: int):
+        self.group_ids = frozenset(group_ids)
+        self.dropped = False
+        self._queue: asyncio.Queue[bytes] = asyncio.Queue(maxsize=max_queued)
+
+    def deliver(self, event: bytes) -> bool:
+        """
+        Queue an event without waiting.
+        :param event: The encoded event.
+        :return: False if the subscriber was too slow and has been dropped.
+        """
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            self.dropped = True
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            self._queue.put_nowait(RESYNC_EVENT)
+            return False
+
+    async def next_event(self, timeout: float) -> Optional[bytes]:
+        """
+        Wait for the next event.
+        :param timeout: Seconds to wait before giving up.
+        :return: The encoded event, or None on timeout.
+        """
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    @property
+    def finished(self) -> bool:
+        """True once a dropped subscriber has been sent its resync event."""
+        return self.dropped and self._queue.empty()
+
+
+class EventBroker:
+    """
+    In-process pub/sub that fans group events out to the subscriptions of the group's members.
+    Publishing never blocks: each event is encoded once and queued on every subscription.
+    Not thread safe: it is meant to be used from a single event loop.
+    """
+
+    def __init__(self, max_queued: int):
+        self.max_queued = max_queued
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._subscriptions: dict[UUID, set[Subscription]] = defaultdict(set)
+        self._count = 0
+
+    def subscribe(self, group_ids: Iterable[UUID]) -> Subscription:
+        """
+        Start receiving the events of some groups.
+        :param group_ids: The groups to follow.
+        :return: The new subscription; pass it to unsubscribe when the client goes away.
+        """
+        subscription = Subscription(group_ids, self.max_queued)
+        for group_id in subscription.group_ids:
+            self._subscriptions[group_id].add(subscription)
+        self._count += 1
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """
+        Stop delivering events to a subscription. Safe to call more than once.
+        :param subscription: The subscription returned by subscribe.
+        """
+        removed = False
+        for group_id in subscription.group_ids:
+            subscribers = self._subscriptions.get(group_id)
+            if subscribers is not None and subscription in subscribers:
+                subscribers.discard(subscription)
+                removed = True
+                if not subscribers:
+                    del self._subscriptions[group_id]
+        if removed:
+            self._count -= 1
+
+    def publish(self, group_id: UUID, event_type: str, data: dict) -> int:
+        """
+        Send an event to every subscriber of a group.
+        Call this only after the change has been committed, or queue it with publish_on_commit.
+        :param group_id: The group the event belongs to.
+        :param event_type: The SSE event name.
+        :param data: The JSON payload of the event.
+        :return: The number of subscribers the event was queued for.
+        """
+        subscribers = self._subscriptions.get(group_id)
+        self.published += 1
+        if not subscribers:
+            return 0
+
+        event = encode_event(event_type, data)
+        delivered = 0
+        for subscription in list(subscribers):
+            if subscription.deliver(event):
+                delivered += 1
+            else:
+                self.unsubscribe(subscription)
+                self.dropped += 1
+        self.delivered += delivered
+        return delivered
+
+    def stats(self) -> dict:
+        """Return the subscriber count and the publish/deliver/drop counters."""
+        return {
+            "subscribers": self._count,
+            "groups": len(self._subscriptions),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+# Expense and balance events of every group, consumed by the /events stream
+event_broker = EventBroker(max_queued=settings.EVENT_QUEUE_SIZE)
+
+
+def publish_on_commit(db: AsyncSession, group_id: UUID, event_type: str, data: dict) -> None:
+    """
+    Queue an event to be published once the session commits.
+    Nothing is published if the transaction rolls back.
+    :param db: The session the change is written with.
+    :param group_id: The group the event belongs to.
+    :param event_type: The SSE event name.
+    :param data: The JSON payload of the event.
+    """
+    db.sync_session.info.setdefault(PENDING_EVENTS, []).append((group_id, event_type, data))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_events(session: Session) -> None:
+    for group_id, event_type, data in session.info.pop(PENDING_EVENTS, ()):
+        event_broker.publish(group_id, event_type, data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_events(session: Session) -> None:
+    session.info.pop(PENDING_EVENTS, None)
@@ -0,0 +1,41 @@
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy.exc import IntegrityError
+
+UNIQUE_VIOLATION = "23505"
+FOREIGN_KEY_VIOLATION = "23503"
+
+# constraint name -> (status code, detail) for the violations a client can cause
+CONSTRAINT_ERRORS = {
+    "uq_group_user": (status.HTTP_409_CONFLICT, "User is already a member of this group."),
+    "users_email_key": (status.HTTP_409_CONFLICT, "Username or email already exists."),
+    "users_username_key": (status.HTTP_409_CONFLICT, "Username or email already exists."),
+}
+
+
+def violated_constraint(error: IntegrityError) -> Optional[str]:
+    """
+    :param error: The IntegrityError raised by a write.
+    :return: The name of the violated constraint, as reported by asyncpg.
+    """
+    return getattr(error.orig.__cause__, "constraint_name", None)
+
+
+def integrity_error_to_http(error: IntegrityError) -> HTTPException:
+    """
+    Turn a constraint violation into the HTTP error the client should see, so writes can insert
+    and let the database enforce uniqueness instead of checking first and racing.
+    :param error: The IntegrityError raised by a write.
+    :return: The HTTPException to raise, 409 for conflicts with existing rows.
+    """
+    constraint = violated_constraint(error)
+    if constraint in CONSTRAINT_ERRORS:
+        status_code, detail = CONSTRAINT_ERRORS[constraint]
+        return HTTPException(status_code=status_code, detail=detail)
+
+    sqlstate = getattr(error.orig, "sqlstate", None)
+    if sqlstate == UNIQUE_VIOLATION:
+        return HTTPException(status_code=status.HTTP_409_CONFLICT, detail="The record already exists.")
+    if sqlstate == FOREIGN_KEY_VIOLATION:
+        return HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="A referenced record does not exist.")
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The request conflicts with the stored data.")
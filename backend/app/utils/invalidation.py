@@ -0,0 +1,229 @@
+import asyncio
+import json
+import logging
+import uuid
+from typing import Iterable, Optional
+from sqlalchemy import event, select, func
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, AsyncConnection
+from sqlalchemy.orm import Session
+from app.config.settings import settings
+from app.db.database import engine
+from app.utils.cache import TTLCache, user_cache
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEYS = "invalidation_keys" # Session.info entry holding the keys to publish on commit
+MAX_PAYLOAD_BYTES = 7900 # NOTIFY payloads are limited to 8000 bytes
+RECONNECT_DELAY_SECONDS = 1.0
+
+
+def user_key(user_id) -> str:
+    """Invalidation key of a cached user, matching the token's `sub` claim."""
+    return f"user:{user_id}"
+
+
+def group_key(group_id) -> str:
+    """
+    Invalidation key of anything cached about a group.
+    No cache is keyed by group yet, so writes do not publish it: with the postgres backend
+    every published key costs a pg_notify in the writing transaction.
+    """
+    return f"group:{group_id}"
+
+
+def invalidate_on_commit(db: AsyncSession, *keys: str) -> None:
+    """
+    Queue invalidation keys to be published when the session commits.
+    Nothing is published if the transaction rolls back.
+    :param db: The session the change is written with.
+    :param keys: Keys of the form "<namespace>:<id>", or "<namespace>:*" to drop a whole cache.
+    """
+    db.sync_session.info.setdefault(PENDING_KEYS, set()).update(keys)
+
+
+class InvalidationBus:
+    """
+    Invalidates cached entries in every worker when the data behind them changes.
+    Caches are registered under a namespace, and keys "<namespace>:<id>" drop one entry.
+    This base class is the in-memory backend: it only invalidates the caches of this process.
+    """
+
+    def __init__(self):
+        self.origin = uuid.uuid4().hex # lets a worker recognise and skip its own messages
+        self.published = 0
+        self.received = 0
+        self._caches: dict[str, TTLCache] = {}
+
+    def register(self, namespace: str, cache: TTLCache) -> None:
+        """
+        Invalidate a cache when keys of a namespace are published.
+        :param namespace: The key prefix, e.g. "user".
+        :param cache: The cache holding the entries, keyed by the part after the prefix.
+        """
+        self._caches[namespace] = cache
+
+    def apply(self, keys: Iterable[str]) -> None:
+        """
+        Drop the entries of some keys from the local caches.
+        :param keys: The invalidation keys.
+        """
+        for key in keys:
+            namespace, _, ident = key.partition(":")
+            cache = self._caches.get(namespace)
+            if cache is None:
+                continue
+            if ident == "*":
+                cache.clear()
+            else:
+                cache.invalidate(ident)
+
+    def clear(self) -> None:
+        """Drop every entry of every registered cache."""
+        for cache in self._caches.values():
+            cache.clear()
+
+    def before_commit(self, session: Session, keys: set[str]) -> None:
+        """Send the keys to the other workers as part of the committing transaction."""
+
+    def after_commit(self, keys: set[str]) -> None:
+        """Invalidate the local caches once the transaction is committed."""
+        self.published += 1
+        self.apply(keys)
+
+    async def start(self) -> None:
+        """Start receiving invalidations from other workers."""
+
+    async def stop(self) -> None:
+        """Stop receiving invalidations from other workers."""
+
+
+class PostgresInvalidationBus(InvalidationBus):
+    """
+    Invalidation bus shared by every worker connected to the database, over LISTEN/NOTIFY.
+    Keys are sent with pg_notify inside the writing transaction, so Postgres delivers them
+    exactly when it commits and never for a rollback. Each worker holds one connection of
+    the engine pool for LISTEN, and clears its caches if that connection is lost since it
+    may have missed messages.
+    """
+
+    def __init__(self, engine: AsyncEngine, channel: str, start_timeout: float = 10.0):
+        super().__init__()
+        self.engine = engine
+        self.channel = channel
+        self.start_timeout = start_timeout
+        self._connection: Optional[AsyncConnection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._listening = asyncio.Event()
+
+    def payloads(self, keys: set[str]) -> list[str]:
+        """
+        Encode keys as NOTIFY payloads under the size limit.
+        :param keys: The invalidation keys.
+        :return: JSON payloads carrying the origin of the message and a batch of keys.
+        """
+        payloads = []
+        batch = []
+        size = 0
+        for key in sorted(keys):
+            if batch and size + len(key) + 3 > MAX_PAYLOAD_BYTES - 64:
+                payloads.append(json.dumps({"origin": self.origin, "keys": batch}))
+                batch, size = [], 0
+            batch.append(key)
+            size += len(key) + 3
+        if batch:
+            payloads.append(json.dumps({"origin": self.origin, "keys": batch}))
+        return payloads
+
+    def before_commit(self, session: Session, keys: set[str]) -> None:
+        for payload in self.payloads(keys):
+            session.execute(select(func.pg_notify(self.channel, payload)))
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        message = json.loads(payload)
+        if message["origin"] == self.origin: # already applied on commit
+            return
+        self.received += 1
+        self.apply(message["keys"])
+
+    async def _listen(self) -> None:
+        while True:
+            lost = asyncio.Event()
+            try:
+                self._connection = await self.engine.connect()
+                raw_connection = await self._connection.get_raw_connection()
+                driver_connection = raw_connection.driver_connection # the asyncpg connection
+                driver_connection.add_termination_listener(lambda connection: lost.set())
+                await driver_connection.add_listener(self.channel, self._on_notification)
+                self.clear() # anything cached before LISTEN may have missed an invalidation
+                self._listening.set()
+                await lost.wait()
+                logger.warning("Lost the cache invalidation connection, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Could not listen for cache invalidations, retrying")
+            finally:
+                self._listening.clear()
+                if self._connection is not None:
+                    await self._connection.invalidate() # never hand a LISTENing connection back to the pool
+                    await self._connection.close()
+                    self._connection = None
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    async def start(self) -> None:
+        """
+        Start listening and wait until the LISTEN connection is set up.
+        :raises RuntimeError: If it is not set up within start_timeout seconds, e.g. because the
+            database is unreachable. The listener is stopped rather than left retrying.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._listening.wait(), self.start_timeout)
+        except asyncio.TimeoutError:
+            await self.stop()
+            raise RuntimeError(
+                f"Could not listen for cache invalidations on channel '{self.channel}' within "
+                f"{self.start_timeout:g}s, check the database connection or INVALIDATION_START_TIMEOUT_SECONDS."
+            ) from None
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def create_invalidation_bus() -> InvalidationBus:
+    """Build the bus selected by the INVALIDATION_BACKEND setting, "memory" or "postgres"."""
+    if settings.INVALIDATION_BACKEND == "postgres":
+        return PostgresInvalidationBus(engine, settings.INVALIDATION_CHANNEL, settings.INVALIDATION_START_TIMEOUT_SECONDS)
+    if settings.INVALIDATION_BACKEND == "memory":
+        return InvalidationBus()
+    raise ValueError(f"Unknown INVALIDATION_BACKEND '{settings.INVALIDATION_BACKEND}'.")
+
+
+invalidation_bus = create_invalidation_bus()
+invalidation_bus.register("user", user_cache)
+
+
+@event.listens_for(Session, "before_commit")
+def _publish_invalidations(session: Session) -> None:
+    keys = session.info.get(PENDING_KEYS)
+    if keys:
+        invalidation_bus.before_commit(session, keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session: Session) -> None:
+    keys = session.info.pop(PENDING_KEYS, None)
+    if keys:
+        invalidation_bus.after_commit(keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session: Session) -> None:
+    session.info.pop(PENDING_KEYS, None)
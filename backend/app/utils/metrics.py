@@ -0,0 +1,251 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+from sqlalchemy import event, exc
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8" # Prometheus text exposition format
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in self._values.items():
+            yield f"{self.name}{format_labels(self.labels, label_values)} {format_value(value)}"
+
+
+class Gauge(Counter):
+    """A value that can go up and down, per label set."""
+
+    type = "gauge"
+
+    def dec(self, *label_values, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value: float, *label_values) -> None:
+        self._values[label_values] = value
+
+
+class Histogram:
+    """
+    Observations counted in cumulative buckets, per label set.
+    Observing is a bisect and two additions, so it is cheap enough for every request and statement.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self._values: dict[tuple, list] = {} # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value: float, *label_values) -> None:
+        values = self._values.get(label_values)
+        if values is None:
+            values = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        values[bisect_left(self.buckets, value)] += 1
+        values[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        label_names = self.labels + ("le",)
+        for label_values, values in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                yield f"{self.name}_bucket{format_labels(label_names, label_values + (format_value(bound),))} {cumulative}"
+            labels = format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {format_value(values[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """The metrics of this process, plus callbacks that refresh gauges at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors: list[Callable[[], None]] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Run a callback before every scrape, to set gauges whose value is cheaper to read than to track.
+        :param collector: A function without arguments.
+        """
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram("http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")))
+http_requests_in_flight = registry.register(Gauge("http_requests_in_flight", "HTTP requests being served."))
+http_request_sql_statements = registry.register(Histogram("http_request_sql_statements", "SQL statements issued per HTTP request.", ("method", "route"), SQL_COUNT_BUCKETS))
+http_request_sql_duration = registry.register(Histogram("http_request_sql_duration_seconds", "Time spent in SQL per HTTP request.", ("method", "route")))
+db_statements = registry.register(Counter("db_statements_total", "SQL statements executed, by verb.", ("verb",)))
+db_statement_duration = registry.register(Histogram("db_statement_duration_seconds", "SQL statement latency."))
+db_pool_checkout_wait = registry.register(Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("pool",)))
+db_pool_connections = registry.register(Gauge("db_pool_connections", "Pooled connections by state.", ("pool", "state")))
+db_pool_capacity = registry.register(Gauge("db_pool_capacity", "Most connections the pool will open, pool size plus overflow.", ("pool",)))
+db_pool_waiting = registry.register(Gauge("db_pool_waiting", "Checkouts waiting for a pooled connection or for a new one to open.", ("pool",)))
+db_pool_checkout_timeouts = registry.register(Counter("db_pool_checkout_timeouts_total", "Checkouts that gave up after the pool timeout.", ("pool",)))
+app_startup_duration = registry.register(Gauge("app_startup_duration_seconds", "Time the last startup spent in each phase.", ("phase",)))
+
+
+class RequestStats:
+    """SQL work done on behalf of the current request."""
+
+    __slots__ = ("statements", "sql_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.sql_seconds = 0.0
+
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status, in-flight count and SQL work per route.
+    Routes are labelled with their path template, e.g. /api/v1/groups/single/{group_id},
+    so the number of label sets stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        stats = RequestStats()
+        token = current_request.set(stats)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            current_request.reset(token)
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, path, status)
+            http_request_duration.observe(elapsed, method, path)
+            http_request_sql_statements.observe(stats.statements, method, path)
+            http_request_sql_duration.observe(stats.sql_seconds, method, path)
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    The default async pool, tracking how many checkouts wait, for how long, and how many time out.
+    Metrics are labelled with the pool_logging_name given to create_async_engine.
+    """
+
+    def _do_get(self):
+        name = getattr(self, "logging_name", None) or "default"
+        started = time.perf_counter()
+        db_pool_waiting.inc(name)
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            db_pool_checkout_timeouts.inc(name)
+            raise
+        finally:
+            db_pool_waiting.dec(name)
+            db_pool_checkout_wait.observe(time.perf_counter() - started, name)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter() # the execution context is discarded if the statement fails
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement else "unknown"
+    db_statements.inc(verb)
+    db_statement_duration.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.sql_seconds += elapsed
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Record statement counts and latency for an engine, and report its pool usage at scrape time.
+    :param engine: The engine to instrument.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+    def collect_pool():
+        pool = engine.sync_engine.pool # read on every scrape, dispose() replaces the pool
+        name = getattr(pool, "logging_name", None) or "default"
+        if hasattr(pool, "checkedout"):
+            db_pool_connections.set(pool.checkedout(), name, "checked_out")
+            db_pool_connections.set(pool.checkedin(), name, "idle")
+            db_pool_connections.set(max(pool.overflow(), 0), name, "overflow") # negative while the pool is below pool_size
+            db_pool_capacity.set(pool.size() + max(pool._max_overflow, 0), name)
+
+    registry.add_collector(collect_pool)
@@ -0,0 +1,32 @@
+import base64
+from datetime import datetime
+from uuid import UUID
+
+DEFAULT_PAGE_SIZE = 50  # Number of rows returned when the client does not ask for a page size
+MAX_PAGE_SIZE = 200  # Upper bound on the page size a client can request
+
+
+def encode_cursor(created_at: datetime, row_id: UUID) -> str:
+    """
+    Encode the keyset position of the last row of a page into an opaque cursor.
+    :param created_at: The created_at value of the last row.
+    :param row_id: The id of the last row, used to break ties on created_at.
+    :return: A URL safe cursor string.
+    """
+    raw = f"{created_at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    """
+    Decode a cursor produced by encode_cursor.
+    :param cursor: The cursor string sent by the client.
+    :return: The (created_at, id) keyset position.
+    :raises ValueError: If the cursor is malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, row_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor.")
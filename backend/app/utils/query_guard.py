@@ -0,0 +1,154 @@
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Optional
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+BUDGET_ATTRIBUTE = "__query_budget__"
+CHUNK_BUDGET_ATTRIBUTE = "__query_budget_per_chunk__"
+
+_BIND_PARAMETER = re.compile(r"\$\d+(?:::\w+(?:\[\])?)?|%\(\w+\)s|(?<!:):\w+") # $1::UUID, %(name)s, :name
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)") # IN (?, ?, ?) and multi-row VALUES collapse to one shape
+_REPEATED_ROWS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+
+
+class QueryGuardError(RuntimeError):
+    """A request repeated a statement shape too often or went over its query budget."""
+
+
+def query_budget(max_queries: int, per_chunk: int = 0) -> Callable:
+    """
+    Declare how many SQL statements a route may issue per request, checked when the query guard is on.
+    Place it under the router decorator:
+
+        @router.get("/groups/all")
+        @query_budget(6)
+        async def get_all_groups(...):
+
+    Routes that write an upload in chunks also declare what each chunk may cost, and count
+    their chunks with record_chunk(); each chunk may then repeat its statements once.
+    :param max_queries: The most statements one request may issue, including authentication.
+    :param per_chunk: The statements allowed on top of max_queries for each recorded chunk.
+    :return: A decorator that returns the endpoint unchanged apart from the budget attributes.
+    """
+    def decorator(endpoint: Callable) -> Callable:
+        setattr(endpoint, BUDGET_ATTRIBUTE, max_queries)
+        setattr(endpoint, CHUNK_BUDGET_ATTRIBUTE, per_chunk)
+        return endpoint
+    return decorator
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """
+    Reduce a SQL statement to its shape, so the same query with different values compares equal.
+    :param statement: The SQL text sent to the driver.
+    :return: The statement with bind parameters and literals replaced by ? and whitespace collapsed.
+    """
+    shape = _STRING_LITERAL.sub("?", statement)
+    shape = _BIND_PARAMETER.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _VALUE_LIST.sub("(?)", shape)
+    shape = _REPEATED_ROWS.sub("(?)", shape)
+    return " ".join(shape.split())
+
+
+class QueryTracker:
+    """The statement shapes issued while serving one request."""
+
+    __slots__ = ("statements", "shapes", "chunks")
+
+    def __init__(self):
+        self.statements = 0
+        self.shapes: Counter[str] = Counter()
+        self.chunks = 0
+
+    def record(self, statement: str) -> None:
+        self.statements += 1
+        self.shapes[fingerprint(statement)] += 1
+
+    def problems(self, repeat_limit: int, budget: Optional[int]) -> list[str]:
+        """
+        Describe what this request did wrong.
+        :param repeat_limit: The most times one statement shape may run.
+        :param budget: The route's declared query budget, if any.
+        :return: One message per problem, empty if the request was fine.
+        """
+        found = [
+            f"statement ran {count} times (limit {repeat_limit}), likely an N+1: {shape[:200]}"
+            for shape, count in self.shapes.items()
+            if count > repeat_limit
+        ]
+        if budget is not None and self.statements > budget:
+            found.append(f"{self.statements} statements over a budget of {budget}")
+        return found
+
+
+current_tracker: ContextVar[Optional[QueryTracker]] = ContextVar("current_tracker", default=None)
+
+
+def record_chunk() -> None:
+    """Count one chunk of a chunked write against the per-chunk budget of the current request."""
+    tracker = current_tracker.get()
+    if tracker is not None:
+        tracker.chunks += 1
+
+
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    tracker = current_tracker.get()
+    if tracker is not None:
+        tracker.record(statement)
+
+
+def install_query_guard(engine: AsyncEngine) -> None:
+    """
+    Fingerprint every statement an engine runs on behalf of a request.
+    :param engine: The engine to watch.
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _record_statement)
+
+
+class QueryGuardMiddleware:
+    """
+    Development middleware that flags N+1 patterns and routes over their query budget.
+    Problems are logged, or raised as QueryGuardError once the response has been sent so
+    tests driving the app through httpx fail on them.
+    """
+
+    def __init__(self, app, repeat_limit: int, raise_errors: bool = False):
+        self.app = app
+        self.repeat_limit = repeat_limit
+        self.raise_errors = raise_errors
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        tracker = QueryTracker()
+        token = current_tracker.set(tracker)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tracker.reset(token)
+
+        endpoint = scope.get("endpoint")
+        budget = getattr(endpoint, BUDGET_ATTRIBUTE, None)
+        if budget is not None:
+            budget += getattr(endpoint, CHUNK_BUDGET_ATTRIBUTE, 0) * tracker.chunks
+        problems = tracker.problems(self.repeat_limit + tracker.chunks, budget)
+        if not problems:
+            return
+
+        route = scope.get("route")
+        message = f"{scope['method']} {route.path if route is not None else scope['path']}: " + "; ".join(problems)
+        if self.raise_errors:
+            raise QueryGuardError(message)
+        logger.warning(message)
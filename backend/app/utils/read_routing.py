@@ -0,0 +1,84 @@
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config.settings import settings
+from app.db.database import read_engine, engine
+from app.utils.invalidation import invalidation_bus, PENDING_KEYS
+
+SESSION_USER = "user_id" # Session.info entry naming the user a session writes for
+SESSION_WROTE = "wrote" # Session.info flag set once the session has run an INSERT, UPDATE or DELETE
+
+
+def reader_key(user_id) -> str:
+    """Invalidation key that pins a user's reads to the primary."""
+    return f"reader:{user_id}"
+
+
+def set_session_user(db: AsyncSession, user_id) -> None:
+    """
+    Record who a session works for, so committing it pins that user's reads to the primary.
+    :param db: The request's session.
+    :param user_id: The authenticated or newly registered user.
+    """
+    db.sync_session.info[SESSION_USER] = str(user_id)
+
+
+class ReadPins:
+    """
+    Users who wrote recently and must read from the primary until the replica has caught up.
+    Registered on the invalidation bus, so a write pins the user in every worker.
+    """
+
+    def __init__(self, window_seconds: float, max_entries: int = 10000):
+        self.window_seconds = window_seconds
+        self.max_entries = max_entries
+        self._until: dict[str, float] = {}
+        self._all_until = 0.0
+
+    def pin(self, user_id) -> None:
+        """
+        Send a user's reads to the primary for the next window_seconds.
+        :param user_id: The user who wrote.
+        """
+        now = time.monotonic()
+        if len(self._until) >= self.max_entries:
+            self._until = {key: until for key, until in self._until.items() if until > now}
+        self._until[str(user_id)] = now + self.window_seconds
+
+    def is_pinned(self, user_id) -> bool:
+        """
+        :param user_id: The user about to read.
+        :return: True if the user wrote within the window, or pins may have been missed.
+        """
+        now = time.monotonic()
+        return now < self._all_until or now < self._until.get(str(user_id), 0.0)
+
+    def invalidate(self, user_id) -> None:
+        self.pin(user_id)
+
+    def clear(self) -> None:
+        """The bus may have missed pins, so send everyone to the primary for a window."""
+        self._all_until = time.monotonic() + self.window_seconds
+
+
+read_pins = ReadPins(settings.READ_YOUR_WRITES_SECONDS)
+
+if read_engine is not engine:
+    invalidation_bus.register("reader", read_pins)
+
+    @event.listens_for(Session, "do_orm_execute")
+    def _track_writes(orm_execute_state) -> None:
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            orm_execute_state.session.info[SESSION_WROTE] = True
+
+    # every request commits its unit of work, so only a transaction that wrote pins its user
+    @event.listens_for(Session, "before_commit", insert=True) # ahead of the invalidation bus, which publishes the key
+    def _pin_writer(session: Session) -> None:
+        user_id = session.info.get(SESSION_USER)
+        if session.info.pop(SESSION_WROTE, False) and user_id is not None:
+            session.info.setdefault(PENDING_KEYS, set()).add(reader_key(user_id))
+
+    @event.listens_for(Session, "after_rollback")
+    def _forget_writes(session: Session) -> None:
+        session.info.pop(SESSION_WROTE, None)
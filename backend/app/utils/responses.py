@@ -0,0 +1,37 @@
+from typing import Any, Optional
+from uuid import UUID
+
+import orjson
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+
+def _encode_default(value: Any) -> Any:
+    # asyncpg returns its own UUID subclass, which orjson does not serialize natively
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson, which serializes UUIDs and datetimes natively.
+    Datetimes in UTC are written with a Z suffix, as Pydantic does.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_encode_default, option=orjson.OPT_UTC_Z)
+
+
+def fast_json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> ORJSONResponse:
+    """
+    Serialize plain rows straight to JSON.
+    Returning a Response makes FastAPI skip response_model validation, so only use this for
+    content read from the database that already has the shape of the response model.
+    :param content: Dicts, lists and scalars, e.g. Core rows turned into dicts.
+    :param response: The endpoint's Response parameter, whose headers (ETag...) are carried over.
+    :param status_code: The status code of the response.
+    :return: The rendered response.
+    """
+    headers = dict(response.headers) if response is not None else None
+    return ORJSONResponse(content, status_code=status_code, headers=headers)
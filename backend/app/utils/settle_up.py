@@ -0,0 +1,109 @@
+import heapq
+from dataclasses import dataclass
+from uuid import UUID
+
+import numpy as np
+
+VECTORIZED_THRESHOLD = 512  # Groups with more members than this use the NumPy path
+
+
+@dataclass(frozen=True)
+class Transfer:
+    payer_id: UUID
+    payee_id: UUID
+    amount: float
+
+
+def to_cents(balances: dict[UUID, float]) -> dict[UUID, int]:
+    """
+    Convert net balances to integer cents, dropping settled users.
+    Rounding can leave the cents a few off from summing to zero; the difference is
+    absorbed by the largest balance so every transfer plan still closes out.
+    :param balances: Net balance of each user (paid minus owed).
+    :return: Non-zero net balance of each user in cents.
+    """
+    cents = {user_id: int(round(balance * 100)) for user_id, balance in balances.items()}
+    residue = sum(cents.values())
+    if residue and cents:
+        largest = max(cents, key=lambda user_id: abs(cents[user_id]))
+        cents[largest] -= residue
+    return {user_id: amount for user_id, amount in cents.items() if amount}
+
+
+def simplify_debts(balances: dict[UUID, float]) -> list[Transfer]:
+    """
+    Turn net balances into a small set of payer -> payee transfers.
+    Greedy min-cash-flow: repeatedly match the largest debtor with the largest creditor,
+    which settles at least one of them per transfer (at most n - 1 transfers).
+    :param balances: Net balance of each user (paid minus owed).
+    :return: The transfers that settle the group, largest first.
+    """
+    cents = to_cents(balances)
+    # heapq is a min-heap, so amounts are negated to pop the largest first
+    creditors = [(-amount, str(user_id), user_id) for user_id, amount in cents.items() if amount > 0]
+    debtors = [(amount, str(user_id), user_id) for user_id, amount in cents.items() if amount < 0]
+    heapq.heapify(creditors)
+    heapq.heapify(debtors)
+
+    transfers = []
+    while creditors and debtors:
+        credit, credit_key, payee_id = heapq.heappop(creditors)
+        debt, debt_key, payer_id = heapq.heappop(debtors)
+        amount = min(-credit, -debt)
+        transfers.append(Transfer(payer_id=payer_id, payee_id=payee_id, amount=amount / 100))
+
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, credit_key, payee_id))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, debt_key, payer_id))
+
+    return transfers
+
+
+def simplify_debts_vectorized(balances: dict[UUID, float]) -> list[Transfer]:
+    """
+    Vectorized variant of simplify_debts for very large groups.
+    Debtors and creditors are sorted by size and laid end to end on a number line of
+    cumulative cents; every breakpoint of either side starts a new transfer. This gives
+    the same n - 1 bound as the heap without a Python-level loop over the matching.
+    :param balances: Net balance of each user (paid minus owed).
+    :return: The transfers that settle the group.
+    """
+    cents = to_cents(balances)
+    if not cents:
+        return []
+
+    user_ids = np.array(list(cents.keys()), dtype=object)
+    amounts = np.fromiter(cents.values(), dtype=np.int64, count=len(cents))
+
+    creditor_idx = np.flatnonzero(amounts > 0)
+    debtor_idx = np.flatnonzero(amounts < 0)
+    creditor_idx = creditor_idx[np.argsort(-amounts[creditor_idx], kind="stable")]
+    debtor_idx = debtor_idx[np.argsort(amounts[debtor_idx], kind="stable")]
+
+    credit_cumsum = np.cumsum(amounts[creditor_idx])
+    debt_cumsum = np.cumsum(-amounts[debtor_idx])
+
+    breakpoints = np.union1d(credit_cumsum, debt_cumsum)
+    starts = np.concatenate(([0], breakpoints[:-1]))
+    transfer_amounts = breakpoints - starts
+
+    # the interval (start, end] belongs to the first creditor/debtor whose cumulative sum reaches end
+    payee = user_ids[creditor_idx[np.searchsorted(credit_cumsum, breakpoints, side="left")]]
+    payer = user_ids[debtor_idx[np.searchsorted(debt_cumsum, breakpoints, side="left")]]
+
+    return [
+        Transfer(payer_id=payer_id, payee_id=payee_id, amount=int(amount) / 100)
+        for payer_id, payee_id, amount in zip(payer, payee, transfer_amounts)
+    ]
+
+
+def settle_up(balances: dict[UUID, float]) -> list[Transfer]:
+    """
+    Compute the transfers that settle a group, picking the fastest path for its size.
+    :param balances: Net balance of each user (paid minus owed).
+    :return: The transfers that settle the group.
+    """
+    if len(balances) > VECTORIZED_THRESHOLD:
+        return simplify_debts_vectorized(balances)
+    return simplify_debts(balances)
@@ -0,0 +1,40 @@
+from typing import Iterable, Optional
+
+from pydantic import BaseModel
+
+SUMMARY = "summary" # fields= alias for the summary fields of a model
+
+
+def parse_fields(fields: Optional[str], model: type[BaseModel], summary: Iterable[str] = ()) -> frozenset[str]:
+    """
+    Parse a fields= query parameter into the fields of a response model to return.
+    :param fields: Comma-separated field names, or None for every field.
+    :param model: The response model the fields belong to.
+    :param summary: The fields the `summary` alias stands for, if the model has one.
+    :return: The requested field names. `id` is always included.
+    :raises ValueError: If a name is not a field of the model.
+    """
+    if fields is None:
+        return frozenset(model.model_fields)
+
+    summary = tuple(summary)
+    requested = {"id"}
+    for name in (part.strip() for part in fields.split(",")):
+        if not name:
+            continue
+        if name == SUMMARY and summary:
+            requested.update(summary)
+        elif name in model.model_fields:
+            requested.add(name)
+        else:
+            raise ValueError(f"Unknown field '{name}', expected some of: {', '.join(model.model_fields)}.")
+    return frozenset(requested)
+
+
+def pick_fields(values: dict, fields: frozenset[str]) -> dict:
+    """
+    :param values: A response object as a dict.
+    :param fields: The fields to keep, see parse_fields.
+    :return: The dict without the fields the client did not ask for.
+    """
+    return {name: value for name, value in values.items() if name in fields}
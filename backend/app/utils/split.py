@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+from typing import Optional
+from uuid import UUID
+
+import numpy as np
+
+SPLIT_METHODS = ("equal", "percent", "custom", "shares")
+PERCENT_TOLERANCE = 1e-6  # Percent splits must add up to 100 within this tolerance
+
+
+@dataclass(frozen=True)
+class Split:
+    user_id: UUID
+    amount_owed: float
+    percent: Optional[float] = None
+    shares: Optional[float] = None
+
+
+def split_weights(amount: float, participant_count: int, split_method: str, splits: Optional[list[float]] = None) -> list[float]:
+    """
+    Validate a split request and turn it into one weight per participant.
+    :param amount: The total amount of the expense.
+    :param participant_count: The number of participants.
+    :param split_method: One of SPLIT_METHODS.
+    :param splits: Percentages, custom amounts or share counts, depending on the method.
+    :return: The weight of each participant.
+    :raises ValueError: If the split is invalid.
+    """
+    if participant_count == 0:
+        raise ValueError("No participants provided.")
+
+    if split_method == "equal":
+        return [1.0] * participant_count
+
+    if split_method not in SPLIT_METHODS:
+        raise ValueError("Unsupported split method.")
+    if not splits or len(splits) != participant_count:
+        raise ValueError(f"Invalid {split_method} splits.")
+    if any(value < 0 for value in splits) or not any(value > 0 for value in splits):
+        raise ValueError(f"Invalid {split_method} splits.")
+
+    if split_method == "percent" and abs(sum(splits) - 100) > PERCENT_TOLERANCE:
+        raise ValueError("Percent splits must add up to 100.")
+    if split_method == "custom" and round(sum(splits) * 100) != round(amount * 100):
+        raise ValueError("Custom splits must add up to the expense amount.")
+
+    return [float(value) for value in splits]
+
+
+def allocate_cents(amounts: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Split many amounts by weight in one vectorized pass, in whole cents.
+    Every participant gets the floor of their exact share; the cents left over are handed
+    out one each by largest fractional part, ties going to the earlier participant, so the
+    result always adds back up to the amount and is deterministic.
+    :param amounts: Shape (expenses,) total amounts.
+    :param weights: Shape (expenses, participants) non-negative weights, zero padded.
+    :return: Shape (expenses, participants) int64 cents owed.
+    """
+    amounts = np.asarray(amounts, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    total_cents = np.rint(amounts * 100).astype(np.int64)
+
+    exact = total_cents[:, None] * weights / weights.sum(axis=1, keepdims=True)
+    base = np.floor(exact + 1e-9).astype(np.int64) # absorb float noise on exact shares
+    leftover = total_cents - base.sum(axis=1)
+
+    fraction = np.where(weights > 0, exact - base, -1.0) # padding never receives a cent
+    order = np.argsort(-fraction, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.arange(weights.shape[1])[None, :].repeat(len(order), axis=0), axis=1)
+
+    return base + (rank < leftover[:, None])
+
+
+def build_splits(participants: list[UUID], split_method: str, splits: Optional[list[float]], cents: list[int]) -> list[Split]:
+    """Pair the allocated cents with their participants and the split inputs."""
+    return [
+        Split(
+            user_id=user_id,
+            amount_owed=owed / 100,
+            percent=splits[i] if split_method == "percent" else None,
+            shares=splits[i] if split_method == "shares" else None,
+        )
+        for i, (user_id, owed) in enumerate(zip(participants, cents))
+    ]
+
+
+def compute_split(amount: float, participants: list[UUID], split_method: str, splits: Optional[list[float]] = None) -> list[Split]:
+    """
+    Split one expense between its participants.
+    :param amount: The total amount of the expense.
+    :param participants: The IDs of the participants, in the order the splits refer to.
+    :param split_method: One of SPLIT_METHODS.
+    :param splits: Percentages, custom amounts or share counts, depending on the method.
+    :return: The share of each participant; the amounts add up to the expense amount.
+    :raises ValueError: If the split is invalid.
+    """
+    return compute_splits_batch([(amount, participants, split_method, splits)])[0]
+
+
+def compute_splits_batch(expenses: list[tuple[float, list[UUID], str, Optional[list[float]]]]) -> list[list[Split]]:
+    """
+    Split many expenses with a single vectorized allocation, for imports and recomputation.
+    :param expenses: (amount, participants, split_method, splits) for each expense.
+    :return: The shares of each expense, in the same order.
+    :raises ValueError: If any split is invalid. The message names the offending row.
+    """
+    weighted = []
+    for row, (amount, participants, split_method, splits) in enumerate(expenses):
+        if len(set(participants)) != len(participants):
+            raise ValueError(f"Duplicate participants in expense {row}." if len(expenses) > 1 else "Duplicate participants.")
+        try:
+            row_weights = split_weights(amount, len(participants), split_method, splits)
+        except ValueError as e:
+            raise ValueError(f"Expense {row}: {e}" if len(expenses) > 1 else str(e))
+        weighted.append((amount, participants, split_method, splits, row_weights))
+
+    return allocate_splits_batch(weighted)
+
+
+def allocate_splits_batch(expenses: list[tuple[float, list[UUID], str, Optional[list[float]], list[float]]]) -> list[list[Split]]:
+    """
+    Split many expenses whose splits were already validated, with a single vectorized allocation.
+    :param expenses: (amount, participants, split_method, splits, weights) for each expense, the
+        weights being what split_weights returned for it.
+    :return: The shares of each expense, in the same order.
+    """
+    if not expenses:
+        return []
+
+    width = max(len(row_weights) for *_, row_weights in expenses)
+    amounts = np.empty(len(expenses), dtype=np.float64)
+    weights = np.zeros((len(expenses), max(width, 1)), dtype=np.float64)
+
+    for row, (amount, _, _, _, row_weights) in enumerate(expenses):
+        amounts[row] = amount
+        weights[row, :len(row_weights)] = row_weights
+
+    cents = allocate_cents(amounts, weights).tolist() # plain ints are cheaper to read one by one than numpy scalars
+
+    return [
+        build_splits(participants, split_method, splits, cents[row][:len(participants)])
+        for row, (_, participants, split_method, splits, _) in enumerate(expenses)
+    ]
@@ -0,0 +1,38 @@
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Iterator
+
+from app.utils.metrics import app_startup_duration
+
+
+class StartupTimer:
+    """Time the phases of application startup, reported in the log and in /metrics."""
+
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+
+    def record(self, phase: str, seconds: float) -> None:
+        """
+        :param phase: The name of the phase, e.g. "imports" or "db".
+        :param seconds: How long the phase took.
+        """
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+        app_startup_duration.set(self.phases[phase], phase)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the code inside the block as a startup phase."""
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, perf_counter() - started)
+
+    def summary(self) -> str:
+        """:return: Every phase and the total in milliseconds, e.g. "imports=640ms db=12ms total=652ms"."""
+        parts = [f"{phase}={seconds * 1000:.0f}ms" for phase, seconds in self.phases.items()]
+        parts.append(f"total={sum(self.phases.values()) * 1000:.0f}ms")
+        return " ".join(parts)
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,115 @@
+"""
+Concurrency check and benchmark for the conflict-driven writes.
+Fires JOINS simultaneous POST /groups/join for distinct users at one group, then the
+same joins again, and checks that every first join succeeded, every repeat got 409 and
+the membership count, ledger totals, revision and change log moved exactly once per
+member. Also races duplicate signups for one email and a group creation whose first
+invite code is already taken.
+
+    cd backend && python -m benchmarks.bench_concurrent_joins [joins]
+"""
+import asyncio
+import sys
+from collections import Counter
+
+import httpx
+from sqlalchemy import select, func
+
+from app.crud import group as group_crud
+from app.db.models import Group, GroupMember, GroupChange, GroupTotals
+from app.main import app
+from benchmarks.common import QueryCounter, timer, percentile, prepare_database, new_session, seed_user, seed_group, auth_headers
+
+JOINS = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+SIGNUPS = 20
+PASSWORD = "password1"
+
+
+async def group_state(group_id) -> dict:
+    """Membership count, ledger member count, revision and member changes of a group."""
+    async with new_session() as db:
+        return {
+            "members": await db.scalar(select(func.count()).select_from(GroupMember).where(GroupMember.group_id == group_id)),
+            "ledger_members": await db.scalar(select(GroupTotals.member_count).where(GroupTotals.group_id == group_id)),
+            "revision": await db.scalar(select(Group.revision).where(Group.id == group_id)),
+            "member_changes": await db.scalar(
+                select(func.count()).select_from(GroupChange).where(GroupChange.group_id == group_id, GroupChange.entity_type == "member")
+            ),
+        }
+
+
+async def join_all(client: httpx.AsyncClient, invite_code: str, users: list) -> tuple[Counter, list[float], float]:
+    """Send one join per user at the same time; return the status codes, latencies and wall time."""
+    latencies = []
+
+    async def join(user):
+        with timer() as elapsed:
+            response = await client.post("/groups/join", json={"invite_code": invite_code}, headers=auth_headers(user))
+        latencies.append(elapsed["ms"])
+        return response.status_code
+
+    with timer() as wall:
+        statuses = await asyncio.gather(*[join(user) for user in users])
+    return Counter(statuses), latencies, wall["ms"]
+
+
+async def run():
+    await prepare_database()
+    async with new_session() as db:
+        owner = await seed_user(db)
+        users = [await seed_user(db) for _ in range(JOINS)]
+        group = await seed_group(db, owner, [], expense_count=0)
+        await db.commit()
+    before = await group_state(group.id)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench/api/v1") as client:
+        for user in users: # warm the user cache so the race is between the joins alone
+            assert (await client.get("/me", headers=auth_headers(user))).status_code == 200
+
+        with QueryCounter() as queries:
+            statuses, latencies, wall = await join_all(client, group.invite_code, users)
+        print(f"{JOINS} concurrent joins: {dict(statuses)} in {wall:.0f}ms, p50={percentile(latencies, 50):.1f}ms "
+              f"p99={percentile(latencies, 99):.1f}ms, {queries.count / JOINS:.1f} statements per join")
+        assert statuses == Counter({200: JOINS}), statuses
+
+        statuses, latencies, wall = await join_all(client, group.invite_code, users)
+        print(f"{JOINS} repeated joins:  {dict(statuses)} in {wall:.0f}ms, p50={percentile(latencies, 50):.1f}ms")
+        assert statuses == Counter({409: JOINS}), statuses
+
+        after = await group_state(group.id)
+        print(f"group before={before} after={after}")
+        assert after["members"] == before["members"] + JOINS
+        assert after["ledger_members"] == before["ledger_members"] + JOINS
+        assert after["revision"] == before["revision"] + JOINS
+        assert after["member_changes"] == before["member_changes"] + JOINS
+
+        response = await client.post("/groups/join", json={"invite_code": "NOSUCHCD"}, headers=auth_headers(owner))
+        print(f"unknown invite code: {response.status_code}")
+        assert response.status_code == 404, response.text
+
+        # duplicate signups race on the unique email
+        email = f"race-{group.invite_code.lower()}@example.com"
+        signup = {"first_name": "Race", "last_name": "Condition", "email": email, "password": PASSWORD, "confirmPassword": PASSWORD}
+        statuses = Counter(
+            response.status_code
+            for response in await asyncio.gather(*[client.post("/register", json=signup) for _ in range(SIGNUPS)])
+        )
+        print(f"{SIGNUPS} concurrent signups for one email: {dict(statuses)}")
+        assert statuses == Counter({201: 1, 409: SIGNUPS - 1}), statuses
+
+        # a colliding invite code is retried with a fresh one
+        codes = iter([group.invite_code])
+        fresh_code = group_crud.generate_invite_code
+        group_crud.generate_invite_code = lambda: next(codes, None) or fresh_code()
+        try:
+            with QueryCounter() as queries:
+                response = await client.post("/groups/create", json={"name": "Collision", "description": "Retried"}, headers=auth_headers(owner))
+        finally:
+            group_crud.generate_invite_code = fresh_code
+        print(f"create with a taken invite code: {response.status_code}, {queries.count} statements")
+        assert response.status_code == 201, response.text
+        assert response.json()["invite_code"] != group.invite_code
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+"""
+Benchmark for POST /expenses/create/{group_id}.
+Measures the latency, statement count and commit count of writing an expense
+together with its shares for 2, 10 and 100 participants.
+
+    cd backend && python -m benchmarks.bench_create_expense
+
+Local Postgres, one expense per transaction:
+
+    participants   p50       p95       statements/expense  commits/expense
+    2              4.60ms    5.59ms    7                   1
+    10             5.45ms    6.26ms    7                   1
+    100            13.51ms   15.24ms   7                   1
+"""
+import asyncio
+
+from sqlalchemy import event
+
+from app.crud.expense import create_expense_in_db
+from app.db.database import engine
+from app.schemas.expense import ExpenseCreate, ExpenseSharesCreate
+from benchmarks.common import QueryCounter, timer, percentile, prepare_database, new_session, seed_user, seed_group
+
+PARTICIPANT_COUNTS = [2, 10, 100]
+ITERATIONS = 50
+
+
+async def run():
+    await prepare_database()
+
+    for participant_count in PARTICIPANT_COUNTS:
+        async with new_session() as db:
+            owner = await seed_user(db)
+            members = [await seed_user(db) for _ in range(participant_count - 1)]
+            group = await seed_group(db, owner, members, expense_count=0)
+            await db.commit()
+
+        participants = [owner.id, *[member.id for member in members]]
+        expense = ExpenseCreate(
+            name="Rent",
+            amount=1200.0,
+            expense_type="rent",
+            split_method="equal",
+            participants=participants,
+        )
+        amount_per_person = round(expense.amount / participant_count, 2)
+        shares = {
+            user_id: ExpenseSharesCreate(
+                amount_owed=amount_per_person,
+                amount_paid=expense.amount if user_id == owner.id else 0,
+                settled=user_id == owner.id,
+            )
+            for user_id in participants
+        }
+
+        commits = 0
+
+        def count_commit(conn):
+            nonlocal commits
+            commits += 1
+
+        event.listen(engine.sync_engine, "commit", count_commit)
+        samples = []
+        try:
+            with QueryCounter() as counter:
+                for _ in range(ITERATIONS):
+                    async with new_session() as db:
+                        with timer() as elapsed:
+                            await create_expense_in_db(db, expense, owner, group.id, shares)
+                            await db.commit() # the request's unit of work commits in the API
+                        samples.append(elapsed["ms"])
+        finally:
+            event.remove(engine.sync_engine, "commit", count_commit)
+
+        print(
+            f"participants={participant_count:4d} "
+            f"p50={percentile(samples, 50):.2f}ms p95={percentile(samples, 95):.2f}ms "
+            f"statements/expense={counter.count / ITERATIONS:.1f} commits/expense={commits / ITERATIONS:.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
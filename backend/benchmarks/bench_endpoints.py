@@ -0,0 +1,279 @@
+"""
+End-to-end benchmark of every HTTP endpoint.
+Seeds a dataset of the requested scale with bulk inserts, then drives each route of
+app/routers through an in-process httpx.AsyncClient against app.main.app and reports
+p50/p95/p99 latency, throughput, SQL statements and commits/rollbacks per request for each endpoint.
+The results are written as JSON so runs can be compared across commits:
+
+    cd backend && python -m benchmarks.bench_endpoints --groups 200 --expenses 500 --output before.json
+    cd backend && python -m benchmarks.bench_endpoints --groups 200 --expenses 500 --baseline before.json
+
+GET /events is a long lived stream and is covered by bench_events instead.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable
+
+import httpx
+from sqlalchemy import text
+
+from app.db.database import engine
+from app.main import app
+from app.utils.auth import hash_password, create_access_token
+from benchmarks.common import QueryCounter, TransactionCounter, percentile, prepare_database
+from benchmarks.seed import seed_scale, seeded_id
+
+PASSWORD = "password1"
+IMPORT_ROWS = 100
+
+
+@dataclass
+class Endpoint:
+    """One route to benchmark: `request(i)` returns the method, path and httpx keyword arguments of request i."""
+    name: str
+    request: Callable[[int], tuple]
+    expected_status: int = 200
+    max_requests: int = 0 # 0 means --requests, lower it for routes that consume seeded data
+    samples: list = field(default_factory=list)
+
+
+def bearer(user_id) -> dict:
+    """Bearer token headers for a user id."""
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': str(user_id)})}"}
+
+
+class Dataset:
+    """The ids of the seeded rows, recomputed from the seed tag."""
+
+    def __init__(self, tag: str, args):
+        self.tag = tag
+        self.users = args.users
+        self.groups = args.groups
+        self.members = args.members
+        self.expenses = args.expenses
+        self._headers = {}
+
+    def user_number(self, group: int, k: int) -> int:
+        return (group * self.members + k) % self.users + 1
+
+    def user(self, number: int) -> uuid.UUID:
+        return seeded_id(self.tag, "u", number)
+
+    def email(self, number: int) -> str:
+        return f"seed-{self.tag}-{number}@example.com"
+
+    def group(self, i: int) -> tuple[int, uuid.UUID]:
+        number = i % self.groups + 1
+        return number, seeded_id(self.tag, "g", number)
+
+    def admin(self, group: int) -> int:
+        return self.user_number(group, 0)
+
+    def member_ids(self, group: int) -> list[str]:
+        return [str(self.user(self.user_number(group, k))) for k in range(self.members)]
+
+    def expense(self, group: int, i: int) -> uuid.UUID:
+        return seeded_id(self.tag, "e", group, i % self.expenses + 1)
+
+    def headers(self, number: int) -> dict:
+        if number not in self._headers:
+            self._headers[number] = bearer(self.user(number))
+        return self._headers[number]
+
+
+def import_csv(participants: list[str]) -> str:
+    rows = [f"Imported {i},30,groceries,equal,{';'.join(participants)}" for i in range(IMPORT_ROWS)]
+    return "name,amount,expense_type,split_method,participants\n" + "\n".join(rows) + "\n"
+
+
+def endpoints(data: Dataset, join_code: str) -> list[Endpoint]:
+    """Every route of app/routers except the event stream, reads first so they see the seeded scale."""
+
+    def as_admin(i):
+        group, group_id = data.group(i)
+        return group, group_id, data.headers(data.admin(group))
+
+    def get(path_for):
+        def request(i):
+            group, group_id, headers = as_admin(i)
+            return "GET", path_for(i, group, group_id), {"headers": headers}
+        return request
+
+    return [
+        Endpoint("GET /me", get(lambda i, g, gid: "/me")),
+        Endpoint("GET /users/single/{user_id}", get(lambda i, g, gid: f"/users/single/{data.user(data.user_number(g, 1))}")),
+        Endpoint("GET /groups/all", get(lambda i, g, gid: "/groups/all")),
+        Endpoint("GET /groups/single/{group_id}", get(lambda i, g, gid: f"/groups/single/{gid}")),
+        Endpoint("GET /groups/get-members/{group_id}", get(lambda i, g, gid: f"/groups/get-members/{gid}")),
+        Endpoint("GET /groups/{group_id}/settle-up", get(lambda i, g, gid: f"/groups/{gid}/settle-up")),
+        Endpoint("GET /groups/{group_id}/changes", get(lambda i, g, gid: f"/groups/{gid}/changes?since=0")),
+        Endpoint("GET /get/expense/{expense_id}", get(lambda i, g, gid: f"/get/expense/{data.expense(g, i)}")),
+        Endpoint("GET /get/expense/all/{group_id}", get(lambda i, g, gid: f"/get/expense/all/{gid}")),
+        Endpoint("GET /expenses/export/{group_id}", get(lambda i, g, gid: f"/expenses/export/{gid}?format=csv")),
+        Endpoint("POST /login", lambda i: (
+            "POST", "/login", {"data": {"username": data.email(i % data.users + 1), "password": PASSWORD}},
+        )),
+        Endpoint("POST /register", lambda i: (
+            "POST", "/register", {"json": {
+                "first_name": "Bench", "last_name": "User", "email": f"bench-{uuid.uuid4().hex[:12]}@example.com",
+                "password": PASSWORD, "confirmPassword": PASSWORD,
+            }},
+        ), expected_status=201),
+        Endpoint("POST /groups/create", lambda i: (
+            "POST", "/groups/create", {"json": {"name": f"Bench group {i}", "description": "benchmark"}, "headers": as_admin(i)[2]},
+        ), expected_status=201),
+        Endpoint("PUT /groups/update/{group_id}", lambda i: (
+            "PUT", f"/groups/update/{as_admin(i)[1]}", {"json": {"name": f"Renamed {i}", "description": "benchmark"}, "headers": as_admin(i)[2]},
+        )),
+        Endpoint("POST /groups/join", lambda i: (
+            "POST", "/groups/join", {"json": {"invite_code": join_code}, "headers": data.headers(i + 1)},
+        ), max_requests=data.users), # each seeded user can join the target group once
+        Endpoint("POST /expenses/create/{group_id}", lambda i: (
+            "POST", f"/expenses/create/{as_admin(i)[1]}", {"json": {
+                "name": f"Bench expense {i}", "amount": 42.5, "expense_type": "groceries",
+                "split_method": "equal", "participants": data.member_ids(as_admin(i)[0]),
+            }, "headers": as_admin(i)[2]},
+        ), expected_status=201),
+        Endpoint("POST /expenses/import/{group_id}", lambda i: (
+            "POST", f"/expenses/import/{as_admin(i)[1]}?format=csv", {
+                "content": import_csv(data.member_ids(as_admin(i)[0])),
+                "headers": {**as_admin(i)[2], "Content-Type": "text/csv"},
+            },
+        )),
+        Endpoint("POST /change-password", lambda i: (
+            "POST", "/change-password", {"json": {
+                "current_password": PASSWORD, "new_password": PASSWORD, "confirm_new_password": PASSWORD,
+            }, "headers": data.headers(i % data.users + 1)},
+        )),
+    ]
+
+
+async def drive(client: httpx.AsyncClient, endpoint: Endpoint, requests: int, concurrency: int) -> dict:
+    """Send `requests` requests to one endpoint, `concurrency` at a time, and summarise them."""
+    if endpoint.max_requests:
+        requests = min(requests, endpoint.max_requests)
+    semaphore = asyncio.Semaphore(concurrency)
+    statuses = {}
+
+    async def one(i):
+        method, path, kwargs = endpoint.request(i)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            endpoint.samples.append((time.perf_counter() - started) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    with QueryCounter() as counter, TransactionCounter() as transactions:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(requests)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": requests,
+        "p50_ms": round(percentile(endpoint.samples, 50), 2),
+        "p95_ms": round(percentile(endpoint.samples, 95), 2),
+        "p99_ms": round(percentile(endpoint.samples, 99), 2),
+        "mean_ms": round(sum(endpoint.samples) / requests, 2),
+        "throughput_rps": round(requests / elapsed, 1),
+        "queries_per_request": round(counter.count / requests, 2),
+        "commits_per_request": round(transactions.commits / requests, 2),
+        "rollbacks_per_request": round(transactions.rollbacks / requests, 2),
+        "errors": requests - statuses.get(endpoint.expected_status, 0),
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results: dict, baseline: dict) -> None:
+    print(f"{'endpoint':36s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'req/s':>8s} {'sql':>6s} {'commit':>6s} {'rollbk':>6s} {'err':>4s}")
+    for name, result in results["endpoints"].items():
+        line = (
+            f"{name:36s} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} {result['p99_ms']:8.2f} "
+            f"{result['throughput_rps']:8.1f} {result['queries_per_request']:6.1f} "
+            f"{result.get('commits_per_request', 0):6.1f} {result.get('rollbacks_per_request', 0):6.1f} {result['errors']:4d}"
+        )
+        before = baseline.get("endpoints", {}).get(name)
+        if before:
+            line += f"   p50 x{result['p50_ms'] / max(before['p50_ms'], 0.01):.2f} sql {before['queries_per_request']:.1f}->{result['queries_per_request']:.1f}"
+            if "commits_per_request" in before:
+                line += f" commit {before['commits_per_request']:.1f}->{result['commits_per_request']:.1f}"
+        print(line)
+
+
+async def run(args) -> int:
+    await prepare_database()
+    seed_started = time.perf_counter()
+    async with engine.begin() as conn:
+        tag = await seed_scale(conn, args.users, args.groups, args.members, args.expenses, password_hash=hash_password(PASSWORD))
+        await conn.execute(text("ANALYZE"))
+    seed_seconds = time.perf_counter() - seed_started
+    data = Dataset(tag, args)
+    print(
+        f"seeded users={args.users} groups={args.groups} members={args.members} expenses/group={args.expenses} "
+        f"in {seed_seconds:.1f}s"
+    )
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench/api/v1", timeout=None) as client:
+        # a group nobody from the seed belongs to, for POST /groups/join
+        response = await client.post("/register", json={
+            "first_name": "Join", "last_name": "Target", "email": f"join-{tag}@example.com",
+            "password": PASSWORD, "confirmPassword": PASSWORD,
+        })
+        response.raise_for_status()
+        owner = response.json()["id"]
+        response = await client.post("/groups/create", json={"name": "Join target"}, headers=bearer(owner))
+        response.raise_for_status()
+        join_code = response.json()["invite_code"]
+
+        results = {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "scale": {"users": args.users, "groups": args.groups, "members": args.members, "expenses": args.expenses},
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "endpoints": {},
+        }
+        selected = [endpoint for endpoint in endpoints(data, join_code) if not args.only or any(part in endpoint.name for part in args.only)]
+        for endpoint in selected:
+            results["endpoints"][endpoint.name] = await drive(client, endpoint, args.requests, args.concurrency)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {args.output}")
+
+    await engine.dispose()
+    return 1 if any(result["errors"] for result in results["endpoints"].values()) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--members", type=int, default=4, help="members per group")
+    parser.add_argument("--expenses", type=int, default=100, help="expenses per group")
+    parser.add_argument("--requests", type=int, default=100, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=1, help="requests in flight per endpoint")
+    parser.add_argument("--only", nargs="*", help="only run endpoints whose name contains one of these strings")
+    parser.add_argument("--output", default="bench_endpoints.json", help="where to write the JSON results")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    sys.exit(asyncio.run(run(parser.parse_args())))
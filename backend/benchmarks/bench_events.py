@@ -0,0 +1,165 @@
+"""
+Idle subscriber benchmark for the GET /events stream.
+Connects SUBSCRIBERS event streams for members of one group to the ASGI app in this
+process, then reports the memory cost of the idle streams, the event loop lag they cause,
+the fan-out latency of one expense created through the API, and checks that a stalled
+client is dropped instead of buffering without bound.
+
+    cd backend && python -m benchmarks.bench_events [subscribers]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+from app.main import app
+from app.utils.events import event_broker
+from benchmarks.common import timer, current_rss_mb, percentile, prepare_database, new_session, seed_user, seed_group, auth_headers
+
+SUBSCRIBERS = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+CONNECT_BATCH = 500
+IDLE_SECONDS = 5
+MAX_LAG_MS = 50
+
+
+class StreamClient:
+    """Drive one GET /events request through the ASGI app and record when events arrive."""
+
+    def __init__(self, path: str, headers: dict, stall: bool = False):
+        self.path, _, self.query = path.partition("?")
+        self.headers = headers
+        self.status = None
+        self.events: list[tuple[str, float]] = []
+        self.connected = asyncio.Event()
+        self.disconnect = asyncio.Event()
+        self.unstall = asyncio.Event()
+        self.stall = stall
+        self._request_sent = False
+
+    async def receive(self):
+        if not self._request_sent:
+            self._request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            arrived = time.perf_counter()
+            for line in body.split(b"\n"):
+                if line.startswith(b"event: "):
+                    self.events.append((line[7:].decode(), arrived))
+            self.connected.set()
+            if self.stall and body.startswith(b"event: "):
+                await self.unstall.wait() # a client that stops reading after the first event
+
+    async def run(self):
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": self.path, "raw_path": self.path.encode(), "query_string": self.query.encode(),
+            "root_path": "", "server": ("bench", 80), "client": ("bench", 1234),
+            "headers": [(key.lower().encode(), value.encode()) for key, value in self.headers.items()],
+        }
+        await app(scope, self.receive, self.send)
+
+
+async def measure_lag(seconds: float, interval: float = 0.05) -> list[float]:
+    """Sleep in a loop and record how late each wake-up is, in milliseconds."""
+    lags = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append((time.perf_counter() - start - interval) * 1000)
+    return lags
+
+
+async def run():
+    await prepare_database()
+    async with new_session() as db:
+        owner = await seed_user(db)
+        members = [await seed_user(db) for _ in range(3)]
+        group = await seed_group(db, owner, members, expense_count=0)
+        slow_owner = await seed_user(db)
+        slow_group = await seed_group(db, slow_owner, [], expense_count=0)
+        await db.commit()
+
+    everyone = [owner, *members]
+    clients = [StreamClient("/api/v1/events", auth_headers(everyone[i % len(everyone)])) for i in range(SUBSCRIBERS)]
+    tasks = []
+
+    baseline_rss = current_rss_mb()
+    with timer() as connect:
+        for start in range(0, SUBSCRIBERS, CONNECT_BATCH):
+            batch = clients[start:start + CONNECT_BATCH]
+            tasks += [asyncio.create_task(client.run()) for client in batch]
+            await asyncio.gather(*(client.connected.wait() for client in batch))
+    assert all(client.status == 200 for client in clients)
+    assert event_broker.stats()["subscribers"] == SUBSCRIBERS, event_broker.stats()
+    idle_rss = current_rss_mb()
+
+    lags = await measure_lag(IDLE_SECONDS)
+    print(
+        f"subscribers={SUBSCRIBERS} connect={connect['ms'] / 1000:.1f}s "
+        f"rss_growth={idle_rss - baseline_rss:.0f}MiB ({(idle_rss - baseline_rss) * 1024 / SUBSCRIBERS:.1f}KiB/subscriber)"
+    )
+    print(f"idle loop lag p50={percentile(lags, 50):.2f}ms p99={percentile(lags, 99):.2f}ms max={max(lags):.2f}ms")
+
+    published = {}
+    publish = event_broker.publish
+
+    def timed_publish(group_id, event_type, data):
+        started = time.perf_counter()
+        delivered = publish(group_id, event_type, data)
+        published[event_type] = (started, (time.perf_counter() - started) * 1000)
+        return delivered
+
+    event_broker.publish = timed_publish # time the fan-out from the moment the crud layer publishes
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench/api/v1") as client:
+        response = await client.post(
+            f"/expenses/create/{group.id}",
+            json={"name": "Groceries", "amount": 40, "expense_type": "groceries", "split_method": "equal", "participants": [str(user.id) for user in everyone]},
+            headers=auth_headers(owner),
+        )
+        assert response.status_code == 201, response.text
+    event_broker.publish = publish
+
+    while not all(any(name == "balance_changed" for name, _ in client.events) for client in clients):
+        await asyncio.sleep(0.01)
+    published_at, publish_ms = published["expense_created"]
+    latencies = [
+        (next(arrived for name, arrived in client.events if name == "expense_created") - published_at) * 1000
+        for client in clients
+    ]
+    print(
+        f"fan-out publish()={publish_ms:.1f}ms delivery p50={percentile(latencies, 50):.1f}ms "
+        f"p99={percentile(latencies, 99):.1f}ms max={max(latencies):.1f}ms"
+    )
+
+    # a client that stops reading is dropped once its queue is full, and told to resync
+    slow = StreamClient("/api/v1/events", auth_headers(slow_owner), stall=True)
+    slow_task = asyncio.create_task(slow.run())
+    await slow.connected.wait()
+    dropped_before = event_broker.stats()["dropped"]
+    for i in range(event_broker.max_queued + 2):
+        event_broker.publish(slow_group.id, "balance_changed", {"group_id": slow_group.id, "revision": i})
+    assert event_broker.stats()["dropped"] == dropped_before + 1, event_broker.stats()
+    slow.unstall.set()
+    await asyncio.wait_for(slow_task, 5) # the stream ends after the resync event
+    assert slow.events[-1][0] == "resync", slow.events[-3:]
+    print(f"slow consumer dropped after {event_broker.max_queued} queued events, stream closed with resync")
+
+    for client in clients:
+        client.disconnect.set()
+    await asyncio.gather(*tasks)
+    assert event_broker.stats()["subscribers"] == 0, event_broker.stats()
+    assert max(lags) < MAX_LAG_MS, f"idle subscribers delayed the event loop by {max(lags):.1f}ms"
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
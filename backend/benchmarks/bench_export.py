@@ -0,0 +1,105 @@
+"""
+Memory check for GET /expenses/export/{group_id}.
+Seeds a group with 1M expense share rows, streams the export through the ASGI app
+while discarding the body, and fails if RSS grows past RSS_CEILING_MB.
+
+    cd backend && python -m benchmarks.bench_export [share_rows]
+
+1M share rows on a local Postgres, the process starting at about 86MiB:
+
+    format   size    time    peak RSS   RSS growth (ceiling 100MiB)
+    csv      217MB   11.1s   94.2MiB    8.2MiB
+    ndjson   455MB   12.4s   95.9MiB    3.1MiB
+"""
+import asyncio
+import sys
+
+from sqlalchemy import text
+
+from app.main import app
+from benchmarks.common import timer, PeakRSS, prepare_database, new_session, seed_user, seed_group, auth_headers
+
+SHARE_ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+MEMBERS = 4
+RSS_CEILING_MB = 100
+
+SEED_EXPENSES_SQL = """
+    INSERT INTO expenses (id, group_id, user_id, group_member_id, name, amount, expense_type, split_method, created_at)
+    SELECT gen_random_uuid(), :group_id, :user_id, :group_member_id, 'Expense ' || e, 40, 'groceries', 'equal',
+           now() - make_interval(mins => e)
+    FROM generate_series(1, :expenses) e
+"""
+SEED_SHARES_SQL = """
+    INSERT INTO expense_shares (id, expense_id, user_id, amount_owed, amount_paid, settled)
+    SELECT gen_random_uuid(), e.id, m.user_id, 10, CASE WHEN m.user_id = e.user_id THEN 40 ELSE 0 END, m.user_id = e.user_id
+    FROM expenses e JOIN group_members m ON m.group_id = e.group_id
+    WHERE e.group_id = :group_id
+"""
+
+
+async def export(path: str, headers: dict) -> tuple[int, int]:
+    """Call the app directly, counting and discarding the streamed body."""
+    received = {"bytes": 0, "lines": 0, "status": None}
+    request_sent = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait() # the client stays connected until the body is complete
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            received["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            received["bytes"] += len(body)
+            received["lines"] += body.count(b"\n")
+            if not message.get("more_body", False):
+                finished.set()
+
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": query.encode(),
+        "root_path": "", "server": ("bench", 80), "client": ("bench", 1234),
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+    }
+    await app(scope, receive, send)
+    assert received["status"] == 200, received
+    return received["lines"], received["bytes"]
+
+
+async def run():
+    await prepare_database()
+    async with new_session() as db:
+        owner = await seed_user(db)
+        members = [await seed_user(db) for _ in range(MEMBERS - 1)]
+        group = await seed_group(db, owner, members, expense_count=0)
+        group_member_id = (await db.execute(
+            text("SELECT id FROM group_members WHERE group_id = :g AND user_id = :u"), {"g": group.id, "u": owner.id}
+        )).scalar_one()
+        params = {"group_id": group.id, "user_id": owner.id, "group_member_id": group_member_id, "expenses": SHARE_ROWS // MEMBERS}
+        await db.execute(text(SEED_EXPENSES_SQL), params)
+        await db.execute(text(SEED_SHARES_SQL), {"group_id": group.id})
+        await db.commit()
+
+    for format in ("csv", "ndjson"):
+        async with PeakRSS() as rss:
+            with timer() as elapsed:
+                lines, size = await export(f"/api/v1/expenses/export/{group.id}?format={format}", auth_headers(owner))
+
+        rows = lines - 1 if format == "csv" else lines
+        print(
+            f"{format:6s} rows={rows} size={size / 1e6:.0f}MB time={elapsed['ms'] / 1000:.1f}s "
+            f"peak_rss={rss.peak:.1f}MiB rss_growth={rss.growth:.1f}MiB (ceiling {RSS_CEILING_MB}MiB)"
+        )
+        assert rows == SHARE_ROWS // MEMBERS * MEMBERS, f"expected {SHARE_ROWS} rows, got {rows}"
+        assert rss.growth < RSS_CEILING_MB, f"RSS grew by {rss.growth:.1f}MiB"
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
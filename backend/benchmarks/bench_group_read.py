@@ -0,0 +1,104 @@
+"""
+Microbenchmark for the group read paths on a group with many expenses.
+Compares building the GET /groups/single body the old way (ORM entities, ExpenseSchema.model_validate,
+GroupOut, then FastAPI's response_model validation and json.dumps) with the Core row + orjson
+path, checks that both produce the same JSON, then times GET /groups/single and GET /groups/all
+end to end.
+
+    cd backend && python -m benchmarks.bench_group_read [expenses]
+"""
+import asyncio
+import json
+import sys
+import uuid
+
+import httpx
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+
+from app.crud.group import get_group_expense_rows
+from app.db.models import Expense, GroupMember
+from app.main import app
+from app.schemas.expense import Expense as ExpenseSchema
+from app.schemas.group import GroupOut
+from app.utils.responses import fast_json_response
+from benchmarks.common import timer, percentile, prepare_database, new_session, seed_user, seed_group, auth_headers
+
+EXPENSES = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+ITERATIONS = 20
+REQUESTS = 20
+
+
+async def seed_expenses(db, group, owner) -> None:
+    """Bulk insert expenses; the read paths do not look at shares or the ledger."""
+    member_id = await db.scalar(select(GroupMember.id).where(GroupMember.group_id == group.id, GroupMember.user_id == owner.id))
+    await db.execute(insert(Expense), [
+        {
+            "id": uuid.uuid4(), "group_id": group.id, "user_id": owner.id, "group_member_id": member_id,
+            "name": f"Expense {i}", "amount": 12.5 + i % 100, "expense_type": "groceries", "split_method": "equal",
+            "settled": False,
+        }
+        for i in range(EXPENSES)
+    ])
+
+
+async def orm_body(group, adapter: TypeAdapter) -> bytes:
+    """The GroupOut body as the endpoint used to build it."""
+    async with new_session() as db:
+        expenses = (await db.execute(select(Expense).where(Expense.group_id == group.id))).scalars().all()
+        out = GroupOut(
+            id=group.id, name=group.name, description=group.description, member_count=1,
+            expenses=[ExpenseSchema.model_validate(expense) for expense in expenses], grand_total=0, balance=0,
+        )
+    # what FastAPI does with a model returned from an endpoint with response_model=GroupOut
+    content = adapter.dump_python(adapter.validate_python(out.model_dump()), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+async def core_body(group) -> bytes:
+    """The GroupOut body from Core rows, rendered with orjson."""
+    async with new_session() as db:
+        expenses = await get_group_expense_rows(db, [group.id])
+    return fast_json_response({
+        "id": group.id, "name": group.name, "description": group.description, "member_count": 1,
+        "expenses": expenses[group.id], "grand_total": 0.0, "balance": 0.0,
+    }).body
+
+
+async def measure(label: str, build) -> bytes:
+    samples = []
+    for _ in range(ITERATIONS):
+        with timer() as elapsed:
+            body = await build()
+        samples.append(elapsed["ms"])
+    print(f"{label:<24} p50={percentile(samples, 50):7.1f}ms p95={percentile(samples, 95):7.1f}ms body={len(body) / 1024:.0f}KiB")
+    return body
+
+
+async def run():
+    await prepare_database()
+    async with new_session() as db:
+        owner = await seed_user(db)
+        group = await seed_group(db, owner, [], expense_count=0)
+        await seed_expenses(db, group, owner)
+        await db.commit()
+    print(f"group with {EXPENSES} expenses")
+
+    adapter = TypeAdapter(GroupOut)
+    old = await measure("ORM + pydantic + json", lambda: orm_body(group, adapter))
+    new = await measure("Core rows + orjson", lambda: core_body(group))
+    assert json.loads(old) == json.loads(new) and len(old) == len(new), "the fast path changed the response body"
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench/api/v1") as client:
+        for label, path in [("GET /groups/single", f"/groups/single/{group.id}"), ("GET /groups/all", "/groups/all")]:
+            samples = []
+            for _ in range(REQUESTS):
+                with timer() as elapsed:
+                    response = await client.get(path, headers=auth_headers(owner))
+                assert response.status_code == 200, response.text
+                samples.append(elapsed["ms"])
+            print(f"{label:<24} p50={percentile(samples, 50):7.1f}ms p95={percentile(samples, 95):7.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,41 @@
+"""
+Benchmark for GET /groups/all.
+Seeds a user that belongs to a growing number of groups and records how many SQL
+statements get_all_groups_in_db issues. The query count should stay flat.
+"""
+import asyncio
+
+from app.crud.group import get_all_groups_in_db
+from benchmarks.common import QueryCounter, timer, prepare_database, new_session, seed_user, seed_group
+
+GROUP_COUNTS = [1, 10, 50]
+MEMBERS_PER_GROUP = 4
+EXPENSES_PER_GROUP = 20
+
+
+async def run():
+    await prepare_database()
+    results = []
+
+    for group_count in GROUP_COUNTS:
+        async with new_session() as db:
+            owner = await seed_user(db)
+            members = [await seed_user(db) for _ in range(MEMBERS_PER_GROUP - 1)]
+            for _ in range(group_count):
+                await seed_group(db, owner, members, EXPENSES_PER_GROUP)
+            await db.commit()
+
+        async with new_session() as db:
+            with QueryCounter() as counter, timer() as elapsed:
+                groups = await get_all_groups_in_db(db, owner)
+
+        assert len(groups) == group_count
+        results.append((group_count, counter.count, elapsed["ms"]))
+        print(f"groups={group_count:4d} queries={counter.count:3d} time={elapsed['ms']:.1f}ms")
+
+    query_counts = {count for _, count, _ in results}
+    assert len(query_counts) == 1, f"query count grows with the number of groups: {results}"
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
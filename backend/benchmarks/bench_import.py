@@ -0,0 +1,78 @@
+"""
+Benchmark for POST /expenses/import/{group_id}.
+Streams a generated CSV and NDJSON upload through the endpoint and reports the
+import rate and the peak RSS growth while importing. Every 1000th row is invalid
+to exercise the error report, and in the CSV upload another row in every 1000 is not
+valid UTF-8, which must be reported as a row error rather than fail the upload.
+"""
+import asyncio
+import json
+import sys
+
+import httpx
+
+from app.main import app
+from benchmarks.common import timer, PeakRSS, prepare_database, new_session, seed_user, seed_group, auth_headers
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+MEMBERS = 4
+
+
+async def csv_body(participants: list[str], rows: int):
+    yield b"name,amount,expense_type,split_method,participants,splits,created_at\n"
+    batch = []
+    for i in range(rows):
+        amount = "-1" if i % 1000 == 999 else f"{10 + i % 500}.{i % 100:02d}"
+        name = f"Expense \udcff{i}" if i % 1000 == 499 else f"Expense {i}" # encodes to a lone 0xff byte
+        batch.append(f"{name},{amount},groceries,shares,{';'.join(participants)},1;1;2;1,2020-01-01T00:00:{i % 60:02d}Z\n")
+        if len(batch) == 500:
+            yield "".join(batch).encode("utf-8", "surrogateescape")
+            batch = []
+    if batch:
+        yield "".join(batch).encode("utf-8", "surrogateescape")
+
+
+async def ndjson_body(participants: list[str], rows: int):
+    batch = []
+    for i in range(rows):
+        record = {"name": f"Expense {i}", "amount": -1 if i % 1000 == 999 else 10 + i % 500, "expense_type": "rent",
+                  "split_method": "equal", "participants": participants}
+        batch.append(json.dumps(record) + "\n")
+        if len(batch) == 500:
+            yield "".join(batch).encode()
+            batch = []
+    if batch:
+        yield "".join(batch).encode()
+
+
+async def run():
+    await prepare_database()
+    async with new_session() as db:
+        owner = await seed_user(db)
+        members = [await seed_user(db) for _ in range(MEMBERS - 1)]
+        group = await seed_group(db, owner, members, expense_count=0)
+        await db.commit()
+    participants = [str(owner.id), *[str(member.id) for member in members]]
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench/api/v1", timeout=None) as client:
+        for format, body in (("csv", csv_body), ("ndjson", ndjson_body)):
+            async with PeakRSS() as rss:
+                with timer() as elapsed:
+                    response = await client.post(
+                        f"/expenses/import/{group.id}", params={"format": format},
+                        content=body(participants, ROWS), headers=auth_headers(owner),
+                    )
+            assert response.status_code == 200, response.text
+            result = response.json()
+            invalid = ROWS // 1000 * (2 if format == "csv" else 1)
+            assert result["failed"] == invalid and result["imported"] == ROWS - invalid, result
+            rate = ROWS / (elapsed["ms"] / 1000)
+            print(
+                f"{format:6s} rows={ROWS} imported={result['imported']} failed={result['failed']} "
+                f"time={elapsed['ms'] / 1000:.2f}s rate={rate:,.0f} rows/s rss_growth={rss.growth:.1f}MiB"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,103 @@
+"""
+End-to-end latency of cross-worker cache invalidation.
+Two PostgresInvalidationBus instances stand in for two workers: worker A commits group
+writes through the crud layer together with a group invalidation key, and the time until
+worker B has dropped its cached copy is measured. Also checks that a rolled back write
+invalidates nothing.
+
+    cd backend && python -m benchmarks.bench_invalidation [writes]
+"""
+import asyncio
+import sys
+import time
+
+from app.crud.revision import record_group_changes
+from app.db.database import engine
+from app.utils import invalidation
+from app.utils.cache import TTLCache
+from app.utils.invalidation import InvalidationBus, PostgresInvalidationBus, group_key, invalidate_on_commit
+from benchmarks.common import percentile, prepare_database, new_session, seed_user, seed_group
+
+WRITES = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+CHANNEL = "bench_cache_invalidation"
+P99_CEILING_MS = 50
+
+
+class WatchedCache(TTLCache):
+    """A cache that records when an entry is invalidated."""
+
+    def __init__(self):
+        super().__init__(ttl=60, max_entries=100)
+        self.invalidated = asyncio.Event()
+        self.invalidated_at = 0.0
+
+    def invalidate(self, key):
+        super().invalidate(key)
+        self.invalidated_at = time.perf_counter()
+        self.invalidated.set()
+
+
+async def measure(writer: InvalidationBus, reader_cache: WatchedCache, group_id) -> list[float]:
+    """Commit WRITES group changes through `writer` and time each invalidation of `reader_cache`."""
+    invalidation.invalidation_bus = writer # the session hooks publish through the module level bus
+    latencies = []
+    for _ in range(WRITES):
+        reader_cache.set(str(group_id), "cached group")
+        reader_cache.invalidated.clear()
+        async with new_session() as db:
+            await record_group_changes(db, group_id, [])
+            invalidate_on_commit(db, group_key(group_id)) # the app has no group cache, so the bench stands one in
+            started = time.perf_counter()
+            await db.commit()
+        await asyncio.wait_for(reader_cache.invalidated.wait(), 5)
+        latencies.append((reader_cache.invalidated_at - started) * 1000)
+    return latencies
+
+
+async def run():
+    await prepare_database()
+    async with new_session() as db:
+        owner = await seed_user(db)
+        group = await seed_group(db, owner, [], expense_count=0)
+        await db.commit()
+
+    # single process: the writer's own cache is invalidated on commit
+    memory_bus = InvalidationBus()
+    memory_cache = WatchedCache()
+    memory_bus.register("group", memory_cache)
+    latencies = await measure(memory_bus, memory_cache, group.id)
+    print(f"memory   writes={WRITES} p50={percentile(latencies, 50):.3f}ms p99={percentile(latencies, 99):.3f}ms")
+
+    # two workers: A writes, B listens
+    worker_a = PostgresInvalidationBus(engine, CHANNEL)
+    worker_b = PostgresInvalidationBus(engine, CHANNEL)
+    worker_b_cache = WatchedCache()
+    worker_b.register("group", worker_b_cache)
+    await worker_a.start()
+    await worker_b.start()
+    try:
+        latencies = await measure(worker_a, worker_b_cache, group.id)
+        print(
+            f"postgres writes={WRITES} p50={percentile(latencies, 50):.2f}ms p95={percentile(latencies, 95):.2f}ms "
+            f"p99={percentile(latencies, 99):.2f}ms max={max(latencies):.2f}ms received={worker_b.received}"
+        )
+        assert percentile(latencies, 99) < P99_CEILING_MS, f"p99 invalidation latency {percentile(latencies, 99):.1f}ms"
+
+        # a rolled back write must not invalidate anything
+        worker_b_cache.set(str(group.id), "cached group")
+        worker_b_cache.invalidated.clear()
+        async with new_session() as db:
+            await record_group_changes(db, group.id, [])
+            invalidate_on_commit(db, group_key(group.id))
+            await db.rollback()
+        await asyncio.sleep(0.2)
+        assert not worker_b_cache.invalidated.is_set(), "a rolled back write invalidated the cache"
+        assert worker_b_cache.get(str(group.id)) == "cached group"
+        print("rollback: no invalidation published")
+    finally:
+        await worker_a.stop()
+        await worker_b.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
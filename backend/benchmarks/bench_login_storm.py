@@ -0,0 +1,63 @@
+"""
+Benchmark for bcrypt offloading.
+Fires a storm of concurrent logins while probing an unrelated endpoint (GET /me)
+and compares the probe latency with a quiet baseline. With bcrypt on the password
+pool the probe p99 should stay close to the baseline.
+"""
+import asyncio
+import uuid
+
+import httpx
+
+from app.main import app
+from app.utils.auth import password_pool_stats
+from benchmarks.common import timer, percentile, prepare_database
+
+LOGINS = 50
+PROBES = 200
+
+
+async def probe(client: httpx.AsyncClient, headers: dict, count: int, until: asyncio.Future = None) -> list[float]:
+    """Call GET /me `count` times, or until `until` is done when it is given."""
+    samples = []
+    while (until is None and len(samples) < count) or (until is not None and not until.done()):
+        with timer() as elapsed:
+            response = await client.get("/me", headers=headers)
+        assert response.status_code == 200, response.text
+        samples.append(elapsed["ms"])
+        await asyncio.sleep(0.005)
+    return samples
+
+
+async def run():
+    await prepare_database()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench/api/v1") as client:
+        email = f"storm-{uuid.uuid4().hex[:12]}@example.com"
+        password = "storm-password"
+        response = await client.post("/register", json={
+            "first_name": "Storm", "last_name": "Bench", "email": email,
+            "password": password, "confirmPassword": password,
+        })
+        assert response.status_code == 201, response.text
+        response = await client.post("/login", data={"username": email, "password": password})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        baseline = await probe(client, headers, PROBES)
+
+        async def login():
+            response = await client.post("/login", data={"username": email, "password": password})
+            assert response.status_code == 200, response.text
+
+        with timer() as storm_elapsed:
+            storm = asyncio.gather(*[login() for _ in range(LOGINS)])
+            during_storm = await probe(client, headers, PROBES, until=storm)
+            await storm
+
+    print(f"baseline     /me p50={percentile(baseline, 50):.2f}ms p99={percentile(baseline, 99):.2f}ms")
+    print(f"login storm  /me p50={percentile(during_storm, 50):.2f}ms p99={percentile(during_storm, 99):.2f}ms")
+    print(f"{LOGINS} logins in {storm_elapsed['ms']:.0f}ms, pool stats: {password_pool_stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,63 @@
+"""
+Benchmark for the settle-up engine.
+Builds net balances from synthetic expense shares and times the heap and the
+vectorized paths. Both plans are checked to settle every balance exactly.
+Runs without a database:
+
+    cd backend && python -m benchmarks.bench_settle_up
+"""
+import uuid
+from collections import defaultdict
+
+import numpy as np
+
+from app.utils.settle_up import simplify_debts, simplify_debts_vectorized, to_cents
+from benchmarks.common import timer
+
+SCALES = [(10, 1_000), (1_000, 100_000), (5_000, 500_000)]  # (members, shares)
+
+
+def synthetic_balances(member_count: int, share_count: int, seed: int = 0) -> dict:
+    """Aggregate random paid/owed shares into net balances per member."""
+    rng = np.random.default_rng(seed)
+    user_ids = [uuid.uuid4() for _ in range(member_count)]
+    members = rng.integers(0, member_count, size=share_count)
+    owed = rng.integers(100, 10_000, size=share_count) / 100
+    payers = rng.integers(0, member_count, size=share_count)
+
+    net = np.bincount(payers, weights=owed, minlength=member_count) - np.bincount(members, weights=owed, minlength=member_count)
+    return {user_id: float(balance) for user_id, balance in zip(user_ids, net)}
+
+
+def check_plan(balances: dict, transfers: list) -> None:
+    """Assert that applying the transfers brings every balance to zero."""
+    remaining = defaultdict(int, to_cents(balances))
+    for transfer in transfers:
+        cents = int(round(transfer.amount * 100))
+        remaining[transfer.payer_id] += cents
+        remaining[transfer.payee_id] -= cents
+    assert not any(remaining.values()), "transfer plan does not settle the group"
+    assert len(transfers) < max(len(balances), 1), "more transfers than members"
+
+
+def run():
+    for member_count, share_count in SCALES:
+        balances = synthetic_balances(member_count, share_count)
+
+        with timer() as heap_elapsed:
+            heap_plan = simplify_debts(balances)
+        with timer() as vector_elapsed:
+            vector_plan = simplify_debts_vectorized(balances)
+
+        check_plan(balances, heap_plan)
+        check_plan(balances, vector_plan)
+
+        print(
+            f"members={member_count:5d} shares={share_count:7d} "
+            f"heap={heap_elapsed['ms']:.1f}ms ({len(heap_plan)} transfers) "
+            f"vectorized={vector_elapsed['ms']:.1f}ms ({len(vector_plan)} transfers)"
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,102 @@
+"""
+Cold start benchmark.
+Boots the application in a fresh interpreter per startup mode, runs its lifespan and then
+fires the first concurrent requests, reporting the startup phases and first request latency:
+
+    create_all            init_db() on every boot, cold pool
+    verify                Alembic head check, cold pool
+    verify + warm         Alembic head check, DB_WARM_CONNECTIONS connections opened and warmed
+    verify pinned + warm  as above with DB_SCHEMA_REVISION set, so the Alembic scripts are not loaded
+
+The scratch database is stamped at the Alembic head first, as `alembic upgrade head` would leave it.
+Also checks that verify mode refuses to start against a database at another revision.
+
+    cd backend && python -m benchmarks.bench_startup [warm connections]
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+from sqlalchemy import text
+
+WARM = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1] != "--child" else 8
+FIRST_REQUESTS = 8
+
+
+async def child():
+    """Run in the spawned interpreter: start the app, then time the first requests."""
+    from app.main import app
+    from app.utils.startup import startup_timer
+    import httpx
+
+    headers = {"Authorization": f"Bearer {os.environ['BENCH_TOKEN']}"}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench/api/v1") as client:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*[client.get("/groups/all", headers=headers) for _ in range(FIRST_REQUESTS)])
+            first_requests_ms = (time.perf_counter() - started) * 1000
+    assert all(response.status_code == 200 for response in responses), [response.status_code for response in responses]
+    print("RESULT " + json.dumps({"phases": startup_timer.phases, "first_requests_ms": first_requests_ms}))
+
+
+def spawn(env: dict) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-W", "ignore", "-m", "benchmarks.bench_startup", "--child"],
+        env={**os.environ, **env}, capture_output=True, text=True,
+    )
+
+
+async def prepare() -> tuple[str, str]:
+    """Seed a user with a group and stamp the database; return a token and the Alembic head."""
+    from app.db.startup import expected_schema_revisions
+    from benchmarks.common import prepare_database, new_session, seed_user, seed_group, auth_headers
+
+    await prepare_database()
+    async with new_session() as db:
+        owner = await seed_user(db)
+        await seed_group(db, owner, [], expense_count=20)
+        await db.execute(text("CREATE TABLE IF NOT EXISTS alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)"))
+        await db.execute(text("DELETE FROM alembic_version"))
+        (head,) = expected_schema_revisions()
+        await db.execute(text("INSERT INTO alembic_version (version_num) VALUES (:head)"), {"head": head})
+        await db.commit()
+    return auth_headers(owner)["Authorization"].removeprefix("Bearer "), head
+
+
+def run():
+    token, head = asyncio.run(prepare())
+    modes = [
+        ("create_all", {"DB_STARTUP_MODE": "create_all", "DB_WARM_CONNECTIONS": "0"}),
+        ("verify", {"DB_STARTUP_MODE": "verify", "DB_WARM_CONNECTIONS": "0"}),
+        (f"verify + warm {WARM}", {"DB_STARTUP_MODE": "verify", "DB_WARM_CONNECTIONS": str(WARM)}),
+        (f"verify pinned + warm {WARM}", {"DB_STARTUP_MODE": "verify", "DB_SCHEMA_REVISION": head, "DB_WARM_CONNECTIONS": str(WARM)}),
+    ]
+
+    print(f"{'mode':<26} {'imports':>8} {'settings':>9} {'db':>7} {'warm-up':>8} {'ready':>7} {'first ' + str(FIRST_REQUESTS) + ' reqs':>13} {'process':>8}")
+    for label, env in modes:
+        started = time.perf_counter()
+        process = spawn({"BENCH_TOKEN": token, **env})
+        wall_ms = (time.perf_counter() - started) * 1000
+        if process.returncode != 0:
+            raise RuntimeError(f"{label} failed:\n{process.stderr}")
+        result = json.loads(next(line for line in process.stdout.splitlines() if line.startswith("RESULT "))[len("RESULT "):])
+        phases = {phase: seconds * 1000 for phase, seconds in result["phases"].items()}
+        print(
+            f"{label:<26} {phases['imports']:>6.0f}ms {phases['settings']:>7.0f}ms {phases['db']:>5.0f}ms "
+            f"{phases['warm-up']:>6.0f}ms {sum(phases.values()):>5.0f}ms {result['first_requests_ms']:>11.1f}ms {wall_ms:>6.0f}ms"
+        )
+
+    process = spawn({"BENCH_TOKEN": token, "DB_STARTUP_MODE": "verify", "DB_SCHEMA_REVISION": "0000000000ff"})
+    message = next((line for line in process.stderr.splitlines() if line.startswith("RuntimeError")), process.stderr[-300:])
+    print(f"verify against another revision: exit={process.returncode} {message}")
+    assert process.returncode != 0
+
+
+if __name__ == "__main__":
+    if "--child" in sys.argv:
+        asyncio.run(child())
+    else:
+        run()
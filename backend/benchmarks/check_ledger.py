@@ -0,0 +1,116 @@
+"""
+Check the balance ledger against a recomputation from the raw shares, and optionally repair it.
+Prints every drifted balance and group total and exits with status 1 if there is any drift.
+With --rebuild the ledger of the drifted groups is rebuilt from the shares and checked again.
+With --seeded a dataset is seeded first and the ledger of a few of its groups is corrupted,
+to check that the drift is found, that a rebuild clears it and that the rebuilt groups get a
+new revision with a "group" change for syncing clients.
+
+    cd backend && python -m benchmarks.check_ledger [--group ID] [--rebuild]
+    cd backend && python -m benchmarks.check_ledger --seeded [--groups N]
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+
+from sqlalchemy import text, update, delete
+
+from app.crud.ledger import check_ledger_consistency, rebuild_ledger
+from app.crud.revision import get_group_changes, get_group_revisions
+from app.db.database import engine
+from app.db.models import GroupBalance, GroupTotals
+from benchmarks.common import prepare_database, new_session
+from benchmarks.seed import seed_scale, seeded_id
+
+
+def print_drift(drift: list[dict]) -> None:
+    for report in drift:
+        where = f"group={report['group_id']}" + (f" user={report['user_id']}" if report["kind"] == "balance" else "")
+        print(f"  {report['kind']:<8} {where} expected={report['expected']} actual={report['actual']}")
+
+
+async def check(group_id) -> list[dict]:
+    started = time.perf_counter()
+    async with new_session() as db:
+        drift = await check_ledger_consistency(db, group_id)
+    print(f"checked in {(time.perf_counter() - started) * 1000:.0f}ms: {len(drift)} drifted rows")
+    print_drift(drift)
+    return drift
+
+
+async def rebuild(group_ids: list) -> None:
+    started = time.perf_counter()
+    async with new_session() as db:
+        for group_id in group_ids:
+            await rebuild_ledger(db, group_id)
+        await db.commit()
+    print(f"rebuilt {len(group_ids)} groups in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+
+async def corrupt(tag: str, groups: int) -> list:
+    """Break the ledger of three seeded groups in different ways and return their IDs."""
+    paid_drift, totals_drift, missing_totals = (seeded_id(tag, "g", g) for g in (1, groups // 2, groups))
+    async with new_session() as db:
+        await db.execute(
+            update(GroupBalance).where(GroupBalance.group_id == paid_drift).values(total_paid=GroupBalance.total_paid + 10)
+        )
+        await db.execute(
+            update(GroupTotals).where(GroupTotals.group_id == totals_drift).values(expense_count=GroupTotals.expense_count - 1)
+        )
+        await db.execute(delete(GroupTotals).where(GroupTotals.group_id == missing_totals))
+        await db.commit()
+    return [paid_drift, totals_drift, missing_totals]
+
+
+async def run_seeded(args) -> int:
+    await prepare_database()
+    async with engine.begin() as conn:
+        tag = await seed_scale(conn, args.users, args.groups, args.members, args.expenses)
+        await conn.execute(text("ANALYZE"))
+    print(f"seeded groups={args.groups} members={args.members} expenses/group={args.expenses}")
+
+    corrupted = await corrupt(tag, args.groups)
+    async with new_session() as db:
+        revisions = await get_group_revisions(db, corrupted)
+
+    drift = await check(None)
+    drifted = {report["group_id"] for report in drift}
+    assert drifted == set(corrupted), f"expected drift in {corrupted}, found {drifted}"
+
+    await rebuild(sorted(drifted))
+    assert not await check(None), "the ledger still drifts after a rebuild"
+
+    async with new_session() as db:
+        for group_id in corrupted:
+            changes = await get_group_changes(db, group_id, revisions[group_id])
+            assert changes.revision == revisions[group_id] + 1, "a rebuild must bump the group revision"
+            assert changes.group is not None, "a rebuild must record a group change"
+    print("rebuilt groups are at a new revision with a group change")
+    return 0
+
+
+async def run(args) -> int:
+    if args.seeded:
+        status = await run_seeded(args)
+    else:
+        drift = await check(args.group)
+        status = 1 if drift else 0
+        if drift and args.rebuild:
+            await rebuild(sorted({report["group_id"] for report in drift}))
+            status = 1 if await check(args.group) else 0
+    await engine.dispose()
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--group", type=uuid.UUID, help="only check this group")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the ledger of the groups that drift")
+    parser.add_argument("--seeded", action="store_true", help="seed and corrupt a dataset first, then check and rebuild it")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--groups", type=int, default=100)
+    parser.add_argument("--members", type=int, default=4, help="members per group")
+    parser.add_argument("--expenses", type=int, default=50, help="expenses per group")
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,107 @@
+"""
+Plan check for the hot query shapes.
+Seeds the database to a realistic size, runs EXPLAIN on each hot query and exits
+with a non-zero status if any of them falls back to a sequential scan.
+Run it against a scratch database:
+
+    cd backend && python -m benchmarks.check_query_plans --groups 5000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import uuid
+
+from sqlalchemy import select, func, text, true
+from sqlalchemy.dialects import postgresql
+
+from app.db.database import engine
+from app.db.models import User, Group, GroupMember, Expense, ExpenseShares
+from benchmarks.common import prepare_database
+from benchmarks.seed import seed_scale
+
+def newest_expenses(group_id: uuid.UUID):
+    """The expenses_limit shape of the group endpoints: the newest expenses of each group through LATERAL."""
+    groups = select(Group.id).where(Group.id.in_([group_id])).subquery("bounded_groups")
+    recent = (
+        select(Expense.id, Expense.name, Expense.amount, Expense.created_at)
+        .where(Expense.group_id == groups.c.id)
+        .order_by(Expense.created_at.desc(), Expense.id.desc())
+        .limit(10)
+        .lateral("recent_expenses")
+    )
+    return select(recent).select_from(groups.join(recent, true()))
+
+
+def hot_queries(group_id: uuid.UUID, user_id: uuid.UUID, username: str) -> dict:
+    """The query shapes issued by the read and write endpoints, keyed by name."""
+    return {
+        "expense listing page": (
+            select(Expense.id, Expense.name, Expense.amount, Expense.created_at, User.first_name, User.last_name)
+            .join(User, User.id == Expense.user_id)
+            .where(Expense.group_id == group_id)
+            .order_by(Expense.created_at.desc(), Expense.id.desc())
+            .limit(51)
+        ),
+        "expenses of groups": select(Expense).where(Expense.group_id.in_([group_id])),
+        "newest expenses of groups": newest_expenses(group_id),
+        "membership check": select(GroupMember.id).where(GroupMember.group_id == group_id, GroupMember.user_id == user_id),
+        "members of group": select(GroupMember).where(GroupMember.group_id == group_id),
+        "groups of user": select(Group).join(GroupMember).where(GroupMember.user_id == user_id),
+        "shares of user in group": (
+            select(func.sum(ExpenseShares.amount_paid), func.sum(ExpenseShares.amount_owed))
+            .join(ExpenseShares.expense)
+            .where(ExpenseShares.user_id == user_id, Expense.group_id == group_id)
+        ),
+        "user by username": select(User).where(User.username == username),
+    }
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """Return the relations read with a sequential scan anywhere in an EXPLAIN plan tree."""
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name"))
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def run(args) -> int:
+    await prepare_database()
+
+    async with engine.begin() as conn:
+        if not args.no_seed:
+            await seed_scale(conn, args.users, args.groups, args.members, args.expenses, ledger=False)
+        await conn.execute(text("ANALYZE"))
+
+    async with engine.connect() as conn:
+        row = (await conn.execute(
+            select(GroupMember.group_id, GroupMember.user_id, User.username)
+            .join(User, User.id == GroupMember.user_id)
+            .limit(1)
+        )).one()
+
+        failures = 0
+        for name, stmt in hot_queries(row.group_id, row.user_id, row.username).items():
+            sql = str(stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+            result = await conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + sql)
+            plan = result.scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            scans = seq_scans(plan[0]["Plan"])
+            status = "SEQ SCAN on " + ", ".join(scans) if scans else "ok"
+            print(f"{name:28s} {status}")
+            failures += bool(scans)
+
+    await engine.dispose()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--groups", type=int, default=5000)
+    parser.add_argument("--members", type=int, default=4, help="members per group")
+    parser.add_argument("--expenses", type=int, default=20, help="expenses per group")
+    parser.add_argument("--no-seed", action="store_true", help="check the data that is already in the database")
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,111 @@
+"""
+Check read-replica routing and read-your-writes pinning.
+Points READ_DATABASE_URL at the primary under a second URL unless it is already set
+(pass a real replica to test against one), then drives the API and checks which engine
+served each request: reads go to the replica, except for READ_YOUR_WRITES_SECONDS after
+the same user wrote, and replica transactions are read-only.
+
+    cd backend && python -m benchmarks.check_read_routing
+"""
+import asyncio
+import os
+import time
+import uuid
+
+os.environ.setdefault("READ_DATABASE_URL", os.environ.get("DATABASE_URL", ""))
+os.environ.setdefault("READ_YOUR_WRITES_SECONDS", "0.5")
+
+import httpx
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
+
+from app.config.settings import settings
+from app.db.database import engine, read_engine, ReadSessionLocal
+from app.main import app
+from benchmarks.common import prepare_database
+
+PASSWORD = "password1"
+
+
+class EngineCounter:
+    """Count the statements each engine runs while a request is served."""
+
+    def __init__(self):
+        self.counts = {"primary": 0, "replica": 0}
+        event.listen(engine.sync_engine, "before_cursor_execute", self._counter("primary"))
+        event.listen(read_engine.sync_engine, "before_cursor_execute", self._counter("replica"))
+
+    def _counter(self, name: str):
+        def count(conn, cursor, statement, parameters, context, executemany):
+            self.counts[name] += 1
+        return count
+
+    async def served_by(self, request) -> tuple[str, httpx.Response]:
+        """Run a request and name the engine that answered it."""
+        self.counts = {"primary": 0, "replica": 0}
+        response = await request
+        if self.counts["primary"] and self.counts["replica"]:
+            return "both", response
+        return ("primary" if self.counts["primary"] else "replica"), response
+
+
+def expect(label: str, served_by: str, response: httpx.Response, engine_name: str, status: int = 200):
+    print(f"{label:<45} {response.status_code} {served_by}")
+    assert response.status_code == status, response.text
+    assert served_by == engine_name, f"{label}: expected the {engine_name}, got {served_by}"
+
+
+async def run():
+    assert read_engine is not engine, "READ_DATABASE_URL is not set"
+    await prepare_database()
+    window = settings.READ_YOUR_WRITES_SECONDS
+    counter = EngineCounter()
+    email = f"replica-{uuid.uuid4().hex[:8]}@example.com"
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench/api/v1") as client:
+        response = await client.post("/register", json={"first_name": "Read", "last_name": "Replica", "email": email, "password": PASSWORD, "confirmPassword": PASSWORD})
+        assert response.status_code == 201, response.text
+        user_id = response.json()["id"]
+        response = await client.post("/login", data={"username": email, "password": PASSWORD})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+        expect("read right after registering", *await counter.served_by(client.get(f"/users/single/{user_id}", headers=headers)), "primary")
+        await asyncio.sleep(window)
+        expect("read after the window", *await counter.served_by(client.get("/groups/all", headers=headers)), "replica")
+
+        served_by, response = await counter.served_by(client.post("/groups/create", json={"name": "Replica check", "description": "Read routing"}, headers=headers))
+        expect("create a group", served_by, response, "primary", 201)
+        group_id = response.json()["id"]
+
+        for label, path in [
+            ("group right after writing it", f"/groups/single/{group_id}"),
+            ("groups right after writing", "/groups/all"),
+            ("members right after writing", f"/groups/get-members/{group_id}"),
+            ("expenses right after writing", f"/get/expense/all/{group_id}"),
+        ]:
+            expect(label, *await counter.served_by(client.get(path, headers=headers)), "primary")
+
+        started = time.perf_counter()
+        await asyncio.sleep(window)
+        served_by, response = await counter.served_by(client.get(f"/groups/single/{group_id}", headers=headers))
+        expect(f"group {time.perf_counter() - started:.1f}s after writing", served_by, response, "replica")
+
+        # another user's write does not pin this one
+        other = f"replica-{uuid.uuid4().hex[:8]}@example.com"
+        await client.post("/register", json={"first_name": "Other", "last_name": "User", "email": other, "password": PASSWORD, "confirmPassword": PASSWORD})
+        expect("read while another user is pinned", *await counter.served_by(client.get("/groups/all", headers=headers)), "replica")
+
+    async with ReadSessionLocal() as db:
+        read_only = (await db.execute(text("SHOW transaction_read_only"))).scalar()
+        print(f"replica transaction_read_only={read_only}")
+        assert read_only == "on"
+        try:
+            await db.execute(text("UPDATE groups SET name = name WHERE false"))
+        except DBAPIError as e:
+            print(f"replica write rejected: {str(e.orig).splitlines()[0]}")
+        else:
+            raise AssertionError("a write went through on the read-only replica session")
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,79 @@
+"""
+Check the fields= and expenses_limit= modes of the group and expense read endpoints.
+Requests every mode of GET /groups/all, GET /groups/single and GET /get/expense/all,
+prints the statements and bytes each one costs, and checks that only the requested fields
+are returned and that the data behind the other fields is not queried at all.
+
+    cd backend && python -m benchmarks.check_sparse_fields
+"""
+import asyncio
+
+import httpx
+
+from app.main import app
+from benchmarks.common import QueryCounter, prepare_database, new_session, seed_user, seed_group, auth_headers
+
+GROUPS = 5
+MEMBERS = 3
+EXPENSES_PER_GROUP = 40
+RECENT = 3
+
+
+def touches(queries: QueryCounter, table: str) -> bool:
+    return any(f"FROM {table}" in statement or f"JOIN {table}" in statement for statement in queries.statements)
+
+
+async def fetch(client: httpx.AsyncClient, path: str, headers: dict, label: str):
+    with QueryCounter() as queries:
+        response = await client.get(path, headers=headers)
+    assert response.status_code == 200, f"{label}: {response.status_code} {response.text}"
+    print(f"{label:<42} statements={queries.count} bytes={len(response.content)}")
+    return response.json(), queries
+
+
+async def run():
+    await prepare_database()
+    async with new_session() as db:
+        owner = await seed_user(db)
+        members = [await seed_user(db) for _ in range(MEMBERS)]
+        groups = [await seed_group(db, owner, members, EXPENSES_PER_GROUP) for _ in range(GROUPS)]
+        await db.commit()
+    headers = auth_headers(owner)
+    group_id = groups[0].id
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench/api/v1") as client:
+        await client.get("/me", headers=headers) # warm the user cache so only the endpoint's own queries are counted
+
+        full, full_queries = await fetch(client, "/groups/all", headers, "groups/all")
+        assert all(len(group["expenses"]) == EXPENSES_PER_GROUP for group in full)
+
+        summary, queries = await fetch(client, "/groups/all?fields=summary", headers, "groups/all?fields=summary")
+        assert all(set(group) == {"id", "name", "description", "member_count", "grand_total", "balance"} for group in summary)
+        assert [{k: v for k, v in group.items() if k != "expenses"} for group in full] == summary
+        assert not touches(queries, "expenses") and queries.count < full_queries.count
+
+        names, queries = await fetch(client, "/groups/all?fields=name", headers, "groups/all?fields=name")
+        assert all(set(group) == {"id", "name"} for group in names)
+        assert not touches(queries, "expenses") and not touches(queries, "group_totals") and not touches(queries, "group_balances")
+
+        recent, queries = await fetch(client, f"/groups/all?expenses_limit={RECENT}", headers, f"groups/all?expenses_limit={RECENT}")
+        for group, bounded in zip(full, recent):
+            newest = sorted(group["expenses"], key=lambda expense: (expense["created_at"], expense["id"]), reverse=True)[:RECENT]
+            assert bounded["expenses"] == newest, "expenses_limit did not return the newest expenses"
+
+        single, queries = await fetch(client, f"/groups/single/{group_id}?fields=balance,grand_total", headers, "groups/single?fields=balance,grand_total")
+        assert set(single) == {"id", "balance", "grand_total"}
+        assert not touches(queries, "expenses")
+
+        response = await client.get("/groups/all?fields=nope", headers=headers)
+        print(f"{'groups/all?fields=nope':<42} {response.status_code}")
+        assert response.status_code == 400, response.text
+
+        full, full_queries = await fetch(client, f"/get/expense/all/{group_id}", headers, "expense/all")
+        short, queries = await fetch(client, f"/get/expense/all/{group_id}?fields=name,amount,date", headers, "expense/all?fields=name,amount,date")
+        assert [{k: expense[k] for k in ("id", "name", "amount", "date")} for expense in full] == short
+        assert not touches(queries, "users") and not touches(queries, "group_members") and queries.count < full_queries.count
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
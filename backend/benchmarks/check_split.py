@@ -0,0 +1,140 @@
+"""
+Check the split engine for every split method, and time it on a large batch.
+Checks that the shares always add up to the expense amount in cents, that the cents left
+over are handed out deterministically (by largest remainder, ties to the earlier
+participant), that compute_splits_batch gives exactly what compute_split gives for each
+expense on its own, and that a payer who is not a participant is still credited.
+
+    cd backend && python -m benchmarks.check_split [--expenses N] [--seed S]
+"""
+import argparse
+import random
+import uuid
+
+from app.crud.expense import iter_share_values
+from app.utils.split import SPLIT_METHODS, compute_split, compute_splits_batch
+from benchmarks.common import timer
+
+# (amount, split_method, splits, expected cents): the remainder goes to the largest
+# fractional part, and between equal fractions to the earlier participant
+REMAINDER_CASES = [
+    (10.00, "equal", None, [334, 333, 333]),
+    (0.05, "equal", None, [2, 1, 1, 1]),
+    (0.01, "equal", None, [1, 0, 0]),
+    (1.00, "percent", [33.33, 33.33, 33.34], [33, 33, 34]),
+    (10.00, "percent", [50, 25, 25], [500, 250, 250]),
+    (0.10, "percent", [10, 30, 60], [1, 3, 6]),
+    (0.02, "shares", [1, 1, 1], [1, 1, 0]),
+    (1.00, "shares", [1, 2, 0], [33, 67, 0]),
+    (10.00, "shares", [1, 1, 2, 1], [200, 200, 400, 200]),
+    (12.34, "custom", [10.00, 2.00, 0.34], [1000, 200, 34]),
+    (0.03, "custom", [0.01, 0.01, 0.01], [1, 1, 1]),
+]
+
+
+def cents(splits) -> list[int]:
+    return [round(split.amount_owed * 100) for split in splits]
+
+
+def random_expense(rng: random.Random, method: str) -> tuple:
+    """A valid expense of the given split method with 1 to 8 participants."""
+    count = rng.randint(1, 8)
+    participants = [uuid.UUID(int=rng.getrandbits(128)) for _ in range(count)]
+    amount = rng.randint(1, 10_000_000) / 100
+
+    if method == "equal":
+        return amount, participants, method, None
+    if method == "shares":
+        splits = [float(rng.randint(0, 5)) for _ in range(count)]
+        splits[rng.randrange(count)] += 1 # at least one share
+        return amount, participants, method, splits
+
+    # percent and custom splits: whole cents or hundredths of a percent that add up exactly
+    total = 10_000 if method == "percent" else round(amount * 100)
+    cuts = sorted(rng.randint(0, total) for _ in range(count - 1))
+    parts = [b - a for a, b in zip([0, *cuts], [*cuts, total])]
+    if not any(parts):
+        parts[0] = total
+    return amount, participants, method, [part / 100 for part in parts]
+
+
+def check_remainders() -> None:
+    for amount, method, splits, expected in REMAINDER_CASES:
+        participants = [uuid.UUID(int=i + 1) for i in range(len(expected))]
+        first = cents(compute_split(amount, participants, method, splits))
+        assert first == expected, f"{method} {amount} {splits}: expected {expected}, got {first}"
+        for _ in range(3):
+            assert cents(compute_split(amount, participants, method, splits)) == first, f"{method} {amount} is not deterministic"
+    print(f"remainders: {len(REMAINDER_CASES)} fixed cases match and repeat identically")
+
+
+def check_sums(rng: random.Random, per_method: int) -> None:
+    for method in SPLIT_METHODS:
+        for _ in range(per_method):
+            amount, participants, _, splits = random_expense(rng, method)
+            result = compute_split(amount, participants, method, splits)
+            assert [split.user_id for split in result] == participants, f"{method}: participants out of order"
+            assert sum(cents(result)) == round(amount * 100), f"{method} {amount} {splits}: shares add up to {sum(cents(result))} cents"
+            assert min(cents(result)) >= 0, f"{method} {amount} {splits}: negative share"
+        print(f"sums: {method:<8} {per_method} random expenses add up to their amount in cents")
+
+
+def check_payer_credit() -> None:
+    payer, first, second = (uuid.UUID(int=i) for i in (1, 2, 3))
+    shares = list(iter_share_values(compute_split(9.99, [first, second], "equal"), 9.99, payer))
+    assert [(user_id, owed, paid) for user_id, owed, paid, *_ in shares] == [(first, 5.0, 0), (second, 4.99, 0), (payer, 0, 9.99)], shares
+
+    shares = list(iter_share_values(compute_split(9.99, [payer, first], "equal"), 9.99, payer))
+    assert [(user_id, owed, paid) for user_id, owed, paid, *_ in shares] == [(payer, 5.0, 9.99), (first, 4.99, 0)], shares
+    print("payer: credited with the amount, owing nothing when not a participant")
+
+
+def check_batch(rng: random.Random, count: int) -> None:
+    expenses = [random_expense(rng, SPLIT_METHODS[i % len(SPLIT_METHODS)]) for i in range(count)]
+
+    with timer() as batch_elapsed:
+        batched = compute_splits_batch(expenses)
+    with timer() as single_elapsed:
+        single = [compute_split(*expense) for expense in expenses]
+
+    assert len(batched) == count
+    for row, (left, right) in enumerate(zip(batched, single)):
+        assert left == right, f"expense {row} {expenses[row]}: batch {left} != single {right}"
+    print(
+        f"batch: {count} mixed expenses match compute_split, "
+        f"batch={batch_elapsed['ms']:.0f}ms ({count / batch_elapsed['ms'] * 1000:,.0f}/s) "
+        f"single={single_elapsed['ms']:.0f}ms ({count / single_elapsed['ms'] * 1000:,.0f}/s)"
+    )
+
+
+def check_invalid() -> None:
+    participants = [uuid.UUID(int=1), uuid.UUID(int=2)]
+    for amount, method, splits in ((10, "percent", [50, 40]), (10, "custom", [5, 4]), (10, "shares", [0, 0]), (10, "thirds", [1, 2])):
+        try:
+            compute_split(amount, participants, method, splits)
+        except ValueError:
+            continue
+        raise AssertionError(f"{method} {splits} was accepted")
+    try:
+        compute_splits_batch([(10, participants, "equal", None), (10, participants, "percent", [50, 40])])
+    except ValueError as e:
+        assert str(e).startswith("Expense 1:"), e
+    else:
+        raise AssertionError("an invalid expense in a batch was accepted")
+    print("invalid: rejected, and the batch names the offending expense")
+
+
+def run(args) -> None:
+    rng = random.Random(args.seed)
+    check_remainders()
+    check_sums(rng, 2000)
+    check_payer_credit()
+    check_invalid()
+    check_batch(rng, args.expenses)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=10_000, help="size of the timed batch")
+    parser.add_argument("--seed", type=int, default=0)
+    run(parser.parse_args())
@@ -0,0 +1,192 @@
+"""
+Shared helpers for the benchmark scripts.
+The benchmarks run against the database configured by DATABASE_URL, so point it
+at a throwaway Postgres database before running them, e.g.:
+
+    cd backend && python -m benchmarks.bench_groups_all
+"""
+import asyncio
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from app.db.database import engine, AsyncSessionLocal, init_db
+from app.db.models import User, Group, GroupMember, Expense, ExpenseShares
+from app.crud.ledger import apply_member_to_ledger, apply_expense_to_ledger
+from app.schemas.expense import ExpenseSharesCreate
+from app.utils.auth import create_access_token
+
+
+class QueryCounter:
+    """Count and record the SQL statements sent to the database while it is active."""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+
+
+class TransactionCounter:
+    """Count the commits and rollbacks ending transactions on the database while it is active."""
+
+    def __init__(self):
+        self.commits = 0
+        self.rollbacks = 0
+
+    def _commit(self, conn):
+        self.commits += 1
+
+    def _rollback(self, conn):
+        self.rollbacks += 1
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "commit", self._commit)
+        event.listen(engine.sync_engine, "rollback", self._rollback)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "commit", self._commit)
+        event.remove(engine.sync_engine, "rollback", self._rollback)
+
+
+@contextmanager
+def timer():
+    """Measure the wall clock time of a block in milliseconds."""
+    elapsed = {}
+    start = time.perf_counter()
+    try:
+        yield elapsed
+    finally:
+        elapsed["ms"] = (time.perf_counter() - start) * 1000
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MiB (Linux only)."""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class PeakRSS:
+    """Sample the resident set size in the background and keep the peak."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.baseline = 0.0
+        self.peak = 0.0
+        self._task = None
+
+    async def _sample(self):
+        while True:
+            self.peak = max(self.peak, current_rss_mb())
+            await asyncio.sleep(self.interval)
+
+    async def __aenter__(self):
+        self.baseline = self.peak = current_rss_mb()
+        self._task = asyncio.create_task(self._sample())
+        return self
+
+    async def __aexit__(self, *exc):
+        self._task.cancel()
+        self.peak = max(self.peak, current_rss_mb())
+
+    @property
+    def growth(self) -> float:
+        return self.peak - self.baseline
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    """Return the given percentile (0-100) of a list of samples."""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def seed_user(db) -> User:
+    """Create a throwaway user."""
+    suffix = uuid.uuid4().hex[:12]
+    user = User(
+        id=uuid.uuid4(),
+        first_name="Bench",
+        last_name=suffix,
+        username=f"bench-{suffix}@example.com",
+        email=f"bench-{suffix}@example.com",
+        password="not-a-real-hash",
+    )
+    db.add(user)
+    await db.flush()
+    return user
+
+
+async def seed_group(db, owner: User, members: list[User], expense_count: int) -> Group:
+    """Create a group owned by `owner` with the given members and equally split expenses."""
+    group = Group(
+        id=uuid.uuid4(),
+        name=f"Bench group {uuid.uuid4().hex[:6]}",
+        invite_code=uuid.uuid4().hex[:8].upper(),
+        created_by=owner.id,
+    )
+    db.add(group)
+    await db.flush()
+
+    group_members = []
+    for user in [owner, *members]:
+        member = GroupMember(id=uuid.uuid4(), group_id=group.id, user_id=user.id, is_admin=user is owner)
+        group_members.append(member)
+    db.add_all(group_members)
+    await db.flush()
+    await apply_member_to_ledger(db, group.id, len(group_members))
+
+    everyone = [owner, *members]
+    for i in range(expense_count):
+        expense = Expense(
+            id=uuid.uuid4(),
+            group_id=group.id,
+            user_id=owner.id,
+            group_member_id=group_members[0].id,
+            name=f"Expense {i}",
+            amount=30.0,
+            expense_type="groceries",
+            split_method="equal",
+        )
+        db.add(expense)
+        share = round(30.0 / len(everyone), 2)
+        shares = {
+            user.id: ExpenseSharesCreate(amount_owed=share, amount_paid=30.0 if user is owner else 0, settled=user is owner)
+            for user in everyone
+        }
+        db.add_all([
+            ExpenseShares(id=uuid.uuid4(), expense_id=expense.id, user_id=user_id, **data.model_dump())
+            for user_id, data in shares.items()
+        ])
+        await db.flush()
+        await apply_expense_to_ledger(db, group.id, expense.amount, shares)
+    return group
+
+
+async def prepare_database():
+    """Make sure the tables exist before seeding."""
+    await init_db()
+
+
+def new_session():
+    """Open a session outside of FastAPI's dependency injection."""
+    return AsyncSessionLocal()
+
+
+def auth_headers(user: User) -> dict:
+    """Bearer token headers for a seeded user."""
+    return {"Authorization": f"Bearer {create_access_token(data={'sub': str(user.id)})}"}
@@ -0,0 +1,105 @@
+"""
+Bulk seeder for the benchmarks.
+Builds a dataset of a given scale with set based INSERT ... SELECT generate_series
+statements, so hundreds of thousands of rows take seconds rather than minutes, and
+fills the balance ledger, group revisions and change log the way the API would.
+IDs are derived from a random tag with md5(), so they can be recomputed in SQL.
+"""
+import hashlib
+import uuid
+
+from sqlalchemy import text
+
+SEED_SQL = [
+    """
+    INSERT INTO users (id, first_name, last_name, username, email, password)
+    SELECT md5(:tag || 'u' || g)::uuid, 'Seed', 'User ' || g, 'seed-' || :tag || '-' || g || '@example.com',
+           'seed-' || :tag || '-' || g || '@example.com', :password
+    FROM generate_series(1, :users) g
+    """,
+    """
+    INSERT INTO groups (id, name, invite_code, created_by, revision)
+    SELECT md5(:tag || 'g' || g)::uuid, 'Seed group ' || g, upper(substr(md5(:tag || 'i' || g), 1, 8)),
+           md5(:tag || 'u' || ((g * :members) % :users + 1))::uuid, 1
+    FROM generate_series(1, :groups) g
+    """,
+    """
+    INSERT INTO group_members (id, group_id, user_id, is_admin)
+    SELECT md5(:tag || 'm' || g || '-' || k)::uuid, md5(:tag || 'g' || g)::uuid,
+           md5(:tag || 'u' || ((g * :members + k) % :users + 1))::uuid, k = 0
+    FROM generate_series(1, :groups) g, generate_series(0, :members - 1) k
+    """,
+    """
+    INSERT INTO expenses (id, group_id, user_id, group_member_id, name, amount, expense_type, split_method, settled, created_at)
+    SELECT md5(:tag || 'e' || g || '-' || e)::uuid, md5(:tag || 'g' || g)::uuid,
+           md5(:tag || 'u' || ((g * :members + e % :members) % :users + 1))::uuid,
+           md5(:tag || 'm' || g || '-' || (e % :members))::uuid,
+           'Expense ' || e, 40, 'groceries', 'equal', false, now() - make_interval(hours => e)
+    FROM generate_series(1, :groups) g, generate_series(1, :expenses) e
+    """,
+    """
+    INSERT INTO expense_shares (id, expense_id, user_id, amount_owed, amount_paid, settled)
+    SELECT gen_random_uuid(), md5(:tag || 'e' || g || '-' || e)::uuid,
+           md5(:tag || 'u' || ((g * :members + k) % :users + 1))::uuid,
+           40.0 / :members, CASE WHEN k = e % :members THEN 40 ELSE 0 END, k = e % :members
+    FROM generate_series(1, :groups) g, generate_series(1, :expenses) e, generate_series(0, :members - 1) k
+    """,
+]
+
+SEEDED_GROUPS = "SELECT md5(:tag || 'g' || g)::uuid FROM generate_series(1, :groups) g"
+
+LEDGER_SQL = [
+    f"""
+    INSERT INTO group_balances (id, group_id, user_id, total_paid, total_owed)
+    SELECT gen_random_uuid(), e.group_id, s.user_id, SUM(s.amount_paid), SUM(s.amount_owed)
+    FROM expense_shares s JOIN expenses e ON e.id = s.expense_id
+    WHERE e.group_id IN ({SEEDED_GROUPS})
+    GROUP BY e.group_id, s.user_id
+    """,
+    f"""
+    INSERT INTO group_totals (group_id, member_count, expense_count, grand_total)
+    SELECT g.id,
+           (SELECT COUNT(*) FROM group_members m WHERE m.group_id = g.id),
+           (SELECT COUNT(*) FROM expenses e WHERE e.group_id = g.id),
+           (SELECT COALESCE(SUM(e.amount), 0) FROM expenses e WHERE e.group_id = g.id)
+    FROM groups g
+    WHERE g.id IN ({SEEDED_GROUPS})
+    """,
+    f"""
+    INSERT INTO group_changes (group_id, rev, entity_type, entity_id)
+    SELECT g.id, 1, 'group', g.id FROM groups g WHERE g.id IN ({SEEDED_GROUPS})
+    UNION ALL
+    SELECT m.group_id, 1, 'member', m.id FROM group_members m WHERE m.group_id IN ({SEEDED_GROUPS})
+    UNION ALL
+    SELECT e.group_id, 1, 'expense', e.id FROM expenses e WHERE e.group_id IN ({SEEDED_GROUPS})
+    """,
+]
+
+
+def seeded_id(tag: str, kind: str, *parts) -> uuid.UUID:
+    """
+    Recompute the id the seed SQL gives a row, e.g. seeded_id(tag, "g", 3) for group 3.
+    :param tag: The tag returned by seed_scale.
+    :param kind: "u" for users, "g" for groups, "e" for expenses ("<group>-<n>").
+    :param parts: The generate_series values the id was built from.
+    """
+    return uuid.UUID(hashlib.md5((tag + kind + "-".join(str(part) for part in parts)).encode()).hexdigest())
+
+
+async def seed_scale(conn, users: int, groups: int, members: int, expenses: int, password_hash: str = "not-a-real-hash", ledger: bool = True) -> str:
+    """
+    Seed users, groups with `members` members each and `expenses` equally split expenses per group.
+    User k of group g is seed user (g * members + k) % users + 1, and k = 0 is the group admin.
+    :param conn: An AsyncConnection inside a transaction, e.g. from engine.begin().
+    :param password_hash: The password hash every seeded user gets.
+    :param ledger: Also fill the balance ledger and change log, as the API would have.
+    :return: The random tag the seeded ids are derived from.
+    """
+    if users < members:
+        raise ValueError("Need at least as many users as members per group.")
+
+    tag = uuid.uuid4().hex[:8]
+    params = {"tag": tag, "users": users, "groups": groups, "members": members, "expenses": expenses, "password": password_hash}
+    for statement in SEED_SQL + (LEDGER_SQL if ledger else []):
+        await conn.execute(text(statement), params)
+    return tag
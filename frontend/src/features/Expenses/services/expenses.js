@@ -10,7 +10,12 @@ export const getExpense = async (expense_id) => {
     return response.data;
 };
 
-export const getAllExpenses = async (group_id) => {
-    const response = await api.get(`/get/expense/all/${group_id}`);
-    return response.data;
+export const getAllExpenses = async (group_id, params = {}) => {
+    // params: limit, cursor, start_date, end_date, expense_type, paid_by
+    // returns one page; pass nextCursor back as params.cursor for the next one, it is null on the last page
+    const response = await api.get(`/get/expense/all/${group_id}`, { params });
+    return {
+        items: response.data,
+        nextCursor: response.headers['x-next-cursor'] || null,
+    };
 };
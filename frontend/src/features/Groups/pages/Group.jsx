@@ -17,6 +17,8 @@ const Group = () => {
     const [isSubmitting, setIsSubmitting] = useState(false);
     const [isMembersSubmitting, setIsMembersSubmitting] = useState(false);
     const [isExpensesSubmitting, setIsExpensesSubmitting] = useState(false);
+    const [nextCursor, setNextCursor] = useState(null);
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
     const [showCreateExpense, setShowCreateExpense] = useState(false);
 
     const params = useParams();
@@ -30,6 +32,19 @@ const Group = () => {
         setExpenses(prev => [...prev, newExpense]);
     };
 
+    const handleLoadMore = async () => {
+        try {
+            setIsLoadingMore(true);
+            const response = await getAllExpenses(id, { cursor: nextCursor });
+            setExpenses(prev => [...prev, ...response.items]);
+            setNextCursor(response.nextCursor);
+        } catch (error) {
+            console.error('Error fetching expenses:', error);
+        } finally {
+            setIsLoadingMore(false);
+        }
+    };
+
     useEffect(() => {
         const fetchGroup = async () => {
             try {
@@ -73,7 +88,8 @@ const Group = () => {
             try {
                 setIsExpensesSubmitting(true);
                 const response = await getAllExpenses(id);
-                setExpenses(response);
+                setExpenses(response.items);
+                setNextCursor(response.nextCursor);
             } catch (error) {
                 console.error('Error fetching expenses:', error);
             } finally {
@@ -227,6 +243,15 @@ const Group = () => {
                         ) : (
                             <p className='text-zinc-600 text-sm font-sans1'>No expenses found.</p>
                         )}
+
+                        {!isExpensesSubmitting && nextCursor && (
+                            <button
+                                onClick={handleLoadMore}
+                                disabled={isLoadingMore}
+                                className='w-full h-10 bg-white hover:bg-gray-200 disabled:opacity-50 border border-zinc-400 rounded-xl text-zinc-800 font-medium py-2 px-4'>
+                                {isLoadingMore ? 'Loading...' : 'Load more'}
+                            </button>
+                        )}
                     
                     </div>
                 </div> 